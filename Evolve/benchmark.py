@@ -0,0 +1,441 @@
+# Copyright 2015 Brian Macker
+""" Time the hot paths of growing, screening and drawing creatures, without a display.
+
+    Drawing goes to a stub pen that only tracks its position, so the results measure this
+    code rather than Tk.  Run as a script:
+
+        python benchmark.py                            Print the results
+        python benchmark.py --save-baseline base.json  Also store them as a baseline
+        python benchmark.py --baseline base.json       Compare with a baseline, failing on a regression
+
+    benchmark_baseline.json holds the results the current code was last measured at.
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import tracemalloc
+import importlib.util
+import importlib.machinery
+import numpy
+from creature import *
+from viability import *
+from similarity import *
+
+
+class StubPen:
+    """ Class standing in for a turtle pen.  It moves like one but draws nothing.
+
+        Only the calls the creature and panel code make are provided.
+    """
+
+    def __init__(self):
+        self._x = 0.0
+        self._y = 0.0
+        self._heading = 0.0
+
+    def xcor(self):
+        return self._x
+
+    def ycor(self):
+        return self._y
+
+    def heading(self):
+        return self._heading
+
+    def setposition(self, x, y):
+        self._x = x
+        self._y = y
+
+    def setheading(self, heading):
+        self._heading = heading % 360
+
+    def forward(self, distance):
+        angle = math.radians(self._heading)
+        self._x += distance * math.cos(angle)
+        self._y += distance * math.sin(angle)
+
+    def right(self, angle):
+        self._heading = (self._heading - angle) % 360
+
+    def left(self, angle):
+        self._heading = (self._heading + angle) % 360
+
+    # Calls that only change how things would look
+    def _ignore(self, *arguments, **keywordArguments):
+        pass
+
+    penup = up = pendown = down = _ignore
+    pencolor = fillcolor = color = width = speed = _ignore
+    dot = circle = begin_fill = end_fill = write = clear = _ignore
+    hideturtle = setundobuffer = _ignore
+
+
+class _StubTurtleModule:
+    """ Stands in for the turtle module inside the display module, so panels get stub pens. """
+    Turtle = StubPen
+
+
+def loadDisplayModule():
+    """ Load display.pyw as a module, with its panels given stub pens instead of turtles.
+
+        Returns:
+            module: The display module.  Nothing in it has touched Tk.
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "display.pyw")
+    loader = importlib.machinery.SourceFileLoader("display", path)
+    spec = importlib.util.spec_from_loader("display", loader)
+    displayModule = importlib.util.module_from_spec(spec)
+    loader.exec_module(displayModule)
+    displayModule.turtle = _StubTurtleModule
+    return displayModule
+
+
+def stubCreatureDisplay(displayModule, screenWidth, screenHeight, rows, columns):
+    """ Return a CreatureDisplay of the given size and grid that draws with stub pens.
+
+        The panels are sized by the display's own code, but no window is opened,
+        no worker processes are started and no creatures are made.
+
+        Args:
+            displayModule (module): The module returned by loadDisplayModule.
+            screenWidth (int): The width of the screen in pixels.
+            screenHeight (int): The height of the screen in pixels.
+            rows (int): How many rows of panels.
+            columns (int): How many columns of panels.
+
+        Returns:
+            CreatureDisplay: The display, with every panel empty.
+    """
+    creatureDisplay = displayModule.CreatureDisplay.__new__(displayModule.CreatureDisplay)
+    creatureDisplay.pen = StubPen()
+    creatureDisplay.renderer = None
+    creatureDisplay.showMetrics = False
+    creatureDisplay.pagedPopulationSize = None
+    creatureDisplay.lineageStore = None
+    creatureDisplay._screenwidth = screenWidth
+    creatureDisplay._screenheight = screenHeight
+    creatureDisplay.rows = rows
+    creatureDisplay.columns = columns
+    creatureDisplay.creatureCount = rows * columns
+    creatureDisplay.chromosomeCount = Genotype.CHROMOSOME_COUNT
+    creatureDisplay.parentCreature = None
+    creatureDisplay.screener = ViabilityScreener()
+    creatureDisplay.neighborIndex = None
+    creatureDisplay.neighborRandomGenerator = numpy.random.default_rng()
+    creatureDisplay.candidateGenerator = None
+    creatureDisplay._initializeHeaderSize()
+    creatureDisplay._initializePanelSize()
+    creatureDisplay._initializeScreenDivisions()
+    creatureDisplay.creatureArray = [None] * creatureDisplay.creatureCount
+    return creatureDisplay
+
+
+class BenchmarkResult:
+    """ Class holding the measurements of one benchmark.
+
+        Attributes:
+            name (str): The name of the benchmark.
+            operations (int): How many operations were timed.
+            seconds (float): How long they took.
+            bytesPerOperation (float): Peak memory allocated per operation, measured in a separate untimed run.
+            details (dict): Other measurements, such as rejection ratios.
+    """
+
+    def __init__(self, name, operations, seconds, bytesPerOperation, details):
+        self.name = name
+        self.operations = operations
+        self.seconds = seconds
+        self.bytesPerOperation = bytesPerOperation
+        self.details = details
+
+    @property
+    def throughput(self):
+        """ float: Operations per second. """
+        return self.operations / self.seconds
+
+    def asDict(self):
+        """ Return the measurements as plain values. """
+        return {"operations": self.operations, "seconds": self.seconds, "throughput": self.throughput,
+                "bytesPerOperation": self.bytesPerOperation, "details": self.details}
+
+
+class BenchmarkSuite:
+    """ Class that runs every benchmark.
+
+        Each benchmark is given a fresh random stream from the suite's seed and a number of
+        operations to run.  It returns a dict of extra measurements.  Inputs are generated
+        before timing starts.
+
+        Attributes:
+            seed (int): Seed of the inputs.
+            scale (float): Multiplies the number of operations of every benchmark.
+            results (BenchmarkResult[]): The results of the benchmarks run so far.
+    """
+
+    # Screen sizes in pixels and grids of panels the display benchmarks run over
+    SCREEN_SIZES = [(800, 600), (1600, 1200)]
+    GRID_SHAPES = [(2, 2), (3, 4), (6, 8)]
+
+    def __init__(self, seed=1, scale=1.0):
+        self.seed = seed
+        self.scale = scale
+        self.results = []
+        # The display module, loaded when a benchmark first needs it
+        self._loadedDisplayModule = None
+
+    def run(self, namePattern=None):
+        """ Run the benchmarks whose names contain the pattern, or all of them.
+
+            Returns:
+                BenchmarkResult[]: The results, in the order run.
+        """
+        benchmarks = [("interpretChromosomeValue", 20000, self._benchmarkInterpret),
+                      ("mutatedCopy", 20000, self._benchmarkMutatedCopy),
+                      ("mutatedChildren", 20000, self._benchmarkMutatedChildren),
+                      ("hammingNearest", 500, self._benchmarkHammingNearest),
+                      ("hammingContains", 2000, self._benchmarkHammingContains),
+                      ("childSegmentPositions", 5000, self._benchmarkChildSegmentPositions),
+                      ("segmentOutOfBounds", 10000, self._benchmarkSegmentOutOfBounds),
+                      ("creatureDisplay", 2000, self._benchmarkCreatureDisplay)]
+        for (screenWidth, screenHeight) in self.SCREEN_SIZES:
+            for (rows, columns) in self.GRID_SHAPES:
+                for bred in (False, True):
+                    name = "displayCreature/%dx%d/%dx%d/%s" % (screenWidth, screenHeight, rows, columns,
+                                                                ("children" if bred else "random"))
+                    benchmarks.append((name, 200, self._displayCreatureBenchmark(screenWidth, screenHeight, rows, columns, bred)))
+
+        for (name, operations, benchmark) in benchmarks:
+            if ((namePattern != None) and (namePattern not in name)):
+                continue
+            operations = max(int(operations * self.scale), 1)
+
+            # Time first, then measure memory on a separate run since tracing slows everything down
+            startTime = time.perf_counter()
+            details = benchmark(random.Random(self.seed), operations)
+            seconds = time.perf_counter() - startTime
+
+            memoryOperations = max(operations // 10, 1)
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+            startMemory = tracemalloc.get_traced_memory()[0]
+            benchmark(random.Random(self.seed), memoryOperations)
+            peakMemory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            self.results.append(BenchmarkResult(name, operations, seconds,
+                                                (peakMemory - startMemory) / memoryOperations, details))
+        return self.results
+
+    @staticmethod
+    def _randomChromosomes(randomGenerator, count):
+        return [Chromosome(0, randomGenerator.getrandbits(32) | Chromosome._SEGMENT_TERMINATION_PREVENT) for index in range(count)]
+
+    @staticmethod
+    def _randomGenotypes(randomGenerator, count):
+        return [Genotype([Chromosome(chromosomeIndex, randomGenerator.getrandbits(32) | Chromosome._SEGMENT_TERMINATION_PREVENT)
+                          for chromosomeIndex in range(Genotype.CHROMOSOME_COUNT)]) for index in range(count)]
+
+    def _benchmarkInterpret(self, randomGenerator, operations):
+        chromosomes = self._randomChromosomes(randomGenerator, min(operations, 1000))
+        for operation in range(operations):
+            chromosomes[operation % len(chromosomes)]._interpretChromosomeValue()
+        return {}
+
+    def _benchmarkMutatedCopy(self, randomGenerator, operations):
+        genotypes = self._randomGenotypes(randomGenerator, min(operations, 1000))
+        for operation in range(operations):
+            genotypes[operation % len(genotypes)].mutatedCopy(randomGenerator)
+        return {}
+
+    def _benchmarkMutatedChildren(self, randomGenerator, operations):
+        parents = [Creature(genotype) for genotype in self._randomGenotypes(randomGenerator, min(operations, 1000))]
+        parentPopulation = Population.fromCreatures(parents)
+        mutationGenerator = numpy.random.default_rng(randomGenerator.getrandbits(64))
+        # Children are bred a generation of parents at a time, the way the evolver breeds them
+        for firstOperation in range(0, operations, len(parents)):
+            batchParents = parents[:operations - firstOperation]
+            batchPopulation = parentPopulation if (len(batchParents) == len(parents)) else Population.fromCreatures(batchParents)
+            for child in batchPopulation.mutatedChildren(mutationGenerator).childCreatures(batchParents):
+                pass
+        return {}
+
+    @staticmethod
+    def _lineageIndex(randomGenerator, generationSize=10000, generationCount=20):
+        """ Return a HammingIndex of generations each bred from random parents in the one before, and a generator to query it with. """
+        numpyGenerator = numpy.random.default_rng(randomGenerator.getrandbits(64))
+        generation = Population.random(generationSize, numpyGenerator)
+        hammingIndex = HammingIndex(Genotype.CHROMOSOME_COUNT, generation.chromosomeValues)
+        for generationNumber in range(1, generationCount):
+            parentIndexes = numpyGenerator.integers(0, generationSize, size=generationSize)
+            generation = Population(generation.chromosomeValues[parentIndexes]).mutatedChildren(numpyGenerator)
+            hammingIndex.add(generation.chromosomeValues)
+        return (hammingIndex, numpyGenerator)
+
+    def _benchmarkHammingNearest(self, randomGenerator, operations):
+        (hammingIndex, numpyGenerator) = self._lineageIndex(randomGenerator)
+        # Children of stored genomes, like a creature just bred on the display
+        queries = Population(hammingIndex.chromosomeValues()[numpyGenerator.integers(0, len(hammingIndex), size=operations)])
+        distanceTotal = 0
+        for queryValues in queries.mutatedChildren(numpyGenerator).chromosomeValues:
+            distanceTotal += int(hammingIndex.nearest(queryValues, 10)[1][-1])
+        return {"genomes": len(hammingIndex), "tenthNearestDistance": distanceTotal / operations}
+
+    def _benchmarkHammingContains(self, randomGenerator, operations):
+        (hammingIndex, numpyGenerator) = self._lineageIndex(randomGenerator)
+        queries = Population(hammingIndex.chromosomeValues()[numpyGenerator.integers(0, len(hammingIndex), size=operations)])
+        containedCount = 0
+        for queryValues in queries.mutatedChildren(numpyGenerator).chromosomeValues:
+            containedCount += hammingIndex.contains(queryValues)
+        return {"genomes": len(hammingIndex), "containedRatio": containedCount / operations}
+
+    def _benchmarkChildSegmentPositions(self, randomGenerator, operations):
+        chromosomes = self._randomChromosomes(randomGenerator, min(operations, 1000))
+        pen = StubPen()
+        pen.setposition(0, 0)
+        pen.setheading(90)
+        penPosition = PenPosition(pen)
+        childCount = 0
+        for operation in range(operations):
+            childCount += len(chromosomes[operation % len(chromosomes)].childSegmentPositions(penPosition))
+        return {"childrenPerCall": childCount / operations}
+
+    def _benchmarkSegmentOutOfBounds(self, randomGenerator, operations):
+        # Small enough that the longest segments run out of it
+        creaturePanel = self._stubPanel(40, 40)
+        chromosomes = self._randomChromosomes(randomGenerator, min(operations, 1000))
+        pen = StubPen()
+        pen.setposition(creaturePanel.xCenter, creaturePanel.yCenter)
+        pen.setheading(90)
+        penPosition = PenPosition(pen)
+        outOfBoundsCount = 0
+        for operation in range(operations):
+            if chromosomes[operation % len(chromosomes)].segmentOutOfBounds(creaturePanel, penPosition):
+                outOfBoundsCount += 1
+        return {"outOfBoundsRatio": outOfBoundsCount / operations}
+
+    def _benchmarkCreatureDisplay(self, randomGenerator, operations):
+        creaturePanel = self._stubPanel(200, 200)
+        genotypes = self._randomGenotypes(randomGenerator, operations)
+        drawnCount = 0
+        segmentCount = 0
+        for genotype in genotypes:
+            creature = Creature(genotype)
+            if creature.display(creaturePanel):
+                drawnCount += 1
+                segmentCount += creature.layout(creaturePanel.geometry).segmentCount()
+        return {"rejectionRatio": 1 - (drawnCount / operations),
+                "segmentsPerDrawnCreature": segmentCount / max(drawnCount, 1)}
+
+    def _displayCreatureBenchmark(self, screenWidth, screenHeight, rows, columns, bred):
+        """ Return a benchmark that fills every panel of a display through CreaturePanel.displayCreature.
+
+            One operation fills one panel.  Without a parent panels get random creatures,
+            otherwise mutated children of a parent that fits, found by the screener's retry loop.
+        """
+        def benchmark(randomGenerator, operations):
+            random.seed(randomGenerator.getrandbits(64))
+            displayModule = self._displayModule()
+            creatureDisplay = stubCreatureDisplay(displayModule, screenWidth, screenHeight, rows, columns)
+            creatureDisplay.screener = ViabilityScreener(randomGenerator=numpy.random.default_rng(randomGenerator.getrandbits(64)))
+            if bred:
+                creatureDisplay.parentCreature = creatureDisplay.screener.findViable(creatureDisplay.panelGeometry)
+            filledCount = 0
+            for operation in range(operations):
+                creatureIndex = operation % creatureDisplay.creatureCount
+                creatureDisplay.creatureArray[creatureIndex] = None
+                creatureDisplay.creaturePanelArray[creatureIndex].displayCreature()
+                if (creatureDisplay.creatureArray[creatureIndex] != None):
+                    filledCount += 1
+            rejectionRate = creatureDisplay.screener.rejectionRate(creatureDisplay.panelGeometry)
+            return {"filledRatio": filledCount / operations,
+                    "screenerRejectionRatio": rejectionRate}
+        return benchmark
+
+    def _displayModule(self):
+        """ Return the display module, loading it the first time. """
+        if (self._loadedDisplayModule == None):
+            self._loadedDisplayModule = loadDisplayModule()
+        return self._loadedDisplayModule
+
+    def _stubPanel(self, interiorWidth, interiorHeight):
+        """ Return a single panel of a display with the given interior size. """
+        displayModule = self._displayModule()
+        creatureDisplay = stubCreatureDisplay(displayModule, 2 * interiorWidth, 2 * interiorHeight, 1, 1)
+        # Size the one panel exactly, since the header takes some of the screen
+        creatureDisplay.panelWidth = interiorWidth + (2 * creatureDisplay.PANEL_BORDER_WIDTH)
+        creatureDisplay.panelHeight = interiorHeight + (2 * creatureDisplay.PANEL_BORDER_WIDTH)
+        creatureDisplay.panelInteriorWidth = interiorWidth
+        creatureDisplay.panelInteriorHeight = interiorHeight
+        creatureDisplay.panelGeometry = PanelGeometry(interiorWidth, interiorHeight)
+        creatureDisplay._initializeScreenDivisions()
+        return creatureDisplay.creaturePanelArray[0]
+
+
+def compareWithBaseline(results, baseline, tolerance):
+    """ Return the benchmarks that got slower than the baseline by more than the tolerance.
+
+        Args:
+            results (BenchmarkResult[]): The current results.
+            baseline (dict): Results by name, as saved with --save-baseline.
+            tolerance (float): The fraction of baseline throughput that may be lost before it is a regression.
+
+        Returns:
+            tuple[]: (name, baselineThroughput, throughput) for each regression.
+    """
+    regressions = []
+    for result in results:
+        baselineResult = baseline.get(result.name)
+        if (baselineResult == None):
+            continue
+        if (result.throughput < (baselineResult["throughput"] * (1 - tolerance))):
+            regressions.append((result.name, baselineResult["throughput"], result.throughput))
+    return regressions
+
+
+def main(argv=None):
+    """ Run the benchmarks from the command line.  Returns the exit status, which is 1 on a regression. """
+    parser = argparse.ArgumentParser(description="Time the hot paths of growing, screening and drawing creatures.")
+    parser.add_argument("--filter", default=None, help="Only run benchmarks whose name contains this text.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplies the number of operations of every benchmark.")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the benchmark inputs.")
+    parser.add_argument("--baseline", default=None, help="JSON file of baseline results to compare with.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Fraction of baseline throughput that may be lost.")
+    parser.add_argument("--save-baseline", dest="saveBaseline", default=None, help="Write the results as a JSON baseline to this file.")
+    arguments = parser.parse_args(argv)
+
+    baseline = None
+    if (arguments.baseline != None):
+        with open(arguments.baseline) as baselineStream:
+            baseline = json.load(baselineStream)
+
+    suite = BenchmarkSuite(arguments.seed, arguments.scale)
+    results = suite.run(arguments.filter)
+
+    sys.stdout.write("%-44s %12s %12s %10s  %s\n" % ("benchmark", "ops/second", "bytes/op", "vs base", "details"))
+    for result in results:
+        comparison = ""
+        if ((baseline != None) and (result.name in baseline)):
+            comparison = "%9.2fx" % (result.throughput / baseline[result.name]["throughput"])
+        details = "  ".join("%s=%.3f" % (key, value) for (key, value) in sorted(result.details.items()))
+        sys.stdout.write("%-44s %12.1f %12.0f %10s  %s\n" % (result.name, result.throughput, result.bytesPerOperation,
+                                                              comparison, details))
+
+    if (arguments.saveBaseline != None):
+        with open(arguments.saveBaseline, "w") as baselineStream:
+            json.dump({result.name: result.asDict() for result in results}, baselineStream, indent=2, sort_keys=True)
+
+    if (baseline != None):
+        regressions = compareWithBaseline(results, baseline, arguments.tolerance)
+        for (name, baselineThroughput, throughput) in regressions:
+            sys.stdout.write("REGRESSION %s: %.1f ops/second, baseline %.1f\n" % (name, throughput, baselineThroughput))
+        if (len(regressions) > 0):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
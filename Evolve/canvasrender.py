@@ -0,0 +1,84 @@
+# Copyright 2015 Brian Macker
+from creature import *
+from creature import _COSINE_TABLE, _SINE_TABLE
+
+
+class CanvasRenderer:
+    """ Class that draws laid out creatures straight onto the Tk canvas under a turtle screen.
+
+        Turtle draws a segment through a series of pen calls, and a circle as a polygon built
+        one step at a time.  This renderer instead issues one native canvas item per segment,
+        a line for a line and an oval for a dot or circle, in world coordinates converted the
+        same way turtle converts them.  Every item is tagged with its panel so a whole
+        creature can be deleted with a single call.
+
+        Attributes:
+            screen (turtle.TurtleScreen): The turtle screen being drawn on.
+            canvas (tkinter.Canvas): The canvas under the screen.
+    """
+
+    def __init__(self, screen):
+        """ Constructor for a CanvasRenderer.
+
+            Args:
+                screen (turtle.TurtleScreen): The turtle screen to draw on.  Its world coordinates must already be set.
+        """
+        self.screen = screen
+        self.canvas = screen.getcanvas()
+
+    @staticmethod
+    def panelTag(creaturePanel):
+        """ Return the canvas tag of every item drawn for the panel's creature. """
+        return "creaturePanel%d" % creaturePanel.creatureIndex
+
+    def drawCreature(self, creaturePanel, layout):
+        """ Draw a laid out creature in its panel.
+
+            Args:
+                creaturePanel (CreaturePanel): The panel the creature was laid out for.
+                layout (PhenotypeLayout): The viable layout of the creature.
+        """
+        canvas = self.canvas
+        tags = (self.panelTag(creaturePanel),)
+        # Turtle maps world coordinates onto the canvas by scaling, with y pointing down
+        xScale = self.screen.xscale
+        yScale = self.screen.yscale
+        xCenter = creaturePanel.xCenter
+        yCenter = creaturePanel.yCenter
+
+        for segment in layout.segments():
+            chromosome = segment.chromosome
+
+            if (segment.shape == Chromosome._SHAPE__LINE_VALUE):
+                # Turtle passes the pen width and a round cap straight to the canvas line
+                canvas.create_line((xCenter + segment.xStart) * xScale, -(yCenter + segment.yStart) * yScale,
+                                   (xCenter + segment.xEnd) * xScale, -(yCenter + segment.yEnd) * yScale,
+                                   fill=chromosome.lineColor, width=chromosome.lineWidth,
+                                   capstyle="round", tags=tags)
+                continue
+
+            # A dot or circle is centered one radius ahead of where the segment starts
+            radius = segment.radius
+            xMiddle = (xCenter + segment.xStart + (radius * _COSINE_TABLE[segment.heading])) * xScale
+            yMiddle = -(yCenter + segment.yStart + (radius * _SINE_TABLE[segment.heading])) * yScale
+
+            if (segment.shape == Chromosome._SHAPE_DOT_VALUE):
+                # A turtle dot is as wide in pixels as the segment is long, whatever the world scale
+                halfSize = chromosome.length / 2
+                canvas.create_oval(xMiddle - halfSize, yMiddle - halfSize, xMiddle + halfSize, yMiddle + halfSize,
+                                   fill=chromosome.lineColor, outline="", tags=tags)
+            else:
+                # A turtle circle has its radius in world units, so it is scaled like the lines
+                xRadius = radius * xScale
+                yRadius = radius * yScale
+                if (segment.shape == Chromosome._SHAPE_FILLED_CIRCLE_VALUE):
+                    fill = chromosome.fillColor
+                else:
+                    fill = ""
+                canvas.create_oval(xMiddle - xRadius, yMiddle - yRadius, xMiddle + xRadius, yMiddle + yRadius,
+                                   outline=chromosome.lineColor, fill=fill, width=max(chromosome.lineWidth, 1),
+                                   tags=tags)
+
+    def erase(self, creaturePanel):
+        """ Delete every item drawn for the panel's creature. """
+        self.canvas.delete(self.panelTag(creaturePanel))
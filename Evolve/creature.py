@@ -1,5 +1,14 @@
 # Copyright 2015 Brian Macker
 import random
+import math
+import array
+import collections
+import threading
+from metrics import *
+
+# Headings are always whole degrees so trigonometry can be looked up instead of computed
+_COSINE_TABLE = [math.cos(math.radians(degrees)) for degrees in range(360)]
+_SINE_TABLE = [math.sin(math.radians(degrees)) for degrees in range(360)]
 
 class PenPosition:
     """ Class used to remember the pen position, and chirality.
@@ -63,16 +72,98 @@ class PenPosition:
         return clonedPenPosition
 
 
+class LeastRecentlyUsedCache:
+    """ Class holding a bounded least recently used cache of values by key.
+
+        When the cache is full the value used least recently is evicted.
+
+        Attributes:
+            maxSize (int): The most values the cache holds.
+            hits (int): The number of lookups that found a cached value.
+            misses (int): The number of lookups that did not.
+            evictions (int): The number of values evicted to make room.
+    """
+
+    def __init__(self, maxSize):
+        """ Constructor for a LeastRecentlyUsedCache.
+
+            Args:
+                maxSize (int): The most values the cache holds.
+        """
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._values = collections.OrderedDict()
+        # Creatures may be bred on background threads
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._values)
+
+    def lookup(self, key):
+        """ Return the cached value for the key, or None if it is not cached. """
+        with self._lock:
+            value = self._values.get(key)
+            if (value == None):
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._values.move_to_end(key)
+            return value
+
+    def storeValue(self, key, value):
+        """ Cache the value for the key, evicting the least recently used one if the cache is full. """
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            while (len(self._values) > self.maxSize):
+                self._values.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """ Empty the cache and reset the statistics. """
+        with self._lock:
+            self._values.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def statistics(self):
+        """ Return the cache size and hit, miss and eviction counts as a dict. """
+        return {"size": len(self._values), "maxSize": self.maxSize,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class ChromosomeCache(LeastRecentlyUsedCache):
+    """ Class holding a bounded least recently used cache of chromosomes by value.
+
+        Chromosomes are immutable, so every creature of every generation can share the
+        one decoded chromosome for a value.  When the cache is full the chromosome used
+        least recently is evicted.  Creatures holding it keep it, it just stops being shared.
+    """
+
+    def store(self, chromosome):
+        """ Cache the chromosome by its value, evicting the least recently used one if the cache is full. """
+        self.storeValue(chromosome.chromosomeValue, chromosome)
+
+
 class Chromosome:
     """
     Class defining a single chromosome and how it creates the next segment(s).
 
     Note: Subclassed from printableAttributes for use when doing hardcoded debugging.
-    
+
+    Chromosomes are immutable values.  Constructing a chromosome for a value that is already
+    in Chromosome.cache returns the cached instance, so each value is decoded only once.
+
     @type chromosomeValue: int
     @param chromosomeValue: An integer value for the chromosome.  If not provided it will be randomly.  
     """
 
+    __slots__ = ("chromosomeValue", "branchAngle", "length", "symmetryBits", "branchCount", "terminated",
+                 "lineWidth", "lineColor", "fillColor", "shape")
+
     # Definition of genes in the chromosome and what they do
     _BRANCH_ANGLE_GENE_BITS          = 0x0000003F # Bits for angle from current direction to branch (max 128 degrees)
     _BRANCH_ANGLE_SHIFT_NUMBER       = 0          # Branch angle bits start at bit 0
@@ -89,6 +180,7 @@ class Chromosome:
     _SEGMENT_TERMINATION_GENE_BITS   = 0x00030000 # Branch count bits are overloaded as termination flag when zero
     _SEGMENT_TERMINATED              = 0x00000000 # Value of zero means terminate growth of creature at this chromosome
     _SEGMENT_TERMINATION_PREVENT     = 0x00010000 # To prevent termination set this to indicate one branch.  
+    _SINGLE_BRANCH_CLEAR             = 0x00022000 # Clearing these, with termination prevented, leaves one branch straight on or to the same side
     _SHAPE_GENE_BITS                 = 0x000C0000 # Bits that indicate shape   
     _SHAPE_SHIFT_NUMBER              = 18         # Shape bits start at bit 24
     _SHAPE__LINE_VALUE               = 0          # Shape: Line
@@ -101,68 +193,137 @@ class Chromosome:
     _LINE_COLOR_SHIFT_NUMBER         = 24         # Line color bits start at bit 24
     _FILL_COLOR_GENE_BITS            = 0x70000000 # Three bits for fill color giving 8 colors
     _FILL_COLOR_SHIFT_NUMBER         = 28         # Fill color bits start at bit 28
+    _UNUSED_GENE_BITS                = 0x88C0C800 # Bits 11, 14-15, 22-23, 27 and 31 belong to no gene
+    _LENGTH_LOWEST_BIT               = 0x00000040 # Circles are sized by half the length rounded down, so ignore this bit
 
     # Provide eight segment colors 
     _SEGMENT_COLORS = ["brown", "red", "orange", "yellow", "green", "blue", "purple", "white"]
     _MAX_COLORS = 8
 
+    #: ChromosomeCache: Chromosomes shared by value between all creatures
+    cache = ChromosomeCache(1 << 16)
+
     # Create a chromosome randomly if the integer value is not provided
-    def __init__(self, index, chromosomeValue = None):
+    def __new__(cls, index, chromosomeValue = None):
         """ Constructor for a Chromosome.
 
             Args:
                 index (int): The zero based chromosome number in the genome (list of all the creatures chromosomes)s.
+                    Chromosomes are shared between positions, so it is not stored.
                 chromosomeValue (int): The value of the chromosome.  Default = None will cause a randomly generated chromosome value.  
         """
 
-        # Store the chromosomes index into the genome
-        self._index = index
-
         # Store the chromosomes integer value
         if (chromosomeValue == None):
             chromosomeValue = random.randint(0,0xFFFFFFFF)
             # If this is the first chromosome then force it to be bilateral
             # for the sake of making things interesting at first
-            chromosomeValue |= self._SEGMENT_TERMINATION_PREVENT
+            chromosomeValue |= cls._SEGMENT_TERMINATION_PREVENT
 
-        self.chromosomeValue = chromosomeValue
+        # Share the chromosome already decoded for this value if there is one
+        chromosome = cls.cache.lookup(chromosomeValue)
+        if (chromosome == None):
+            chromosome = object.__new__(cls)
+            object.__setattr__(chromosome, "chromosomeValue", chromosomeValue)
+
+            # Now interpret the chromosome value
+            chromosome._interpretChromosomeValue()
+            cls.cache.store(chromosome)
+        return chromosome
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Chromosome is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Chromosome is immutable")
+
+    def __reduce__(self):
+        return (Chromosome, (0, self.chromosomeValue))
+
+    def __eq__(self, other):
+        return isinstance(other, Chromosome) and (self.chromosomeValue == other.chromosomeValue)
+
+    def __hash__(self):
+        return hash(self.chromosomeValue)
 
-        # Now interpret the chromosome value
-        self._interpretChromosomeValue()
-        
     def _interpretChromosomeValue(self):
         """
         Interpret the chromosome value generating the decoded instance attributes.
 
         This should only be run from the constructor.
         """
+        chromosomeValue = self.chromosomeValue
     
         # Extract branch angle.
         # The angle at which the next segment should diverge from the path of the prior segment.
-        self.branchAngle = (self.chromosomeValue & self._BRANCH_ANGLE_GENE_BITS) >> self._BRANCH_ANGLE_SHIFT_NUMBER
+        branchAngle = (chromosomeValue & self._BRANCH_ANGLE_GENE_BITS) >> self._BRANCH_ANGLE_SHIFT_NUMBER
         # Extract segment length
-        self.length = (self.chromosomeValue & self._LENGTH_GENE_BITS) >> self._LENGTH_SHIFT_NUMBER
+        length = (chromosomeValue & self._LENGTH_GENE_BITS) >> self._LENGTH_SHIFT_NUMBER
         # Extract symmetry information
-        self.symmetryBits = (self.chromosomeValue & self._SYMMETRY_GENE_BITS) >> self._SYMMETRY_SHIFT_NUMBER
+        symmetryBits = (chromosomeValue & self._SYMMETRY_GENE_BITS) >> self._SYMMETRY_SHIFT_NUMBER
         # Extract branch count information
-        self.branchCount = (self.chromosomeValue & self._BRANCH_COUNT_GENE_BITS) >> self._BRANCH_COUNT_SHIFT_NUMBER
-        if ((self.chromosomeValue & self._SEGMENT_TERMINATION_GENE_BITS) == self._SEGMENT_TERMINATED):
-            self.terminated = True
+        branchCount = (chromosomeValue & self._BRANCH_COUNT_GENE_BITS) >> self._BRANCH_COUNT_SHIFT_NUMBER
+        if ((chromosomeValue & self._SEGMENT_TERMINATION_GENE_BITS) == self._SEGMENT_TERMINATED):
+            terminated = True
         else:
-            self.terminated = False
+            terminated = False
         # Extract line width.  Number indicates how much to widen past on bit wide.
-        self.lineWidth  = 1 + (self.chromosomeValue & self._LINE_WIDTH_GENE_BITS) >> self._LINE_WIDTH_SHIFT_NUMBER
+        lineWidth  = 1 + (chromosomeValue & self._LINE_WIDTH_GENE_BITS) >> self._LINE_WIDTH_SHIFT_NUMBER
         # Extract line color
-        lineColorOffset  = (self.chromosomeValue & self._LINE_COLOR_GENE_BITS) >> self._LINE_COLOR_SHIFT_NUMBER
+        lineColorOffset  = (chromosomeValue & self._LINE_COLOR_GENE_BITS) >> self._LINE_COLOR_SHIFT_NUMBER
         lineColorOffset %= self._MAX_COLORS
-        self.lineColor = self._SEGMENT_COLORS[lineColorOffset]
+        lineColor = self._SEGMENT_COLORS[lineColorOffset]
         # Extract fill color
-        fillColorOffset  = (self.chromosomeValue & self._FILL_COLOR_GENE_BITS) >> self._FILL_COLOR_SHIFT_NUMBER
+        fillColorOffset  = (chromosomeValue & self._FILL_COLOR_GENE_BITS) >> self._FILL_COLOR_SHIFT_NUMBER
         fillColorOffset %= self._MAX_COLORS
-        self.fillColor = self._SEGMENT_COLORS[fillColorOffset]
+        fillColor = self._SEGMENT_COLORS[fillColorOffset]
         
         # Extract the shape
-        self.shape  = (self.chromosomeValue & self._SHAPE_GENE_BITS) >> self._SHAPE_SHIFT_NUMBER
+        shape  = (chromosomeValue & self._SHAPE_GENE_BITS) >> self._SHAPE_SHIFT_NUMBER
+
+        # The chromosome is immutable so the decoded attributes are set underneath __setattr__
+        object.__setattr__(self, "branchAngle", branchAngle)
+        object.__setattr__(self, "length", length)
+        object.__setattr__(self, "symmetryBits", symmetryBits)
+        object.__setattr__(self, "branchCount", branchCount)
+        object.__setattr__(self, "terminated", terminated)
+        object.__setattr__(self, "lineWidth", lineWidth)
+        object.__setattr__(self, "lineColor", lineColor)
+        object.__setattr__(self, "fillColor", fillColor)
+        object.__setattr__(self, "shape", shape)
+
+    def expressedValue(self):
+        """ Return the chromosome value with every bit that changes nothing about the segments it grows cleared. """
+        return self.chromosomeValue & self.expressedGeneBits()
+
+    def expressedGeneBits(self):
+        """ Return a mask of the bits of the chromosome value that change what it grows or how it is drawn.
+
+            Flipping any other bit leaves the creature looking exactly the same.  Whether
+            chromosomes after this one are expressed at all is up to the genotype.
+
+            Returns:
+                int: The mask.  Zero for a terminated chromosome.
+        """
+        # A terminated chromosome grows nothing, whatever its other genes
+        if (self.terminated):
+            return 0
+
+        expressedGeneBits = 0xFFFFFFFF & ~self._UNUSED_GENE_BITS
+        # Straight branches go on in the direction of the parent segment and never turn
+        if (self.symmetryBits == self._SYMMETRY_STRAIGHT_VALUE):
+            expressedGeneBits &= ~self._BRANCH_ANGLE_GENE_BITS
+        # Only a filled circle is filled
+        if (self.shape != self._SHAPE_FILLED_CIRCLE_VALUE):
+            expressedGeneBits &= ~self._FILL_COLOR_GENE_BITS
+        # A dot is drawn solid whatever the pen width
+        if (self.shape == self._SHAPE_DOT_VALUE):
+            expressedGeneBits &= ~self._LINE_WIDTH_GENE_BITS
+        # Circles are drawn and placed by their radius, unless straight branches are strung out by the whole length
+        if ((self.shape in (self._SHAPE_CIRCLE_VALUE, self._SHAPE_FILLED_CIRCLE_VALUE)) and
+                not ((self.symmetryBits == self._SYMMETRY_STRAIGHT_VALUE) and (self.branchCount > 1))):
+            expressedGeneBits &= ~self._LENGTH_LOWEST_BIT
+        return expressedGeneBits
 
     # Given a starting postion generate a list of starting positions for the segments
     def childSegmentPositions(self, priorSegmentEndingPenPosition):
@@ -245,9 +406,72 @@ class Chromosome:
                         # in the list of starting pen positions for this chromosome.
                         childSegmentStartingPenPositions.append(PenPosition(pen, startingchiralityRight))                    
 
-        # Return the list of starting pen positions for the child segements           
+        # Return the list of starting pen positions for the child segements
         return childSegmentStartingPenPositions
-            
+
+    def branchesPerSegment(self):
+        """ Return how many child segments this chromosome buds off the end of each prior segment. """
+        if (self.terminated):
+            return 0
+        if (self.symmetryBits == self._SYMMETRY_BILATERAL_VALUE):
+            return 2 * self.branchCount
+        return self.branchCount
+
+    # Pure math version of childSegmentPositions that never touches a pen
+    def childSegmentStarts(self, xPosition, yPosition, heading, chiralityRight):
+        """ Return the starts of the segments this chromosome will cause to bud off the end of the prior segment.
+
+            This computes exactly what childSegmentPositions does but without moving a pen,
+            so it can be used to lay out creatures that are never drawn.
+
+            Args:
+                xPosition (float): The x position of the end of the parent segment.
+                yPosition (float): The y position of the end of the parent segment.
+                heading (int): The heading of the parent segment.  0-360 with 90 being straight up.
+                chiralityRight (bool): The chirality of the parent segment.  True=right handed, False= left handed
+
+            Returns:
+                tuple[]: A list of (xPosition, yPosition, heading, chiralityRight) tuples, one for each child segment.
+        """
+
+        # Initially there are no child segments.
+        childSegmentStarts = []
+
+        # A terminated chromosome grows nothing
+        if (self.terminated):
+            return childSegmentStarts
+
+        # If the symmetry is straight forward then the branches are serially connected moving straight forward
+        if (self.symmetryBits == self._SYMMETRY_STRAIGHT_VALUE):
+            xStep = self.length * _COSINE_TABLE[heading]
+            yStep = self.length * _SINE_TABLE[heading]
+            for branchIndex in range(self.branchCount):
+                childSegmentStarts.append((xPosition + (xStep * branchIndex), yPosition + (yStep * branchIndex), heading, chiralityRight))
+            return childSegmentStarts
+
+        # Do the same handed side first, then the opposite side, just like childSegmentPositions
+        if (self.symmetryBits & self._SYMMETRY_SAME_HANDED_VALUE):
+            self._appendBranchStarts(childSegmentStarts, xPosition, yPosition, heading, chiralityRight)
+        if (self.symmetryBits & self._SYMMETRY_OPPOSITE_HANDED_VALUE):
+            self._appendBranchStarts(childSegmentStarts, xPosition, yPosition, heading, not chiralityRight)
+
+        # Return the list of child segment starts
+        return childSegmentStarts
+
+    def _appendBranchStarts(self, childSegmentStarts, xPosition, yPosition, heading, chiralityRight):
+        """ Append the starts of branches fanning out to one side of the parent segment.
+
+            Each branch diverges by the branch angle from the one before it.  A right turn
+            lowers the heading and a left turn raises it, matching the turtle.
+        """
+        if (chiralityRight):
+            turn = -self.branchAngle
+        else:
+            turn = self.branchAngle
+        for branchIndex in range(self.branchCount):
+            heading = (heading + turn) % 360
+            childSegmentStarts.append((xPosition, yPosition, heading, chiralityRight))
+
 
 
     # Test a single segment constructed from this chromosome to see if it runs past the panel boundaries
@@ -389,62 +613,123 @@ class Genotype:
         Note: Subclassed from printableAttributes for use when doing hardcoded debugging.
 
         Attributes: 
-            chromosomes (Chromosome[]): A array of CHROMOSOME_COUNT initial chromosomes for the genotype.
+            chromosomes (Chromosome[]): A array of initial chromosomes for the genotype, CHROMOSOME_COUNT unless another depth was chosen.
                 If not provided it will be randomly generated. 
     """
     
-    CHROMOSOME_COUNT = 4      # Creatures have a fixed number of chromosomes.  The depth of segment drawing is limited by this.
+    CHROMOSOME_COUNT = 4      # Creatures have this many chromosomes unless another depth is chosen.  The depth of segment drawing is limited by this.
+    MAX_CHROMOSOME_COUNT = 16 # The deepest genotype that can be chosen.  The creature segment budget keeps deep creatures cheap to lay out.
+    BRANCHING_DEPTH = 4       # Random chromosomes deeper than this grow a single segment off each prior one, so deep creatures fit the segment budget
     MUTATION_RATE_MAXIMUM = 2 # The maximum number of mutations that occur during reproduction
 
     # Constructor for the genotype
-    def __init__(self, chromosomes = None):
+    def __init__(self, chromosomes = None, chromosomeCount = None):
         """ Constructor for a Genotype.  A genotype being a list of chromosomes.
 
             Args:
                 chromosomes (Chromosome[]): The creatures genotype as an list of chromosomes.  If not provided it will be randomly generated.
+                chromosomeCount (int): The number of chromosomes of a randomly generated genotype.  Default = None uses CHROMOSOME_COUNT.
+                    Provided chromosomes of another count are replaced by random ones.
         """
+        if (chromosomeCount == None):
+            chromosomeCount = self.CHROMOSOME_COUNT if (chromosomes == None) else len(chromosomes)
+        self.checkChromosomeCount(chromosomeCount)
 
         # If the chromosomes were not provided, or had an improper count then
-        if ((chromosomes == None) or (len(chromosomes) != self.CHROMOSOME_COUNT)):
-            # Generate random chromosomes
-            self.chromosomes = [Chromosome(chromosomeIndex) for chromosomeIndex in range(self.CHROMOSOME_COUNT)]
+        if ((chromosomes == None) or (len(chromosomes) != chromosomeCount)):
+            # Generate random chromosomes, drawing the bits of them all at once.  Random chromosomes never terminate growth,
+            # and those past the branching depth do not branch, otherwise deep creatures almost never fit.
+            randomBits = random.getrandbits(32 * chromosomeCount)
+            chromosomeValues = [((randomBits >> (32 * chromosomeIndex)) & 0xFFFFFFFF) | Chromosome._SEGMENT_TERMINATION_PREVENT
+                                for chromosomeIndex in range(chromosomeCount)]
+            for chromosomeIndex in range(self.BRANCHING_DEPTH, chromosomeCount):
+                chromosomeValues[chromosomeIndex] &= ~Chromosome._SINGLE_BRANCH_CLEAR
+            self.chromosomes = [Chromosome(chromosomeIndex, chromosomeValue) for chromosomeIndex, chromosomeValue in enumerate(chromosomeValues)]
         # Otherwise use the provided chromosomes
         else:
             self.chromosomes = chromosomes
 
-    def mutatedCopy(self):
+    @classmethod
+    def checkChromosomeCount(cls, chromosomeCount):
+        """ Raise ValueError unless genotypes can have the number of chromosomes.
+
+            Args:
+                chromosomeCount (int): The number of chromosomes.  From 1 up to MAX_CHROMOSOME_COUNT.
+        """
+        if ((chromosomeCount < 1) or (chromosomeCount > cls.MAX_CHROMOSOME_COUNT)):
+            raise ValueError("a genotype has from 1 to %d chromosomes, not %d" % (cls.MAX_CHROMOSOME_COUNT, chromosomeCount))
+
+    def mutatedCopy(self, randomGenerator=None):
         """ Generate a mutated copy of this genotype.
 
+            Args:
+                randomGenerator (random.Random): The generator mutations are drawn from.  Default = None uses the random module.
+
             Returns:
                 A child decendant genotype with up to MUTATION_RATE_MAXIMUM point mutations.
         """
+        if (randomGenerator == None):
+            randomGenerator = random
+        chromosomeCount = len(self.chromosomes)
+
         # Copy chromosome values into an array
-        mutatedChromosomeValues = [self.chromosomes[chromosomeIndex].chromosomeValue for chromosomeIndex in range(self.CHROMOSOME_COUNT)]
+        mutatedChromosomeValues = [self.chromosomes[chromosomeIndex].chromosomeValue for chromosomeIndex in range(chromosomeCount)]
 
         # Determine the number of mutations to occur
-        mutationNumber = random.randint(1, self.MUTATION_RATE_MAXIMUM)
+        mutationNumber = randomGenerator.randint(1, self.MUTATION_RATE_MAXIMUM)
 
         # Generate that number of mutations randomly throughout the genotypes chromosomes
         for mutationCount in range(mutationNumber):
             # Randomly select chromosome to mutate
-            chromosomeIndex = random.randint(0, self.CHROMOSOME_COUNT - 1)
+            chromosomeIndex = randomGenerator.randint(0, chromosomeCount - 1)
 
             # Modify random bit of the 32 bits to modify
             # Do this by randomly generating a number from 0 to 31
             # Then shift a 1 bit to that bit location
             # Finally to an exclusive or to flip that bit to the opposite value
-            mutatedChromosomeValues[chromosomeIndex] ^= (1 << random.randint(0, 31))
+            mutatedChromosomeValues[chromosomeIndex] ^= (1 << randomGenerator.randint(0, 31))
 
         # Generate new copy of old chromosomes
-        newChromosomes = [self.chromosomes[chromosomeIndex] for chromosomeIndex in range(self.CHROMOSOME_COUNT)]
+        newChromosomes = [self.chromosomes[chromosomeIndex] for chromosomeIndex in range(chromosomeCount)]
 
         # Where the chromosome has mutated from the old chromosome replace with mutated copy
-        for chromosomeIndex in range(self.CHROMOSOME_COUNT):
+        for chromosomeIndex in range(chromosomeCount):
             if (newChromosomes[chromosomeIndex].chromosomeValue != mutatedChromosomeValues[chromosomeIndex]):
                newChromosomes[chromosomeIndex] = Chromosome(chromosomeIndex, mutatedChromosomeValues[chromosomeIndex])
 
         # Return a new genotype with the mutated chromosomes
         return Genotype(newChromosomes)
+
+    def expressedKey(self):
+        """ Return a key that is the same for two genotypes exactly when their creatures look the same.
+
+            Each chromosome contributes its expressed value.  Growth stops at the first
+            terminated chromosome, so it and every chromosome after it contribute zero.
+
+            Returns:
+                tuple: One expressed chromosome value for each chromosome.
+        """
+        expressedValues = []
+        for chromosome in self.chromosomes:
+            if (chromosome.terminated):
+                break
+            expressedValues.append(chromosome.expressedValue())
+        expressedValues.extend([0] * (len(self.chromosomes) - len(expressedValues)))
+        return tuple(expressedValues)
+
+    def lowestDifferingChromosome(self, otherGenotype):
+        """ Return the index of the first chromosome whose value differs from the other genotype's.
+
+            Args:
+                otherGenotype (Genotype): The genotype to compare with.
+
+            Returns:
+                int: The index, or the number of chromosomes if they are all the same.
+        """
+        for chromosomeIndex, (chromosome, otherChromosome) in enumerate(zip(self.chromosomes, otherGenotype.chromosomes)):
+            if (chromosome.chromosomeValue != otherChromosome.chromosomeValue):
+                return chromosomeIndex
+        return len(self.chromosomes)
         
         
            
@@ -455,106 +740,742 @@ class Creature:
     _MAX_CHROMOSOME_SEGMENTS = 32 # Maximum number of segments a chromosome can generate for the phenotype of the creature.
                                   # A chromosome that generates more than this number of segments will cause creature death.
                                   # This is provided to restrict the duration of creature construction to enhance performance.
+    _MAX_CREATURE_SEGMENTS = 128  # Maximum number of segments all chromosomes together can generate.  Deep genotypes could
+                                  # otherwise grow _MAX_CHROMOSOME_SEGMENTS at every level.  Four chromosomes never reach it.
+
+    #: LeastRecentlyUsedCache: Layouts shared between creatures that look the same, by expressed key and geometry
+    layoutCache = LeastRecentlyUsedCache(1 << 12)
     
-    def __init__(self, genotype=None):
+    def __init__(self, genotype=None, chromosomeCount=None):
         """ Constructor for a creature.  A genotype being a list of chromosomes.
 
             Args:
                 genotype (Genotype): The creatures genotype.  If not provided it will be randomly generated.
+                chromosomeCount (int): The number of chromosomes of a randomly generated genotype.  Default = None uses Genotype.CHROMOSOME_COUNT.
         """
 
         # If not genotype is provided then
         if (genotype == None):
             # Assign a randomly generated genotypes
-            genotype = genotype=Genotype()
+            genotype = genotype=Genotype(chromosomeCount=chromosomeCount)
 
         # Use the genotype
         self.genotype = genotype
-        
-    def mutatedChild(self):
+
+        #: dict: Layouts of the creature already made, by PanelGeometry
+        self.layouts = {}
+        #: int: Index of the first chromosome that differs from the parent, or None if there is no known parent
+        self.lowestMutatedChromosome = None
+        # Layouts and expressed key of the parent that the layouts of this creature can start from
+        self._parentLayouts = None
+        self._parentExpressedKey = None
+        # Bound on the size of the creature, computed when first needed
+        self._reachBound = None
+        # Key of what the creature looks like, computed when first needed
+        self._expressedKey = None
+        #: int: Id of the creature in a LineageStore, or None if it has not been logged
+        self.lineageId = None
+        #: int: Id of the creature's parent in a LineageStore, or None if it has no logged parent
+        self.parentLineageId = None
+
+    def mutatedChild(self, randomGenerator=None):
         """ Generate a mutated child from the current creature
 
+            Args:
+                randomGenerator (random.Random): The generator mutations are drawn from.  Default = None uses the random module.
+
             Returns:
                 Creature: A slightly mutated child of this creature
         """
-        return Creature(self.genotype.mutatedCopy())
+        child = Creature(self.genotype.mutatedCopy(randomGenerator))
+        child.descendFrom(self)
+        return child
+
+    def descendFrom(self, parentCreature):
+        """ Record that this creature is a mutated child of the parent.
+
+            Segments grown by the chromosomes before the first mutated one are the same as
+            the parent's, so the parent's layouts are remembered and later reused up to that depth.
+
+            Args:
+                parentCreature (Creature): The parent this creature was mutated from.
+        """
+        self.lowestMutatedChromosome = self.genotype.lowestDifferingChromosome(parentCreature.genotype)
+        self._parentLayouts = parentCreature.layouts
+        self._parentExpressedKey = parentCreature.expressedKey()
+        self.parentLineageId = parentCreature.lineageId
+
+    def layout(self, geometry):
+        """ Lay out the creature's segments inside a panel of the given geometry without drawing anything.
+
+            The layout is cached on the creature, and shared through Creature.layoutCache with
+            every creature that has the same expressed key.  A child starts from the parent's cached
+            layout at the depth of its first mutated chromosome rather than laying out every level.
+
+            Args:
+                geometry (PanelGeometry): The interior size of the panel the creature must fit inside of.
+
+            Returns:
+                PhenotypeLayout: The layout, which records why the creature was rejected if it does not fit.
+        """
+        layout = self.layouts.get(geometry)
+        if (layout != None):
+            return layout
+
+        # A child that looks the same as its parent or a sibling was laid out already.
+        # Unrelated creatures almost never look the same, so they are not worth looking up.
+        cacheKey = None
+        if (self._parentLayouts != None):
+            cacheKey = (self.expressedKey(), geometry)
+            layout = self.layoutCache.lookup(cacheKey)
+        if (layout != None):
+            hotPathMetrics.count("layoutsShared")
+        else:
+            prefixLayout = None
+            if (self._parentLayouts != None):
+                prefixLayout = self._parentLayouts.get(geometry)
+
+            with hotPathMetrics.phase("layout"):
+                # A creature the reach bound rules out is rejected without laying out anything
+                reachBound = self.reachBound()
+                rejection = reachBound.rejectionFor(geometry)
+                if (rejection != None):
+                    layout = PhenotypeLayout.rejected(rejection)
+                # A child whose mutations cancelled out or changed nothing that shows looks exactly like its parent
+                elif ((prefixLayout != None) and (self.expressedKey() == self._parentExpressedKey)):
+                    layout = prefixLayout
+                # A creature that certainly fits still needs its segments placed, but not tested
+                else:
+                    layout = PhenotypeLayout(self.genotype, geometry, self._MAX_CHROMOSOME_SEGMENTS, self._MAX_CREATURE_SEGMENTS,
+                                             prefixLayout, self.lowestMutatedChromosome,
+                                             checkBounds=not reachBound.certainlyFits(geometry))
+            hotPathMetrics.recordLayout(layout)
+            if (cacheKey != None):
+                self.layoutCache.storeValue(cacheKey, layout)
+        self.layouts[geometry] = layout
+        return layout
+
+    def expressedKey(self):
+        """ Return the expressed key of the creature's genotype, computing it the first time.
+
+            Returns:
+                tuple: The key, the same for every creature that looks like this one.
+        """
+        if (self._expressedKey == None):
+            self._expressedKey = self.genotype.expressedKey()
+        return self._expressedKey
+
+    def reachBound(self):
+        """ Return the reach bound of the creature's genotype, computing it the first time.
+
+            Returns:
+                ReachBound: Segment counts and how far the creature can possibly reach.
+        """
+        if (self._reachBound == None):
+            self._reachBound = ReachBound(self.genotype, self._MAX_CHROMOSOME_SEGMENTS, self._MAX_CREATURE_SEGMENTS)
+        return self._reachBound
 
     # Display creature in panel and return true if successful
     def display(self, creaturePanel):
         """ Draw the creature into its own panel.  Return True if successful and False on failure.
 
-            Note: If a creature fails to draw then the calling function should eliminate it as uninteresting. 
+            Note: If a creature fails to draw then the calling function should eliminate it as uninteresting.
+
+            The creature is laid out with pure math first so a creature that does not fit
+            is rejected without ever touching the pen.
 
             Args:
                 creaturePanel (CreaturePanel): The creature panel which the creature must remain inside of.
-                
+
             Returns:
                 boolean: True if the creature was properly drawn.  False if the creature failed to draw.
         """
-        
-        
-        # Allocate an array with and equal number of empty subarrays as there are chromosomes
-        # The subarrays will be filled with pen positions for every segment drawn for a chromosome
-        # Later the array will allow the drawing of the creature by order of chromosome (instead of tree path order)
-        segmentPenPositions = [[] for chromosomeNumber in range(Genotype.CHROMOSOME_COUNT)]
-        chromosomes = self.genotype.chromosomes
-        startingPenPosition = creaturePanel.startingPenPosition()
-        segmentPenPositions[0].extend(chromosomes[0].childSegmentPositions(startingPenPosition))
-
-        # Get all initial pen positions for all segments for each chromosome
-        for chromosomeNumber in range(Genotype.CHROMOSOME_COUNT):
-            chromosomePenPositions = segmentPenPositions[chromosomeNumber]
-            # If too many segments then creature must die from using up resources before fully formed
-            if (len(chromosomePenPositions) > self._MAX_CHROMOSOME_SEGMENTS):
-                return False
 
-            # If no pen position were created for this chromosome then
-            if (len(chromosomePenPositions) == 0):
-                # If this is the first chromosome then terminate the creature
-                if chromosomeNumber == 0:
-                    return False
-                # Otherwise break out of the loop because there are no more segments to draw
-                else:
-                    break
-
-            # For each segments pen position being drawn for this chromosome
-            for segmentPenPosition in chromosomePenPositions:
-                # Get the chromosome
-                chromosome = chromosomes[chromosomeNumber]
-
-                # Pseudo-draw the segment at that position seeing if it runs out of bounds
-                # Actual pen postion after this call will be at end of segment
-                if chromosome.segmentOutOfBounds(creaturePanel, segmentPenPosition):
-                    # Creature failed to draw
-                    return False
-                
-                # Get the penPosition for the end of the current segment
-                segmentEndPenPosition = PenPosition(segmentPenPosition.pen, segmentPenPosition.chiralityRight)
-
-                # If this is not the last chromosome then
-                # Generate the positions for the segments sprouting from the end of this segment
-                # using the next chromosome.
-                if (chromosomeNumber < Genotype.CHROMOSOME_COUNT - 1):
-                    # Get the next chromosome
-                    nextChromosome = chromosomes[chromosomeNumber + 1]
-                    # Get the array of existing pen positions of the next chromosome that sprouted from other segments 
-                    nextChromosomePenPositions = segmentPenPositions[chromosomeNumber + 1]
-                    # Generate pen positions for the new chromosome off the end of this segment
-                    # then extend that next chromosomes list of positions with all of them
-                    nextChromosomePenPositions.extend(nextChromosome.childSegmentPositions(segmentEndPenPosition))
-        
+        # Lay out every segment, giving up if the creature does not fit
+        layout = self.layout(creaturePanel.geometry)
+        if (not layout.viable):
+            return False
 
         # Draw all segments for each chromosome
-        for chromosomeNumber in range(Genotype.CHROMOSOME_COUNT):
-            for segmentPenPosition in segmentPenPositions[chromosomeNumber]:
-                chromosome = chromosomes[chromosomeNumber]
-                chromosome.drawSingleSegment(creaturePanel, segmentPenPosition)
+        pen = creaturePanel.pen
+        with hotPathMetrics.phase("draw"):
+            for level in layout.segmentLevels:
+                chromosome = level.chromosome
+                for segmentPenPosition in level.penPositions(pen, creaturePanel.xCenter, creaturePanel.yCenter):
+                    chromosome.drawSingleSegment(creaturePanel, segmentPenPosition)
+        if hotPathMetrics.enabled:
+            hotPathMetrics.count("creaturesDrawn")
+            hotPathMetrics.count("segmentsDrawn", layout.segmentCount())
 
         # Creature successfully drawn
-        return True        
+        return True
 
-        
-        
-        
-        
 
+class Segment:
+    """ Class recording where a single segment of a creature lies.
+
+        Positions are relative to the center of the panel, which is where the creature starts growing.
+
+        Attributes:
+            chromosome (Chromosome): The chromosome that grew the segment.
+            chromosomeNumber (int): The zero based index of that chromosome in the genotype.
+            xStart (float): The x position the segment starts at.
+            yStart (float): The y position the segment starts at.
+            xEnd (float): The x position child segments bud off from.
+            yEnd (float): The y position child segments bud off from.
+            heading (int): The direction of the segment.  0-360 with 90 being straight up.
+            chiralityRight (bool): The chirality (handedness) of the segment.  True=right handed, False= left handed
+            shape (int): The shape value of the chromosome.
+            radius (int): The radius of a dot or circle.  Half the length of the segment.
+    """
+    __slots__ = ("chromosome", "chromosomeNumber", "xStart", "yStart", "xEnd", "yEnd",
+                 "heading", "chiralityRight", "shape", "radius")
+
+    def __init__(self, chromosome, chromosomeNumber, xStart, yStart, xEnd, yEnd, heading, chiralityRight):
+        """ Constructor for a Segment.
+
+            Args:
+                chromosome (Chromosome): The chromosome that grew the segment.
+                chromosomeNumber (int): The zero based index of that chromosome in the genotype.
+                xStart (float): The x position the segment starts at.
+                yStart (float): The y position the segment starts at.
+                xEnd (float): The x position child segments bud off from.
+                yEnd (float): The y position child segments bud off from.
+                heading (int): The direction of the segment.  0-360 with 90 being straight up.
+                chiralityRight (bool): The chirality (handedness) of the segment.
+        """
+        self.chromosome = chromosome
+        self.chromosomeNumber = chromosomeNumber
+        self.xStart = xStart
+        self.yStart = yStart
+        self.xEnd = xEnd
+        self.yEnd = yEnd
+        self.heading = heading
+        self.chiralityRight = chiralityRight
+        self.shape = chromosome.shape
+        self.radius = chromosome.length >> 1
+
+    def penPosition(self, pen, xOffset, yOffset):
+        """ Return a pen position for the start of this segment inside a panel.
+
+            Args:
+                pen (turtle): The pen being used
+                xOffset (float): The x position of the center of the panel.
+                yOffset (float): The y position of the center of the panel.
+
+            Returns:
+                PenPosition: The pen position the segment should be drawn from.
+        """
+        segmentPenPosition = PenPosition(pen, self.chiralityRight)
+        segmentPenPosition.xPosition = xOffset + self.xStart
+        segmentPenPosition.yPosition = yOffset + self.yStart
+        segmentPenPosition.heading = self.heading
+        return segmentPenPosition
+
+
+class SegmentLevel:
+    """ Class holding every segment a single chromosome grows, as compact columns preallocated for the whole level.
+
+        The number of segments at a level is known before any of them is placed, so each
+        column is allocated once at its full size.  A segment takes 35 bytes rather than
+        a Segment object and its floats, and Segment objects are only made when asked for.
+
+        Attributes:
+            chromosome (Chromosome): The chromosome that grew the segments.
+            chromosomeNumber (int): The zero based index of that chromosome in the genotype.
+            xStarts (array.array): The x position each segment starts at.
+            yStarts (array.array): The y position each segment starts at.
+            xEnds (array.array): The x position child segments bud off from.
+            yEnds (array.array): The y position child segments bud off from.
+            headings (array.array): The direction of each segment.  0-360 with 90 being straight up.
+            chiralities (bytearray): The chirality of each segment.  1=right handed, 0=left handed
+    """
+    __slots__ = ("chromosome", "chromosomeNumber", "xStarts", "yStarts", "xEnds", "yEnds", "headings", "chiralities")
+
+    def __init__(self, chromosome, chromosomeNumber, segmentCount):
+        """ Constructor for a SegmentLevel.  Every segment starts out zeroed.
+
+            Args:
+                chromosome (Chromosome): The chromosome that grows the segments.
+                chromosomeNumber (int): The zero based index of that chromosome in the genotype.
+                segmentCount (int): The number of segments at the level.
+        """
+        self.chromosome = chromosome
+        self.chromosomeNumber = chromosomeNumber
+        positionBytes = bytes(8 * segmentCount)
+        self.xStarts = array.array("d", positionBytes)
+        self.yStarts = array.array("d", positionBytes)
+        self.xEnds = array.array("d", positionBytes)
+        self.yEnds = array.array("d", positionBytes)
+        self.headings = array.array("H", bytes(2 * segmentCount))
+        self.chiralities = bytearray(segmentCount)
+
+    def __len__(self):
+        return len(self.chiralities)
+
+    def segment(self, index):
+        """ Return the segment at the index as a Segment. """
+        return Segment(self.chromosome, self.chromosomeNumber, self.xStarts[index], self.yStarts[index],
+                       self.xEnds[index], self.yEnds[index], self.headings[index], bool(self.chiralities[index]))
+
+    def segments(self):
+        """ Generate every segment of the level as a Segment, in drawing order. """
+        chromosome = self.chromosome
+        chromosomeNumber = self.chromosomeNumber
+        for (xStart, yStart, xEnd, yEnd, heading, chiralityRight) in zip(self.xStarts, self.yStarts, self.xEnds, self.yEnds,
+                                                                          self.headings, self.chiralities):
+            yield Segment(chromosome, chromosomeNumber, xStart, yStart, xEnd, yEnd, heading, chiralityRight == 1)
+
+    def penPositions(self, pen, xOffset, yOffset):
+        """ Generate a pen position for the start of every segment of the level inside a panel, in drawing order.
+
+            Args:
+                pen (turtle): The pen being used
+                xOffset (float): The x position of the center of the panel.
+                yOffset (float): The y position of the center of the panel.
+        """
+        for (xStart, yStart, heading, chiralityRight) in zip(self.xStarts, self.yStarts, self.headings, self.chiralities):
+            segmentPenPosition = PenPosition(pen, chiralityRight == 1)
+            segmentPenPosition.xPosition = xOffset + xStart
+            segmentPenPosition.yPosition = yOffset + yStart
+            segmentPenPosition.heading = heading
+            yield segmentPenPosition
+
+    def segmentRecords(self):
+        """ Return every segment of the level as a plain tuple, in drawing order. """
+        chromosomeNumber = self.chromosomeNumber
+        return [(chromosomeNumber, xStart, yStart, xEnd, yEnd, heading, bool(chiralityRight))
+                for (xStart, yStart, xEnd, yEnd, heading, chiralityRight)
+                in zip(self.xStarts, self.yStarts, self.xEnds, self.yEnds, self.headings, self.chiralities)]
+
+
+class PanelGeometry:
+    """ Class describing the interior of a creature panel relative to its center.
+
+        Panels of the same size share a geometry, so a layout made for one fits all of them.
+
+        Attributes:
+            interiorWidth (float): The width of the area the creature must fit inside of.
+            interiorHeight (float): The height of the area the creature must fit inside of.
+            leftX (float): The x position of the left interior edge relative to the center.
+            bottomY (float): The y position of the bottom interior edge relative to the center.
+            rightX (float): The x position of the right interior edge relative to the center.
+            topY (float): The y position of the top interior edge relative to the center.
+    """
+
+    def __init__(self, interiorWidth, interiorHeight):
+        """ Constructor for a PanelGeometry.
+
+            Args:
+                interiorWidth (float): The width of the area the creature must fit inside of.
+                interiorHeight (float): The height of the area the creature must fit inside of.
+        """
+        self.interiorWidth = interiorWidth
+        self.interiorHeight = interiorHeight
+        self.leftX = -interiorWidth / 2
+        self.bottomY = -interiorHeight / 2
+        self.rightX = interiorWidth / 2
+        self.topY = interiorHeight / 2
+
+    def __eq__(self, other):
+        return (isinstance(other, PanelGeometry) and
+                (self.interiorWidth == other.interiorWidth) and (self.interiorHeight == other.interiorHeight))
+
+    def __hash__(self):
+        return hash((self.interiorWidth, self.interiorHeight))
+
+
+class PhenotypeLayout:
+    """ Class that lays out every segment of a genotype using pure math.
+
+        This follows the same rules as growing a creature with the pen, so a layout is
+        viable exactly when the creature can be drawn.  No pen is used, which makes
+        rejecting a creature that does not fit cheap.
+
+        Attributes:
+            segmentLevels (SegmentLevel[]): The segments of each chromosome that grew any, in drawing order.
+            rejection (str): Why the creature was rejected, or None if it fits.
+    """
+
+    REJECTED_OUT_OF_BOUNDS = "out of bounds"
+    REJECTED_TOO_MANY_SEGMENTS = "too many segments"
+    REJECTED_FIRST_TERMINATED = "first chromosome terminated"
+
+    def __init__(self, genotype, geometry, maxSegments, maxCreatureSegments=None, prefixLayout=None, prefixDepth=0, checkBounds=True):
+        """ Constructor for a PhenotypeLayout.
+
+            Args:
+                genotype (Genotype): The genotype to lay out.
+                geometry (PanelGeometry): The interior size of the panel the creature must fit inside of.
+                maxSegments (int): The maximum number of segments a single chromosome may generate.
+                maxCreatureSegments (int): The maximum number of segments all chromosomes together may generate.
+                    Default = None only limits each chromosome.
+                prefixLayout (PhenotypeLayout): Layout of a genotype sharing the first prefixDepth chromosomes,
+                    made for the same geometry.  Default = None lays out every level.
+                prefixDepth (int): How many leading chromosomes the genotype shares with the prefix layout.
+                checkBounds (bool): False skips testing segments against the panel, for genotypes already known to fit.
+        """
+        self.segmentLevels = []
+        self.rejection = None
+        if (not checkBounds):
+            geometry = None
+        if (maxCreatureSegments == None):
+            maxCreatureSegments = maxSegments * len(genotype.chromosomes)
+        self._layOut(genotype.chromosomes, geometry, maxSegments, maxCreatureSegments, prefixLayout, prefixDepth)
+
+    @classmethod
+    def rejected(cls, rejection):
+        """ Return a layout with no segments for a creature already known to be rejected.
+
+            Args:
+                rejection (str): Why the creature was rejected.
+
+            Returns:
+                PhenotypeLayout: The rejected layout.
+        """
+        layout = cls.__new__(cls)
+        layout.segmentLevels = []
+        layout.rejection = rejection
+        return layout
+
+    @classmethod
+    def fromSegmentRecords(cls, genotype, segmentRecords):
+        """ Return the viable layout of a genotype rebuilt from the records made by segmentRecords.
+
+            Args:
+                genotype (Genotype): The genotype the records were laid out from.
+                segmentRecords (tuple[]): The segment records.
+
+            Returns:
+                PhenotypeLayout: The rebuilt layout.
+        """
+        levelRecords = [[] for chromosome in genotype.chromosomes]
+        for segmentRecord in segmentRecords:
+            levelRecords[segmentRecord[0]].append(segmentRecord)
+
+        layout = cls.__new__(cls)
+        layout.segmentLevels = []
+        layout.rejection = None
+        for (chromosomeNumber, records) in enumerate(levelRecords):
+            if (len(records) == 0):
+                break
+            level = SegmentLevel(genotype.chromosomes[chromosomeNumber], chromosomeNumber, len(records))
+            for (index, (recordNumber, xStart, yStart, xEnd, yEnd, heading, chiralityRight)) in enumerate(records):
+                level.xStarts[index] = xStart
+                level.yStarts[index] = yStart
+                level.xEnds[index] = xEnd
+                level.yEnds[index] = yEnd
+                level.headings[index] = heading
+                level.chiralities[index] = chiralityRight
+            layout.segmentLevels.append(level)
+        return layout
+
+    @property
+    def viable(self):
+        """ bool: True if the creature fits inside the panel. """
+        return self.rejection == None
+
+    def segmentRecords(self):
+        """ Return every segment as a plain tuple, compact enough to pass between processes or save.
+
+            Returns:
+                tuple[]: (chromosomeNumber, xStart, yStart, xEnd, yEnd, heading, chiralityRight) for each segment in drawing order.
+        """
+        segmentRecords = []
+        for level in self.segmentLevels:
+            segmentRecords.extend(level.segmentRecords())
+        return segmentRecords
+
+    def segments(self):
+        """ Generate every segment by order of chromosome, which is the order they are drawn in. """
+        for level in self.segmentLevels:
+            yield from level.segments()
+
+    def segmentCount(self):
+        """ Return the total number of segments in the layout. """
+        return sum(len(level) for level in self.segmentLevels)
+
+    def _layOut(self, chromosomes, geometry, maxSegments, maxCreatureSegments, prefixLayout, prefixDepth):
+        """ Lay out the segments level by level, stopping at the first reason to reject the creature.
+
+            The size of each level is known from its parent level before any of it is budded,
+            so a level that would break a segment limit is rejected without being built.
+        """
+        chromosomeCount = len(chromosomes)
+
+        # Segments of a level depend only on the chromosomes up to that level, so the levels
+        # the prefix finished laying out for shared chromosomes are reused as they are
+        firstLevel = 0
+        if (prefixLayout != None):
+            firstLevel = min(prefixDepth, len(prefixLayout.segmentLevels))
+            self.segmentLevels = prefixLayout.segmentLevels[:firstLevel]
+
+        # Every level was reused, so the outcome is the prefix's
+        if (firstLevel == chromosomeCount):
+            self.rejection = prefixLayout.rejection
+            return
+
+        # The creature starts in the center of the panel pointing up.
+        # Otherwise carry on budding from the ends of the last reused level.
+        if (firstLevel == 0):
+            parentLevel = self._ORIGIN_LEVEL
+        else:
+            parentLevel = self.segmentLevels[firstLevel - 1]
+        totalSegments = sum(len(level) for level in self.segmentLevels)
+
+        for chromosomeNumber in range(firstLevel, chromosomeCount):
+            chromosome = chromosomes[chromosomeNumber]
+            levelSegmentCount = len(parentLevel) * chromosome.branchesPerSegment()
+
+            # If too many segments then creature must die from using up resources before fully formed
+            if ((levelSegmentCount > maxSegments) or (totalSegments + levelSegmentCount > maxCreatureSegments)):
+                self.rejection = self.REJECTED_TOO_MANY_SEGMENTS
+                return
+
+            # If no segments were created for this chromosome then growth has ended
+            if (levelSegmentCount == 0):
+                # If this is the first chromosome then terminate the creature
+                if (chromosomeNumber == 0):
+                    self.rejection = self.REJECTED_FIRST_TERMINATED
+                return
+
+            level = SegmentLevel(chromosome, chromosomeNumber, levelSegmentCount)
+            self._budLevel(level, parentLevel)
+            if (not self._placeLevel(level, geometry)):
+                self.rejection = self.REJECTED_OUT_OF_BOUNDS
+                return
+
+            self.segmentLevels.append(level)
+            totalSegments += levelSegmentCount
+            parentLevel = level
+
+    @staticmethod
+    def _budLevel(level, parentLevel):
+        """ Fill in the starts of a level's segments, budded off the ends of the parent level's segments.
+
+            This is the columnar version of Chromosome.childSegmentStarts, and buds the same starts in the same order.
+        """
+        chromosome = level.chromosome
+        xStarts = level.xStarts
+        yStarts = level.yStarts
+        headings = level.headings
+        chiralities = level.chiralities
+        branchCount = chromosome.branchCount
+        index = 0
+
+        # Straight branches are serially connected moving straight forward
+        if (chromosome.symmetryBits == chromosome._SYMMETRY_STRAIGHT_VALUE):
+            length = chromosome.length
+            for (xPosition, yPosition, heading, chiralityRight) in zip(parentLevel.xEnds, parentLevel.yEnds,
+                                                                        parentLevel.headings, parentLevel.chiralities):
+                xStep = length * _COSINE_TABLE[heading]
+                yStep = length * _SINE_TABLE[heading]
+                for branchIndex in range(branchCount):
+                    xStarts[index] = xPosition + (xStep * branchIndex)
+                    yStarts[index] = yPosition + (yStep * branchIndex)
+                    headings[index] = heading
+                    chiralities[index] = chiralityRight
+                    index += 1
+            return
+
+        # The same handed side first, then the opposite side
+        sides = []
+        if (chromosome.symmetryBits & chromosome._SYMMETRY_SAME_HANDED_VALUE):
+            sides.append(0)
+        if (chromosome.symmetryBits & chromosome._SYMMETRY_OPPOSITE_HANDED_VALUE):
+            sides.append(1)
+        branchAngle = chromosome.branchAngle
+        for (xPosition, yPosition, parentHeading, parentChiralityRight) in zip(parentLevel.xEnds, parentLevel.yEnds,
+                                                                                parentLevel.headings, parentLevel.chiralities):
+            for flip in sides:
+                chiralityRight = parentChiralityRight ^ flip
+                # A right turn lowers the heading and a left turn raises it, matching the turtle
+                turn = -branchAngle if chiralityRight else branchAngle
+                heading = parentHeading
+                for branchIndex in range(branchCount):
+                    heading = (heading + turn) % 360
+                    xStarts[index] = xPosition
+                    yStarts[index] = yPosition
+                    headings[index] = heading
+                    chiralities[index] = chiralityRight
+                    index += 1
+
+    @staticmethod
+    def _placeLevel(level, geometry):
+        """ Fill in the ends of a level's segments.  Return False as soon as one runs out of bounds.
+
+            This is the pure math version of Chromosome.segmentOutOfBounds.  With no geometry the segments are not tested.
+        """
+        chromosome = level.chromosome
+
+        # Lines are tested at their end, dots and circles at their center against boundaries trimmed by the radius
+        if (chromosome.shape == chromosome._SHAPE__LINE_VALUE):
+            testDistance = chromosome.length
+            endDistance = chromosome.length
+            margin = 0
+        else:
+            testDistance = chromosome.length >> 1
+            endDistance = 2 * testDistance
+            margin = testDistance
+
+        xEnds = level.xEnds
+        yEnds = level.yEnds
+        segmentStarts = enumerate(zip(level.xStarts, level.yStarts, level.headings))
+        if (geometry == None):
+            for (index, (xStart, yStart, heading)) in segmentStarts:
+                xEnds[index] = xStart + (endDistance * _COSINE_TABLE[heading])
+                yEnds[index] = yStart + (endDistance * _SINE_TABLE[heading])
+            return True
+
+        leftX = geometry.leftX + margin
+        bottomY = geometry.bottomY + margin
+        rightX = geometry.rightX - margin
+        topY = geometry.topY - margin
+        for (index, (xStart, yStart, heading)) in segmentStarts:
+            xDirection = _COSINE_TABLE[heading]
+            yDirection = _SINE_TABLE[heading]
+            xTest = xStart + (testDistance * xDirection)
+            yTest = yStart + (testDistance * yDirection)
+            if ((xTest <= leftX) or (xTest >= rightX) or (yTest <= bottomY) or (yTest >= topY)):
+                return False
+            xEnds[index] = xStart + (endDistance * xDirection)
+            yEnds[index] = yStart + (endDistance * yDirection)
+        return True
+
+
+# The end of the segment every creature grows from, at the center of the panel pointing up and right handed
+PhenotypeLayout._ORIGIN_LEVEL = SegmentLevel(None, -1, 1)
+PhenotypeLayout._ORIGIN_LEVEL.headings[0] = 90
+PhenotypeLayout._ORIGIN_LEVEL.chiralities[0] = 1
+
+
+class ReachBound:
+    """ Class bounding how large a genotype's creature can be, computed from its decoded chromosomes alone.
+
+        Every segment a creature grows lies within reach of the center of its panel, where reach
+        is the sum over the growing levels of the furthest a level can carry on from the end of
+        its parent segment.  A creature whose reach is inside the panel certainly fits.  Segment
+        counts per level are exact, and a few cheap tests catch creatures that certainly do not fit.
+        Anything in between still has to be laid out.
+
+        Attributes:
+            levelSegmentCounts (int[]): The number of segments at each level that grows, up to the first rejected level.
+            reach (float): The furthest any segment can reach from the center of the panel.
+    """
+
+    # Allowance for the rounding of positions laid out with floating point math
+    _TOLERANCE = 1e-6
+
+    def __init__(self, genotype, maxSegments, maxCreatureSegments=None):
+        """ Constructor for a ReachBound.
+
+            Args:
+                genotype (Genotype): The genotype to bound.
+                maxSegments (int): The maximum number of segments a single chromosome may generate.
+                maxCreatureSegments (int): The maximum number of segments all chromosomes together may generate.
+                    Default = None only limits each chromosome.
+        """
+        if (maxCreatureSegments == None):
+            maxCreatureSegments = maxSegments * len(genotype.chromosomes)
+        self.levelSegmentCounts = []
+        self.reach = 0.0
+        # Rejection found from segment counts alone, and the level it happens at
+        self._countRejection = None
+        self._countRejectionLevel = None
+        # The level and radius of every dot or circle
+        self._radii = []
+
+        segmentCount = 1
+        totalSegments = 0
+        for (chromosomeNumber, chromosome) in enumerate(genotype.chromosomes):
+            segmentCount *= chromosome.branchesPerSegment()
+            totalSegments += segmentCount
+            if ((segmentCount > maxSegments) or (totalSegments > maxCreatureSegments)):
+                self._countRejection = PhenotypeLayout.REJECTED_TOO_MANY_SEGMENTS
+                self._countRejectionLevel = chromosomeNumber
+                break
+            if (segmentCount == 0):
+                if (chromosomeNumber == 0):
+                    self._countRejection = PhenotypeLayout.REJECTED_FIRST_TERMINATED
+                    self._countRejectionLevel = chromosomeNumber
+                break
+            self.levelSegmentCounts.append(segmentCount)
+
+            # Straight branches are strung out one after another from the end of the parent segment
+            if (chromosome.symmetryBits == chromosome._SYMMETRY_STRAIGHT_VALUE):
+                self.reach += (chromosome.branchCount - 1) * chromosome.length
+            if (chromosome.shape == chromosome._SHAPE__LINE_VALUE):
+                self.reach += chromosome.length
+            else:
+                radius = chromosome.length >> 1
+                self.reach += 2 * radius
+                self._radii.append((chromosomeNumber, radius))
+
+        # The first level grows straight from the center so its tests are exact
+        self._firstChromosome = genotype.chromosomes[0]
+
+    def segmentCount(self):
+        """ Return the total number of segments the creature grows, if it is not rejected for its segment counts. """
+        return sum(self.levelSegmentCounts)
+
+    def certainlyFits(self, geometry):
+        """ Return True if the creature is certain to fit inside the geometry.
+
+            Args:
+                geometry (PanelGeometry): The interior size of the panel the creature must fit inside of.
+        """
+        return ((self._countRejection == None) and
+                (self.reach < min(geometry.rightX, geometry.topY) - self._TOLERANCE))
+
+    def rejectionFor(self, geometry):
+        """ Return why the creature certainly cannot fit inside the geometry, or None if it might fit.
+
+            The reason is always the one laying the creature out would give.  A creature failing a
+            segment count after levels that might run out of bounds is left undecided, since
+            laying it out could find one of those levels out of bounds first.
+
+            Args:
+                geometry (PanelGeometry): The interior size of the panel the creature must fit inside of.
+        """
+        rejection = self._countRejection
+        rejectionLevel = self._countRejectionLevel
+
+        # A level certain to run out of bounds before the level failing its segment count is reported instead
+        outOfBoundsLevel = self._outOfBoundsLevel(geometry)
+        if ((outOfBoundsLevel != None) and ((rejectionLevel == None) or (outOfBoundsLevel < rejectionLevel))):
+            return PhenotypeLayout.REJECTED_OUT_OF_BOUNDS
+
+        # The levels before a failed segment count are all in reach, so they are known to fit only if that reach is
+        if ((rejectionLevel != None) and (rejectionLevel > 0) and
+                (self.reach >= min(geometry.rightX, geometry.topY) - self._TOLERANCE)):
+            return None
+        return rejection
+
+    def _outOfBoundsLevel(self, geometry):
+        """ Return the first level certain to run out of the geometry, or None. """
+        halfWidth = geometry.rightX
+        halfHeight = geometry.topY
+
+        # The first level starts at the center, tested at its end if a line and at its center if a dot or circle
+        if (len(self.levelSegmentCounts) > 0):
+            chromosome = self._firstChromosome
+            if (chromosome.shape == chromosome._SHAPE__LINE_VALUE):
+                testDistance = chromosome.length
+                margin = 0
+            else:
+                testDistance = chromosome.length >> 1
+                margin = testDistance
+            if (chromosome.symmetryBits == chromosome._SYMMETRY_STRAIGHT_VALUE):
+                # Straight branches stack straight up from the center
+                if (((chromosome.branchCount - 1) * chromosome.length) + testDistance >= halfHeight - margin + self._TOLERANCE):
+                    return 0
+            elif ((margin >= min(halfWidth, halfHeight)) or
+                  (testDistance >= math.hypot(halfWidth - margin, halfHeight - margin) + self._TOLERANCE)):
+                # However it turns, the first segment runs past every corner of the panel
+                return 0
+
+        # A dot or circle at least as wide as the panel cannot fit anywhere in it
+        for (chromosomeNumber, radius) in self._radii:
+            if ((radius >= halfWidth) or (radius >= halfHeight)):
+                return chromosomeNumber
+        return None
@@ -1,7 +1,20 @@
 # Copyright 2015 Brian Macker
+import os
+import sys
+import queue
+import concurrent.futures
 import turtle
 import math
+import numpy
 from creature import *
+from viability import *
+from neighbors import *
+from parallel import *
+from canvasrender import *
+from metrics import *
+from lineage import *
+from session import *
+from paging import *
 
 class CreaturePanel:
     """ Class to control a single creature display panel.
@@ -50,6 +63,19 @@ class CreaturePanel:
         #: int: The y position of the top interior edge of the blank area
         self.interiorTopY = exteriorBottomY + creatureDisplay.panelHeight - creatureDisplay.PANEL_BORDER_WIDTH
 
+        #: float: The x position of the center of the panel where creatures start growing
+        self.xCenter = exteriorLeftX + (creatureDisplay.panelWidth / 2)
+        #: float: The y position of the center of the panel where creatures start growing
+        self.yCenter = exteriorBottomY + (creatureDisplay.panelHeight / 2)
+        #: PanelGeometry: The interior of the panel relative to its center, used to lay out creatures
+        self.geometry = creatureDisplay.panelGeometry
+
+        #: turtle: The pen that draws in this panel.  Clearing it deletes everything it drew.
+        self.pen = turtle.Turtle()
+        self.pen.speed(0)           # Set the turtle to maximum speed
+        self.pen.hideturtle()
+        self.pen.setundobuffer(None)  # Nothing is ever undone, so keep no history of what was drawn
+
     def drawPanelBorder(self):
         """ Draw a border around this panel using the panel border attributes.
         """
@@ -58,8 +84,8 @@ class CreaturePanel:
                                       creatureDisplay.panelWidth, creatureDisplay.panelHeight,
                                       creatureDisplay.PANEL_BORDER_WIDTH,
                                       creatureDisplay.PANEL_BORDER_COLOR)
-    def erasePanel(self):
-        """ Erase the interior of the panel.
+    def drawPanelBackground(self):
+        """ Fill the interior of the panel with the background color.  Done once, since erasing deletes what is drawn on top.
         """
         creatureDisplay = self.creatureDisplay
         creatureDisplay.drawRectangle(self.exteriorLeftX + creatureDisplay.PANEL_BORDER_WIDTH,
@@ -67,6 +93,19 @@ class CreaturePanel:
                                       creatureDisplay.panelInteriorWidth, creatureDisplay.panelInteriorHeight,
                                       1,
                                       creatureDisplay.PANEL_BACKGROUND_COLOR, creatureDisplay.PANEL_BACKGROUND_COLOR)
+
+    def erasePanel(self):
+        """ Erase the interior of the panel.
+
+            Everything drawn in the panel is deleted from the canvas rather than painted over,
+            so the number of canvas items stays the same however long the display runs.
+        """
+        # Delete the creature and text drawn with this panel's pen
+        self.pen.clear()
+        # Creatures drawn straight onto the canvas are deleted by their tag
+        if (self.creatureDisplay.renderer != None):
+            self.creatureDisplay.renderer.erase(self)
+
     def leftClick(self):
         """ Handle a left click event inside the panel to make this a parent.
         
@@ -74,14 +113,14 @@ class CreaturePanel:
             for mutant children populated to all other panels.  It then labels the parent as such.
         """
         
-        # Make the creature on this panel the parent creature
-        self.creatureDisplay.makeParent(self.creatureIndex)
+        # Make the creature on this panel the parent creature.  Its children are bred in the background.
+        self.creatureDisplay.breedInBackground(self.creatureIndex)
 
         # Redrawn Parent to erase any text in panel
         self.erasePanel()
         self.displayCreature()
 
-        # Indicate this is the Parent
+        # Indicate this is the Parent.  It is relabeled if it turns out to have no children that fit at all.
         self.writePanelWord("Parent", "red")
 
     def rightClick(self):
@@ -107,7 +146,7 @@ class CreaturePanel:
 
         self.creatureDisplay.write(self.interiorLeftX + self.creatureDisplay.PANEL_TEXT_MARGIN,
                                    self.interiorBottomY,
-                                   word, color)
+                                   word, color, self.pen)
 
     def startingPenPosition(self):
         """ Return the starting pen position for the panels creature.
@@ -123,7 +162,7 @@ class CreaturePanel:
         yCenterPos = self.exteriorBottomY + (self.creatureDisplay.panelHeight / 2)
         
         # Get the pen and move it to the initial pen position for drawing a creature.
-        pen = self.creatureDisplay.pen
+        pen = self.pen
         pen.penup()                             # Don't accidentally draw as we move the pen
         pen.setposition(xCenterPos, yCenterPos) # Center the pen
         pen.setheading(90)                      # Point the pen up
@@ -131,48 +170,84 @@ class CreaturePanel:
         # Return a newly constructed pen position set to where the pen is currently positioned.
         return PenPosition(pen)
 
+    def drawCreature(self, creature):
+        """ Draw a creature in this panel.  Return True if successful and False if it does not fit.
+
+            Uses the display's canvas renderer when it has one, otherwise the creature draws itself with the pen.
+
+            Args:
+                creature (Creature): The creature to draw.
+
+            Returns:
+                boolean: True if the creature was drawn.
+        """
+        renderer = self.creatureDisplay.renderer
+        if (renderer == None):
+            if (not creature.display(self)):
+                return False
+        else:
+            layout = creature.layout(self.geometry)
+            if (not layout.viable):
+                return False
+            with hotPathMetrics.phase("draw"):
+                renderer.drawCreature(self, layout)
+            if hotPathMetrics.enabled:
+                hotPathMetrics.count("creaturesDrawn")
+                hotPathMetrics.count("segmentsDrawn", layout.segmentCount())
+
+        # Every creature shown is logged once, so the lineage of any parent picked is known
+        if (self.creatureDisplay.lineageStore != None):
+            self.creatureDisplay.lineageStore.logCreature(creature)
+        return True
+
     def displayCreature(self):
         """ Display the creature in its panel.  
 
             Displays the creature belonging to the panel and returns if it is successful.
-            If it fails to display because it is too big for the panel then it keep trying
-            with new creatures until it succeeds.  The successfully drawn new creature will
-            replace the original.  If a parent exists then the new creatures will
-            be mutated children of the parent, otherwise just new random creatures. 
+            If it fails to display because it is too big for the panel then it screens
+            new creatures until one fits or the screener's budget runs out.  The successfully
+            drawn new creature will replace the original.  If a parent exists then the new
+            creatures will be mutated children of the parent, otherwise just new random creatures.
+            If nothing fits in time the panel is left empty.
         """
         # Get the current creature for this panel
         creature = self.creatureDisplay.creatureArray[self.creatureIndex]
 
         # If we can display it then return
         if creature != None:
-            if creature.display(self):
+            if self.drawCreature(creature):
                 # Return because we are done
                 return None
         
         # Get the parent creature
         parentCreature = self.creatureDisplay.parentCreature
-        
-        # Loop forever until we can properly show a creature without it failing
-        # because it runs outside the borders, has too many segements, etc.
-        while True:
-            # Generate another creature
-            # If there is no parent then
-            if parentCreature == None:
-                # Generate a random creature
-                creature = Creature()
-            # Otherwise there is a parent so
-            else:
-                # Generate a mutated child of the parent
-                creature = parentCreature.mutatedChild()
+        neighborIndex = self.creatureDisplay.neighborIndex
+        screener = self.creatureDisplay.screener
+
+        # Find a new creature that fits the panel without growing too many segments, etc.
+        # If there is a parent it is a mutated child of the parent, otherwise just a random creature.
+        creature = None
+        with hotPathMetrics.phase("search"):
+            if (parentCreature != None):
+                # Children of an indexed parent are sampled straight from those known to fit
+                if ((neighborIndex != None) and (neighborIndex.parentCreature is parentCreature)):
+                    creature = neighborIndex.sampleChild(self.geometry, self.creatureDisplay.shownExpressedKeys())
+                # Otherwise screen batches of children.  The search is budgeted so it can never hang the display.
+                else:
+                    creature = screener.findViable(self.geometry, parentCreature)
 
-            # If the creature can be displayed then 
-            if creature.display(self):
-                # Save the good creature
-                self.creatureDisplay.creatureArray[self.creatureIndex] = creature
-
-                # Return because we are done
-                return None
+            # If there is no parent, or it has no children that fit, then settle for a random creature
+            if (creature == None):
+                creature = screener.findViable(self.geometry)
 
+        # If the creature can be displayed then save the good creature
+        if ((creature != None) and self.drawCreature(creature)):
+            self.creatureDisplay.creatureArray[self.creatureIndex] = creature
+            hotPathMetrics.count("panelsFilled")
+        # Otherwise leave the panel empty
+        else:
+            self.creatureDisplay.creatureArray[self.creatureIndex] = None
+            hotPathMetrics.count("panelsLeftEmpty")
 
         # Return
         return None
@@ -193,6 +268,7 @@ class CreatureDisplay():
     PANEL_BORDER_COLOR = "green"
     PANEL_BACKGROUND_COLOR = "black"
     PANEL_TEXT_MARGIN = 6     # Margin required between text and border
+    BREEDING_POLL_INTERVAL = 20     # Milliseconds between checks for creatures bred in the background
 
     #********************
     # Private attributes
@@ -203,17 +279,45 @@ class CreatureDisplay():
     _HEADER_BORDER_WIDTH = 3
     _HEADER_BORDER_COLOR = "light green"
     _HEADER_BACKGROUND_COLOR = "black"
+    _METRICS_TEXT_COLOR = "yellow"
+    _METRICS_REFRESH_INTERVAL = 1000  # Milliseconds between updates of the metrics line in the header
+    _PAGING_TEXT_COLOR = "light blue"
     _HEADER_TEXT = ["Left click a parent creature to breed child mutants to other boxes.",
                    "Right click on any creature to replace with a new random creature.",
                    "Right click to this header to replace all.  Press ESC to quit."]
     
-    def __init__(self, rows=2, columns=2):
+    def __init__(self, rows=2, columns=2, workerCount=None, seed=None, canvasRendering=True,
+                 showMetrics=False, metricsStream=None, lineageStore=None, session=None, chromosomeCount=None,
+                 pagedPopulationSize=None):
         """ Constructor for a CreaturePanel
 
             Args:
                 rows (int): How many rows of creature panels to display.
                 columns (int): How many columns of creature panels to display.
+                workerCount (int): How many worker processes find creatures for whole screens at once.
+                    Default = None uses one per core.  With only one, creatures are found on this process.
+                seed (int): Seed for the screeners' and worker processes' random streams.  Default = None picks one at random.
+                canvasRendering (bool): True draws creatures straight onto the Tk canvas, False draws them with the turtle pen.
+                showMetrics (bool): True records hot path metrics and shows a summary of them live in the header.
+                metricsStream (file): A text stream to record hot path metrics to as lines of JSON.  Default = None.
+                lineageStore (LineageStore): Store to log every creature shown to, with its parent.  Default = None logs nothing.
+                session (SessionSnapshot): A saved session to start from instead of random creatures.  It must
+                    have the same number of rows and columns.  Default = None.
+                chromosomeCount (int): The number of chromosomes of random creatures.  Default = None uses the
+                    session's, or Genotype.CHROMOSOME_COUNT without one.
+                pagedPopulationSize (int): The most creatures in a population browsed a page of panels at a
+                    time with the page and arrow keys.  Default = None shows only as many as there are panels.
+
+            Raises:
+                ValueError: If the session has a different number of rows, columns or chromosomes.
         """
+        if ((session != None) and ((session.rows != rows) or (session.columns != columns))):
+            raise ValueError("the session has %d x %d panels, not %d x %d" % (session.rows, session.columns, rows, columns))
+        if (chromosomeCount == None):
+            chromosomeCount = Genotype.CHROMOSOME_COUNT if (session == None) else session.chromosomeValues.shape[1]
+        elif ((session != None) and (session.chromosomeValues.shape[1] != chromosomeCount)):
+            raise ValueError("the session has %d chromosomes per creature, not %d" % (session.chromosomeValues.shape[1], chromosomeCount))
+        Genotype.checkChromosomeCount(chromosomeCount)
 
         # Initialize the turtle graphics window
         self.window = turtle.Screen()
@@ -229,9 +333,16 @@ class CreatureDisplay():
         self.pen.speed(0)           # Set the turtle to maximum speed
         self.pen.color("green")
         self.pen.hideturtle()
+
+        # Draws creatures with native canvas items instead of turtle pen calls
+        if canvasRendering:
+            self.renderer = CanvasRenderer(self.window)
+        else:
+            self.renderer = None
         self.rows = rows
         self.columns = columns
         self.creatureCount = rows * columns
+        self.chromosomeCount = chromosomeCount
 
         # The parent creature to use in generating children in empty panels during drawing process
         # Panels will empty on each generation caused by a mouse click, or if a creature dies for any reason
@@ -239,13 +350,63 @@ class CreatureDisplay():
         # None indicates that a random creature should be generated to fill an empty panel during drawing
         self.parentCreature = None
 
+        # Counters and timers of the hot paths, only recorded if asked for
+        self.showMetrics = showMetrics
+        if (showMetrics or (metricsStream != None)):
+            hotPathMetrics.enable(metricsStream)
+
+        # Log of every creature shown and the parent it was bred from
+        self.lineageStore = lineageStore
+
+        # Finds creatures that fit in the panels.  Breeding in the background has a screener of its own,
+        # since a screener is not safe to share between threads.  Every stream comes from the one seed.
+        (screenerSeed, breedingSeed, neighborSeed) = numpy.random.SeedSequence(seed).spawn(3)
+        self.screener = ViabilityScreener(randomGenerator=numpy.random.default_rng(screenerSeed), chromosomeCount=chromosomeCount)
+        self.breedingScreener = ViabilityScreener(randomGenerator=numpy.random.default_rng(breedingSeed), chromosomeCount=chromosomeCount)
+        # Samples children from every parent's index of children.  A numpy generator locks around each draw,
+        # so indexes used on the main loop and in the background can share it.  An index itself is not
+        # safe to share, since it caches which children fit, so only one thread uses it at a time.
+        self.neighborRandomGenerator = numpy.random.default_rng(neighborSeed)
+        # The viable children of the parent creature, indexed when it becomes the parent
+        self.neighborIndex = None
+        # Finds creatures for many panels at once on worker processes, if there are cores to spare
+        if (workerCount == None):
+            workerCount = os.cpu_count() or 1
+        if (workerCount > 1):
+            self.candidateGenerator = ParallelCandidateGenerator(workerCount, seed, chromosomeCount=chromosomeCount)
+        else:
+            self.candidateGenerator = None
+
+        # Breeding runs on a background thread so the main loop keeps handling clicks and keys
+        self._breedingExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        # Creatures bred in the background waiting to be drawn by the main loop, tagged with their run number.
+        # The parent's index of children is not queued, but handed over once the run is finished.
+        self._bredCreatures = queue.Queue()
+        # Number of the current breeding run.  Work tagged with any other number has been cancelled.
+        self._breedingRun = 0
+        # Panels still waiting for a creature from the current breeding run
+        self._pendingIndexes = set()
+        # Index of the parent of the current breeding run
+        self._breedingParentIndex = None
+
+        # A population larger than the grid is browsed a page at a time.  The parent keeps its panel.
+        self.pagedPopulationSize = pagedPopulationSize
+        self.pagedPopulation = None
+        self.firstShownIndex = 0
+        self._pagedParentIndex = None
+
         self._initializeHeaderSize()
         self._drawHeaderBox()
         self._initializePanelSize()
         self._initializeScreenDivisions()
-        self._initializeCreatures()
+        self._initializeCreatures(session)
         self.eraseAllCreaturePanels()
         self.drawAllCreaturePanels()
+        if (self.pagedPopulation != None):
+            self._updatePagingLine()
+            self._prefetchNextPage()
+        if ((session != None) and (session.parentIndex != None)):
+            self.creaturePanelArray[session.parentIndex].writePanelWord("Parent", "red")
         
         #***********************
         # Initialize the mouse
@@ -263,6 +424,12 @@ class CreatureDisplay():
         # Initalize various keys to terminate
         window.onkey(quitDisplay, "Escape")
         window.onkey(quitDisplay, "space")
+        # Initialize the keys that browse a paged population
+        if (pagedPopulationSize != None):
+            window.onkey(lambda: self.scrollCreatures(len(self._pagedPanelIndexes())), "Next")
+            window.onkey(lambda: self.scrollCreatures(-len(self._pagedPanelIndexes())), "Prior")
+            window.onkey(lambda: self.scrollCreatures(self.columns), "Down")
+            window.onkey(lambda: self.scrollCreatures(-self.columns), "Up")
         window.listen()   # Listen for key events
         
 
@@ -315,12 +482,21 @@ class CreatureDisplay():
         """ Initialize private attributes defining the size of display header. """
 
         # The height of the header with the border included
-        self._headerHeight = (self._HEADER_TEXT_LINE_HEIGHT * len(self._HEADER_TEXT)) + ((self._HEADER_BORDER_WIDTH + self._HEADER_TEXT_MARGIN)* 2);
+        self._headerHeight = (self._HEADER_TEXT_LINE_HEIGHT * self._headerTextLineCount()) + ((self._HEADER_BORDER_WIDTH + self._HEADER_TEXT_MARGIN)* 2);
         # The x position of the left edge of the header border
         self._headerLeftX = 0;
         # The y position of the bottom edge of the header border
         self._headerBottomY = self._screenheight - self._headerHeight + self.PANEL_BORDER_WIDTH;
         
+    def _headerTextLineCount(self):
+        """ Return the number of text lines in the header, including the metrics and paging lines if they are shown. """
+        lineCount = len(self._HEADER_TEXT)
+        if self.showMetrics:
+            lineCount += 1
+        if (self.pagedPopulationSize != None):
+            lineCount += 1
+        return lineCount
+
     def _initializePanelSize(self):
         """ Initialize public attributes defining the size of one creature panel. """
         
@@ -331,20 +507,25 @@ class CreatureDisplay():
         #: int: The interior width of one creature panel not including the border
         self.panelInteriorWidth = self.panelWidth - (2 * self.PANEL_BORDER_WIDTH)
         #: int: The interior height of one creature panel  not including the border
-        self.panelInteriorHeight = self.panelHeight - (2 * self.PANEL_BORDER_WIDTH)     
+        self.panelInteriorHeight = self.panelHeight - (2 * self.PANEL_BORDER_WIDTH)
+        #: PanelGeometry: The interior of every panel relative to its center
+        self.panelGeometry = PanelGeometry(self.panelInteriorWidth, self.panelInteriorHeight)
         
-    def write(self, x, y, text, color):
+    def write(self, x, y, text, color, pen=None):
         """ Write text at (x,y) location with the specified color.
             Args:
                 x (int): The x coordinate for the text
                 y (int): The y coordinate for the text
                 text (str): The text string to write
                 color (str): The text color
+                pen (turtle=None): The pen to write with.  Default is the display's own pen.
         """
-        self.pen.penup()            # Raise the pen to prevent unwanted drawing
-        self.pen.setposition(x, y)  # Place the pen at the position to write the text
-        self.pen.color(color)       # Set pen to text color
-        self.pen.write(text, align="left", font=("Courier", 14, "bold")) # Write the text
+        if (pen == None):
+            pen = self.pen
+        pen.penup()            # Raise the pen to prevent unwanted drawing
+        pen.setposition(x, y)  # Place the pen at the position to write the text
+        pen.color(color)       # Set pen to text color
+        pen.write(text, align="left", font=("Courier", 14, "bold")) # Write the text
 
     def drawLine(self, startx, starty, endx, endy, lineWidth, color):
         """ Draw a line as specified.
@@ -424,13 +605,56 @@ class CreatureDisplay():
                            self._HEADER_BACKGROUND_COLOR)
         headerTextLeftMargin = self._headerLeftX + self._HEADER_BORDER_WIDTH + self._HEADER_TEXT_MARGIN
         headerTextBottomMargin =  self._headerBottomY + self._HEADER_BORDER_WIDTH + self._HEADER_TEXT_MARGIN
-        headerTextLines = len(self._HEADER_TEXT)
-        for headerIndex in range(headerTextLines):
+        headerTextLines = self._headerTextLineCount()
+        for headerIndex in range(len(self._HEADER_TEXT)):
             headerText = self._HEADER_TEXT[headerIndex]
             self.write(headerTextLeftMargin,
                        headerTextBottomMargin  + (self._HEADER_TEXT_LINE_HEIGHT * (headerTextLines - 1 - headerIndex)),
                        headerText, self._HEADER_TEXT_COLOR)
 
+        # The metrics take the bottom line, written with a pen of their own so it can be rewritten as they change
+        if self.showMetrics:
+            self._metricsPen = turtle.Turtle()
+            self._metricsPen.speed(0)
+            self._metricsPen.hideturtle()
+            self._metricsPen.setundobuffer(None)
+            self._metricsPosition = (headerTextLeftMargin, headerTextBottomMargin)
+            self._updateMetricsLine()
+
+        # The paging line goes above the metrics, and is rewritten whenever another page is shown
+        if (self.pagedPopulationSize != None):
+            self._pagingPen = turtle.Turtle()
+            self._pagingPen.speed(0)
+            self._pagingPen.hideturtle()
+            self._pagingPen.setundobuffer(None)
+            self._pagingPosition = (headerTextLeftMargin,
+                                    headerTextBottomMargin + (self._HEADER_TEXT_LINE_HEIGHT if self.showMetrics else 0))
+            self._updatePagingLine()
+
+    def _updateMetricsLine(self):
+        """ Rewrite the metrics line of the header, then do so again after the refresh interval.
+        """
+        self._metricsPen.clear()
+        self.write(self._metricsPosition[0], self._metricsPosition[1],
+                   hotPathMetrics.summaryLine(), self._METRICS_TEXT_COLOR, self._metricsPen)
+        self.window.ontimer(self._updateMetricsLine, self._METRICS_REFRESH_INTERVAL)
+
+    def _updatePagingLine(self):
+        """ Rewrite the paging line of the header to show which creatures of the paged population are shown.
+        """
+        pagedPopulation = self.pagedPopulation
+        if (pagedPopulation == None):
+            text = "Finding creatures..." if (len(self._pendingIndexes) > 0) else "Left click a parent to browse pages of its children."
+        elif (len(pagedPopulation) == 0):
+            text = "No creatures fit.  Right click the header to try again."
+        else:
+            lastShownIndex = min(self.firstShownIndex + pagedPopulation.pageSize, len(pagedPopulation))
+            text = ("Creatures %d-%d of %d, page %d of %d.  Page Up/Down flip a page, Up/Down arrows scroll a row." %
+                    (self.firstShownIndex + 1, lastShownIndex, len(pagedPopulation),
+                     (self.firstShownIndex // pagedPopulation.pageSize) + 1, pagedPopulation.pageCount()))
+        self._pagingPen.clear()
+        self.write(self._pagingPosition[0], self._pagingPosition[1], text, self._PAGING_TEXT_COLOR, self._pagingPen)
+
     def _initializeCreaturePanel(self, creatureIndex):
         """ Initialize the creature panel corresponding to the creature at the index.
             
@@ -449,9 +673,10 @@ class CreatureDisplay():
         leftX = column * self.panelWidth
         bottomY = row * self.panelHeight
 
-        # Create the creature panel for that position and draw it's border to initialize the panel display
+        # Create the creature panel for that position and draw it's border and background to initialize the panel display
         creaturePanel = CreaturePanel(self, creatureIndex, leftX, bottomY)
         creaturePanel.drawPanelBorder()
+        creaturePanel.drawPanelBackground()
 
         # Return that creature panel
         return creaturePanel
@@ -461,10 +686,28 @@ class CreatureDisplay():
         """
         self.creaturePanelArray = [self._initializeCreaturePanel(creatureIndex) for creatureIndex in range(self.creatureCount)]
         
-    def _initializeCreatures(self):
+    def _initializeCreatures(self, session=None):
         """ Initialize the creatures and place them in the creature array.
+
+            Args:
+                session (SessionSnapshot): A saved session to take the creatures, parent and random state from.  Default = None.
         """
-        self.creatureArray=[Creature() for creatureIndex in range(self.creatureCount)]
+        # A saved session brings back its creatures already laid out, so nothing has to be searched for
+        if (session != None):
+            self.creatureArray = session.creatures()
+            if (session.parentIndex != None):
+                self.parentCreature = self.creatureArray[session.parentIndex]
+            session.restoreRandomState(self)
+        # A paged population has every panel's creature found already, and laid out a page at a time
+        elif (self.pagedPopulationSize != None):
+            self.pagedPopulation = PagedPopulation.random(self.screener, self.pagedPopulationSize,
+                                                          self.creatureCount, self.panelGeometry)
+            self.creatureArray = self.pagedPopulation.creatures(0, self.creatureCount)
+        # With worker processes every panel gets a creature known to fit, found at the same time
+        elif (self.candidateGenerator != None):
+            self.creatureArray = self.candidateGenerator.generate(self.panelGeometry, self.creatureCount)
+        else:
+            self.creatureArray=[Creature(chromosomeCount=self.chromosomeCount) for creatureIndex in range(self.creatureCount)]
         
     def drawAllCreaturePanels(self):
         """ Display all the creatures in their panels.
@@ -481,44 +724,394 @@ class CreatureDisplay():
     def makeParent(self, parentIndex):
         """ Make the creature at the parent index into the parent of all other creatures.
             
+            Children are bred and drawn before this returns.  Use breedInBackground to keep
+            the display responsive while they are bred.
+
             Args:
                 parentIndex (int): The index of the creature iwhich becomes the parent.
         """
         
-        # Make the creature on this panel the parent creature
+        # Any breeding still in the background would overwrite these children
+        self.cancelBreeding()
+
+        with hotPathMetrics.phase("makeParent"):
+            # Make the creature on this panel the parent creature
+            if parentIndex in range(self.creatureCount):
+                self.parentCreature = self.creatureArray[parentIndex]
+            else:
+                self.parentCreature = None
+
+            # Index every child the parent can have so children are sampled from those that fit
+            if self.parentCreature != None:
+                with hotPathMetrics.phase("indexNeighbors"):
+                    self.neighborIndex = NeighborIndex(self.parentCreature, self.screener, self.neighborRandomGenerator)
+            else:
+                self.neighborIndex = None
+
+            # Children are kept from looking like the parent or each other where possible
+            shownKeys = set()
+            if self.parentCreature != None:
+                shownKeys.add(self.parentCreature.expressedKey())
+
+            # Kill every other creature and replace with a mutated child
+            for creatureIndex in range(self.creatureCount):
+                # If this is not the parent creature
+                if creatureIndex != parentIndex:
+                    # If there is a parent then replace with one of the parents mutated children that fits
+                    if self.parentCreature != None:
+                        self.creatureArray[creatureIndex] = self.neighborIndex.sampleChild(self.panelGeometry, shownKeys)
+                        if self.creatureArray[creatureIndex] != None:
+                            shownKeys.add(self.creatureArray[creatureIndex].expressedKey())
+                    # Otherwise create a brand new random creature
+                    else:
+                        self.creatureArray[creatureIndex] = Creature(chromosomeCount=self.chromosomeCount)
+                    
+                    # Erase the panel
+                    self.creaturePanelArray[creatureIndex].erasePanel()
+                    # Draw the new child
+                    self.creaturePanelArray[creatureIndex].displayCreature()
+
+        hotPathMetrics.emit("makeParent")
+
+    def breedInBackground(self, parentIndex):
+        """ Make the creature at the parent index into the parent of all other creatures, breeding in the background.
+
+            Returns at once.  The other panels are erased, and each is drawn by the main loop as
+            soon as its child is ready.  Breeding still in flight from an earlier call is cancelled.
+
+            Args:
+                parentIndex (int): The index of the creature which becomes the parent.
+        """
         if parentIndex in range(self.creatureCount):
             self.parentCreature = self.creatureArray[parentIndex]
         else:
             self.parentCreature = None
+        # The parent's children are indexed in the background
+        self.neighborIndex = None
 
-        # Kill every other creature and replace with a mutated child
-        for creatureIndex in range(self.creatureCount):
-            # If this is not the parent creature
-            if creatureIndex != parentIndex:
-                # If there is a parent then replace with the parents mutated child
-                if self.parentCreature != None:
-                    self.creatureArray[creatureIndex] = self.parentCreature.mutatedChild()
-                # Otherwise create a brand new random creature
-                else:
-                    self.creatureArray[creatureIndex] = Creature()
-                    
-                # Erase the panel
+        if (self.pagedPopulationSize != None):
+            self._startPagingRun(self.parentCreature, parentIndex)
+            return
+
+        childIndexes = [creatureIndex for creatureIndex in range(self.creatureCount) if creatureIndex != parentIndex]
+        self._startBreedingRun(self.parentCreature, parentIndex, childIndexes)
+
+    def cancelBreeding(self):
+        """ Cancel any breeding still running in the background.  Children not yet drawn are discarded.
+        """
+        self._breedingRun += 1
+        self._pendingIndexes = set()
+
+    def _pagedPanelIndexes(self):
+        """ Return the indexes of the panels the pages of a paged population are shown in, which is all but the parent's.
+        """
+        return [creatureIndex for creatureIndex in range(self.creatureCount) if creatureIndex != self._pagedParentIndex]
+
+    def _startPagingRun(self, parentCreature, parentIndex):
+        """ Cancel any breeding in flight and start finding a paged population in the background.
+
+            The population is the parent's children that fit and look different, or random creatures without a parent.
+
+            Args:
+                parentCreature (Creature): The parent of the new creatures, or None for random creatures.
+                parentIndex (int): The index of the parent's panel, or None.
+        """
+        self.cancelBreeding()
+        breedingRun = self._breedingRun
+        self.pagedPopulation = None
+        self.firstShownIndex = 0
+        self._pagedParentIndex = parentIndex
+        self._breedingParentIndex = parentIndex
+        self._pendingIndexes = set(self._pagedPanelIndexes())
+
+        # Empty the panels now so children of an earlier parent are not mistaken for new ones
+        for creatureIndex in self._pendingIndexes:
+            self.creatureArray[creatureIndex] = None
+            self.creaturePanelArray[creatureIndex].erasePanel()
+        self._updatePagingLine()
+
+        pagingFuture = self._breedingExecutor.submit(self._findPagedPopulation, breedingRun, parentCreature,
+                                                     len(self._pendingIndexes))
+        self.window.ontimer(lambda: self._showFoundPopulation(breedingRun, pagingFuture), self.BREEDING_POLL_INTERVAL)
+
+    def _findPagedPopulation(self, breedingRun, parentCreature, pageSize):
+        """ Find a paged population and lay out its first page.  Runs on the background thread.
+
+            Args:
+                breedingRun (int): The number of the run the population is found for.
+                parentCreature (Creature): The parent of the new creatures, or None for random creatures.
+                pageSize (int): How many creatures are on a page.
+
+            Returns:
+                (NeighborIndex, PagedPopulation): The parent's index of children, or None without a parent, and the population.
+        """
+        geometry = self.panelGeometry
+        neighborIndex = None
+        pagedPopulation = None
+        if (parentCreature != None):
+            with hotPathMetrics.phase("indexNeighbors"):
+                neighborIndex = NeighborIndex(parentCreature, self.breedingScreener, self.neighborRandomGenerator)
+            if (not neighborIndex.sterile(geometry)):
+                pagedPopulation = PagedPopulation.children(neighborIndex, pageSize, geometry, self.pagedPopulationSize)
+
+        # If there is no parent, or it has no children that fit, then settle for random creatures
+        if ((pagedPopulation == None) and (breedingRun == self._breedingRun)):
+            with hotPathMetrics.phase("search"):
+                pagedPopulation = PagedPopulation.random(self.breedingScreener, self.pagedPopulationSize, pageSize, geometry)
+        if (breedingRun == self._breedingRun):
+            pagedPopulation.prefetch(0, pageSize)
+        return (neighborIndex, pagedPopulation)
+
+    def _showFoundPopulation(self, breedingRun, pagingFuture):
+        """ Show the first page of a paged population once it is found.  Runs on the main loop from a timer.
+
+            Args:
+                breedingRun (int): The number of the run the population is found for.
+                pagingFuture (concurrent.futures.Future): The future of the background search.
+        """
+        # A newer run has its own timer
+        if (breedingRun != self._breedingRun):
+            return
+        if (not pagingFuture.done()):
+            self.window.ontimer(lambda: self._showFoundPopulation(breedingRun, pagingFuture), self.BREEDING_POLL_INTERVAL)
+            return
+
+        (self.neighborIndex, self.pagedPopulation) = pagingFuture.result()
+        self._pendingIndexes = set()
+        parentIndex = self._pagedParentIndex
+        if ((self.neighborIndex != None) and (parentIndex in range(self.creatureCount)) and
+                self.neighborIndex.sterile(self.panelGeometry)):
+            parentPanel = self.creaturePanelArray[parentIndex]
+            parentPanel.erasePanel()
+            parentPanel.displayCreature()
+            parentPanel.writePanelWord("Sterile Parent", "red")
+        self.showPagedCreatures()
+        hotPathMetrics.emit("breed")
+
+    def scrollCreatures(self, creatureCount):
+        """ Scroll the paged population by a number of creatures, a page or a row, and show them.
+
+            Scrolling stops at the first and last pages.  Does nothing until a paged population is found.
+
+            Args:
+                creatureCount (int): How many creatures to scroll forward by.  Negative scrolls back.
+        """
+        pagedPopulation = self.pagedPopulation
+        if (pagedPopulation == None):
+            return
+        lastFirstIndex = (pagedPopulation.pageCount() - 1) * pagedPopulation.pageSize
+        firstShownIndex = min(max(self.firstShownIndex + creatureCount, 0), lastFirstIndex)
+        if (firstShownIndex != self.firstShownIndex):
+            self.firstShownIndex = firstShownIndex
+            self.showPagedCreatures()
+
+    def showPagedCreatures(self):
+        """ Show the creatures of the paged population from the first shown index, then lay out the next page in the background.
+
+            Pages already laid out are drawn straight from the population's cache.
+        """
+        pagedPopulation = self.pagedPopulation
+        panelIndexes = self._pagedPanelIndexes()
+        with hotPathMetrics.phase("showPage"):
+            creatures = pagedPopulation.creatures(self.firstShownIndex, len(panelIndexes))
+            for (creatureIndex, creature) in zip(panelIndexes, creatures):
+                self.creatureArray[creatureIndex] = creature
                 self.creaturePanelArray[creatureIndex].erasePanel()
-                # Draw the new child
-                self.creaturePanelArray[creatureIndex].displayCreature()
+                if (creature != None):
+                    self.creaturePanelArray[creatureIndex].drawCreature(creature)
+            # Drawing logged the creatures, so keep their ids for when their page is laid out again
+            pagedPopulation.rememberLineageIds(self.firstShownIndex, creatures)
+        self._updatePagingLine()
+        self._prefetchNextPage()
+
+    def _prefetchNextPage(self):
+        """ Lay out the creatures after those shown in the background, so flipping to them is instant.
+        """
+        pageSize = self.pagedPopulation.pageSize
+        self._breedingExecutor.submit(self._prefetchPagedCreatures, self._breedingRun, self.pagedPopulation,
+                                      self.firstShownIndex + pageSize, pageSize)
+
+    def _prefetchPagedCreatures(self, breedingRun, pagedPopulation, firstIndex, count):
+        """ Lay out creatures of a paged population unless the run has been cancelled.  Runs on the background thread.
+
+            Args:
+                breedingRun (int): The number of the run the population was found for.
+                pagedPopulation (PagedPopulation): The population.
+                firstIndex (int): The index of the first creature.
+                count (int): The number of creatures.
+        """
+        if (breedingRun == self._breedingRun):
+            pagedPopulation.prefetch(firstIndex, count)
+
+    def _startBreedingRun(self, parentCreature, parentIndex, childIndexes):
+        """ Cancel any breeding in flight and start breeding creatures for the panels in the background.
+
+            Args:
+                parentCreature (Creature): The parent of the new creatures, or None for random creatures.
+                parentIndex (int): The index of the parent's panel, or None.
+                childIndexes (int[]): Indexes of the panels to breed creatures for.
+        """
+        self.cancelBreeding()
+        breedingRun = self._breedingRun
+        self._pendingIndexes = set(childIndexes)
+        self._breedingParentIndex = parentIndex
+
+        # Empty the panels now so children of an earlier parent are not mistaken for new ones
+        for creatureIndex in childIndexes:
+            self.creatureArray[creatureIndex] = None
+            self.creaturePanelArray[creatureIndex].erasePanel()
+
+        breedingFuture = self._breedingExecutor.submit(self._breedCreatures, breedingRun, parentCreature, childIndexes)
+        self.window.ontimer(lambda: self._drawBredCreatures(breedingRun, breedingFuture), self.BREEDING_POLL_INTERVAL)
+
+    def _breedCreatures(self, breedingRun, parentCreature, childIndexes):
+        """ Breed a creature for each panel and queue it for the main loop.  Runs on the background thread.
+
+            Nothing here may touch turtle graphics.  Each creature is laid out before it is queued,
+            so the main loop only has to draw it.  Stops early once the run is cancelled.
+
+            The parent's children are indexed and screened here, and only whether it is sterile is
+            queued.  The index caches which children fit as it is asked, and those caches are not
+            safe to share between threads, so the main loop takes it from the result once breeding is done.
+
+            Args:
+                breedingRun (int): The number of the run being bred.
+                parentCreature (Creature): The parent of the new creatures, or None for random creatures.
+                childIndexes (int[]): Indexes of the panels to breed creatures for.
+
+            Returns:
+                NeighborIndex: The parent's index of children, or None without a parent.
+        """
+        geometry = self.panelGeometry
+
+        # Random creatures for many panels are found on the worker processes, taken in the order they finish
+        if ((parentCreature == None) and (self.candidateGenerator != None)):
+            futures = self.candidateGenerator.submit(geometry, len(childIndexes))
+            creatureIndexes = dict(zip(futures, childIndexes))
+            for future in concurrent.futures.as_completed(futures):
+                if (breedingRun != self._breedingRun):
+                    for unfinishedFuture in futures:
+                        unfinishedFuture.cancel()
+                    return
+                creature = self.candidateGenerator.candidateFromResult(future.result(), geometry)
+                self._bredCreatures.put((breedingRun, creatureIndexes[future], creature))
+            return
+
+        # Index every child the parent can have so children are sampled from those that fit
+        neighborIndex = None
+        shownKeys = set()
+        if (parentCreature != None):
+            with hotPathMetrics.phase("indexNeighbors"):
+                neighborIndex = NeighborIndex(parentCreature, self.breedingScreener, self.neighborRandomGenerator)
+                sterile = neighborIndex.sterile(geometry)
+            self._bredCreatures.put((breedingRun, None, sterile))
+            # Children are kept from looking like the parent or each other where possible
+            shownKeys.add(parentCreature.expressedKey())
+
+        for creatureIndex in childIndexes:
+            if (breedingRun != self._breedingRun):
+                return
+            creature = None
+            with hotPathMetrics.phase("search"):
+                if (neighborIndex != None):
+                    creature = neighborIndex.sampleChild(geometry, shownKeys)
+                # If there is no parent, or it has no children that fit, then settle for a random creature
+                if (creature == None):
+                    creature = self.breedingScreener.findViable(geometry)
+            if (creature != None):
+                creature.layout(geometry)
+                shownKeys.add(creature.expressedKey())
+            self._bredCreatures.put((breedingRun, creatureIndex, creature))
+        return neighborIndex
+
+    def _drawBredCreatures(self, breedingRun, breedingFuture):
+        """ Draw the creatures bred in the background that are ready.  Runs on the main loop from a timer.
+
+            Checks again after the poll interval until the run is finished or cancelled.
+
+            Args:
+                breedingRun (int): The number of the run being drawn.
+                breedingFuture (concurrent.futures.Future): The future of the background breeding.
+        """
+        # A newer run has its own timer, and discards whatever is left of this one
+        if (breedingRun != self._breedingRun):
+            return
+
+        # Check whether breeding is finished before emptying the queue, so nothing queued after is missed
+        breedingFinished = breedingFuture.done()
+        while True:
+            try:
+                (creatureRun, creatureIndex, bred) = self._bredCreatures.get_nowait()
+            except queue.Empty:
+                break
+            if (creatureRun != breedingRun):
+                continue
+
+            # Whether the parent has children that fit arrives first.  Relabel the parent if none of them fit.
+            if (creatureIndex == None):
+                parentIndex = self._breedingParentIndex
+                if ((parentIndex in range(self.creatureCount)) and bred):
+                    parentPanel = self.creaturePanelArray[parentIndex]
+                    parentPanel.erasePanel()
+                    parentPanel.displayCreature()
+                    parentPanel.writePanelWord("Sterile Parent", "red")
+
+            # A panel replaced since the run started keeps its new creature
+            elif (creatureIndex in self._pendingIndexes):
+                self._pendingIndexes.discard(creatureIndex)
+                self.creatureArray[creatureIndex] = bred
+                if (bred != None):
+                    self.creaturePanelArray[creatureIndex].drawCreature(bred)
+
+        if (not breedingFinished):
+            self.window.ontimer(lambda: self._drawBredCreatures(breedingRun, breedingFuture), self.BREEDING_POLL_INTERVAL)
+        else:
+            # Raise any error the background thread hit, and sample later children from the parent's index
+            self.neighborIndex = breedingFuture.result()
+            hotPathMetrics.emit("breed")
+
+    def saveSession(self, path):
+        """ Save the creatures, parent, layouts and random state to a file that can be restored from.
+
+            Panels still waiting for a creature bred in the background are saved empty.
+
+            Args:
+                path (str): The path of the file.
+        """
+        SessionSnapshot.fromDisplay(self).write(path)
+
+    def shownExpressedKeys(self):
+        """ Return the set of expressed keys of the creatures in the panels.
+        """
+        return {creature.expressedKey() for creature in self.creatureArray if (creature != None)}
 
     def _replaceAllCreatures(self):
-        """ Replace all creatures with new randomly generated ones.
+        """ Replace all creatures with new randomly generated ones, found in the background.
         """
         # Save the old parent
         oldParent = self.parentCreature
-        
-        # Replace every creature with a new random one except a prior parent
-        for creatureIndex in range(self.creatureCount):
-            # If this is not the parent creature then
-            if oldParent != self.creatureArray[creatureIndex]:
-                # Replace with a random creature
-                self.replaceCreature(creatureIndex)
+
+        # Every creature except a prior parent is replaced
+        replacedIndexes = [creatureIndex for creatureIndex in range(self.creatureCount)
+                           if oldParent != self.creatureArray[creatureIndex]]
+
+        # There is no parent for the new creatures
+        self.parentCreature = None
+        self.neighborIndex = None
+        if (self.pagedPopulationSize != None):
+            self._startPagingRun(None, None)
+        else:
+            self._startBreedingRun(None, None, replacedIndexes)
+
+    def shutdown(self):
+        """ Stop any background breeding and worker processes.
+        """
+        self.cancelBreeding()
+        self._breedingExecutor.shutdown(wait=False, cancel_futures=True)
+        if (self.candidateGenerator != None):
+            self.candidateGenerator.shutdown(wait=False)
+        if (self.lineageStore != None):
+            self.lineageStore.flush()
 
     def replaceCreature(self, creatureIndex):
         """ Replace the creature at the index with new randomly generated one.
@@ -531,6 +1124,9 @@ class CreatureDisplay():
         # This will cause display algorithm to use random creature to fill empty panel
         self.parentCreature = None
 
+        # Breeding in the background must not overwrite the replacement
+        self._pendingIndexes.discard(creatureIndex)
+
         # Kill the creature in this panel
         self.creatureArray[creatureIndex] = None
         
@@ -587,13 +1183,51 @@ def quitDisplay():
 # How many rows and columns of creatures to display
 CreatureRows = 3
 CreatureColumns = 4
-    
-# Variable to contain the only create display needed
-# Use this as simple singleton generating method because nothing more complex
-# is needed.
-# This causes the creature display to appear just by instantiating the class instance
-autoCreatureDisplay = CreatureDisplay(CreatureRows,CreatureColumns)
-
-# Start turtle main loop to handle the key and mouse input and interpretation  
-turtle.Screen().mainloop()
+# How many creatures --paged browses a page of panels at a time
+PAGED_POPULATION_SIZE = 4096
+# Where --session saves and restores the session
+SESSION_FILE = "evolve-session.npz"
+
+# Worker processes import this module, so only the main process may open the display
+if __name__ == "__main__":
+    # Variable to contain the only create display needed
+    # Use this as simple singleton generating method because nothing more complex
+    # is needed.
+    # This causes the creature display to appear just by instantiating the class instance
+    # Pass --metrics to show hot path metrics in the header and record them to evolve-metrics.jsonl
+    metricsStream = None
+    if ("--metrics" in sys.argv):
+        metricsStream = open("evolve-metrics.jsonl", "a")
+    # Pass --chromosomes followed by a number to grow deeper creatures from that many chromosomes
+    chromosomeCount = Genotype.CHROMOSOME_COUNT
+    if ("--chromosomes" in sys.argv):
+        chromosomeCount = int(sys.argv[sys.argv.index("--chromosomes") + 1])
+    # Pass --grid followed by rows and columns, such as 4x6, to display another number of panels
+    if ("--grid" in sys.argv):
+        (CreatureRows, CreatureColumns) = [int(size) for size in sys.argv[sys.argv.index("--grid") + 1].lower().split("x")]
+    # Pass --paged to browse thousands of creatures a page of panels at a time with the page and arrow keys
+    pagedPopulationSize = PAGED_POPULATION_SIZE if ("--paged" in sys.argv) else None
+    # Pass --session to start from the session saved in evolve-session.npz, and save it there on quitting
+    session = None
+    if (("--session" in sys.argv) and os.path.exists(SESSION_FILE)):
+        session = SessionSnapshot.read(SESSION_FILE)
+        CreatureRows = session.rows
+        CreatureColumns = session.columns
+        chromosomeCount = session.chromosomeValues.shape[1]
+    # Pass --lineage to log every creature shown, and the parent it was bred from, to evolve-lineage.bin
+    lineageStore = None
+    if ("--lineage" in sys.argv):
+        lineageStore = LineageStore("evolve-lineage.bin", chromosomeCount)
+    autoCreatureDisplay = CreatureDisplay(CreatureRows, CreatureColumns,
+                                          showMetrics=(metricsStream != None), metricsStream=metricsStream,
+                                          lineageStore=lineageStore, session=session, chromosomeCount=chromosomeCount,
+                                          pagedPopulationSize=pagedPopulationSize)
+
+    # Start turtle main loop to handle the key and mouse input and interpretation  
+    turtle.Screen().mainloop()
+
+    # Stop the worker processes once the display is closed
+    autoCreatureDisplay.shutdown()
+    if ("--session" in sys.argv):
+        autoCreatureDisplay.saveSession(SESSION_FILE)
 
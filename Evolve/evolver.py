@@ -0,0 +1,491 @@
+# Copyright 2015 Brian Macker
+""" Evolve creatures without a display by selecting for a fitness function.
+
+    Run as a script to evolve a population and print the statistics of every generation
+    as a line of JSON, for example:
+
+        python evolver.py --fitness segments --population 10000 --generations 50 --seed 1
+"""
+import sys
+import time
+import json
+import math
+import random
+import argparse
+import numpy
+from creature import *
+from creature import _COSINE_TABLE, _SINE_TABLE
+from population import *
+from lineage import *
+
+
+#**************************************************************************
+# Fitness functions
+#
+# Each takes the viable layout of a creature and the panel geometry it was
+# laid out for, and returns a number.  Bigger is fitter.
+#**************************************************************************
+
+def segmentExtents(layout):
+    """ Return the smallest box holding every segment of a layout, relative to the panel center.
+
+        Args:
+            layout (PhenotypeLayout): A viable layout.
+
+        Returns:
+            tuple: (leftX, bottomY, rightX, topY)
+    """
+    leftX = bottomY = math.inf
+    rightX = topY = -math.inf
+    for segment in layout.segments():
+        if (segment.shape == Chromosome._SHAPE__LINE_VALUE):
+            leftX = min(leftX, segment.xStart, segment.xEnd)
+            rightX = max(rightX, segment.xStart, segment.xEnd)
+            bottomY = min(bottomY, segment.yStart, segment.yEnd)
+            topY = max(topY, segment.yStart, segment.yEnd)
+        else:
+            (xMiddle, yMiddle) = _segmentMiddle(segment)
+            leftX = min(leftX, xMiddle - segment.radius)
+            rightX = max(rightX, xMiddle + segment.radius)
+            bottomY = min(bottomY, yMiddle - segment.radius)
+            topY = max(topY, yMiddle + segment.radius)
+    return (leftX, bottomY, rightX, topY)
+
+
+def segmentPoints(layout):
+    """ Return the points that outline a layout: the ends of lines and the centers of dots and circles.
+
+        Args:
+            layout (PhenotypeLayout): A viable layout.
+
+        Returns:
+            numpy.ndarray: An (N, 2) array of x and y positions relative to the panel center.
+    """
+    points = []
+    for segment in layout.segments():
+        if (segment.shape == Chromosome._SHAPE__LINE_VALUE):
+            points.append((segment.xStart, segment.yStart))
+            points.append((segment.xEnd, segment.yEnd))
+        else:
+            points.append(_segmentMiddle(segment))
+    return numpy.array(points, dtype=float).reshape(-1, 2)
+
+
+def _segmentMiddle(segment):
+    """ Return the center of a dot or circle segment, one radius ahead of its start. """
+    return (segment.xStart + (segment.radius * _COSINE_TABLE[segment.heading]),
+            segment.yStart + (segment.radius * _SINE_TABLE[segment.heading]))
+
+
+def segmentCountFitness(layout, geometry):
+    """ Fitness of the number of segments the creature grows. """
+    return float(layout.segmentCount())
+
+
+def boundingBoxFitness(layout, geometry):
+    """ Fitness of the fraction of the panel covered by the box around the creature. """
+    (leftX, bottomY, rightX, topY) = segmentExtents(layout)
+    return ((rightX - leftX) * (topY - bottomY)) / (geometry.interiorWidth * geometry.interiorHeight)
+
+
+def symmetryFitness(layout, geometry):
+    """ Fitness of how closely the creature mirrors itself left to right, from 0 to 1.
+
+        The fraction of its outline points whose mirror image, to the nearest pixel, is also an outline point.
+    """
+    points = numpy.round(segmentPoints(layout)).astype(numpy.int64)
+    if (len(points) == 0):
+        return 0.0
+    pointSet = set(map(tuple, points.tolist()))
+    mirroredCount = sum(1 for (x, y) in pointSet if ((-x, y) in pointSet))
+    return mirroredCount / len(pointSet)
+
+
+def colorDiversityFitness(layout, geometry):
+    """ Fitness of how many different colors the creature is drawn with, from 0 to 1. """
+    colors = set()
+    for segment in layout.segments():
+        colors.add(segment.chromosome.lineColor)
+        if (segment.shape == Chromosome._SHAPE_FILLED_CIRCLE_VALUE):
+            colors.add(segment.chromosome.fillColor)
+    return len(colors) / len(Chromosome._SEGMENT_COLORS)
+
+
+class TargetShapeFitness:
+    """ Fitness of how closely a creature's outline matches a target shape, from 0 to 1.
+
+        Both shapes are reduced to outline points.  Similarity falls off with the mean distance
+        from each point of one shape to the nearest point of the other, in both directions.
+
+        Attributes:
+            targetPoints (numpy.ndarray): An (N, 2) array of the target's outline points, relative to the panel center.
+            scale (float): The mean distance in pixels at which similarity has fallen to one half.
+    """
+
+    def __init__(self, targetPoints, scale=10.0):
+        """ Constructor for a TargetShapeFitness.
+
+            Args:
+                targetPoints (numpy.ndarray): An (N, 2) array of points the creature should cover, relative to the panel center.
+                scale (float): The mean distance in pixels at which similarity has fallen to one half.
+        """
+        self.targetPoints = numpy.asarray(targetPoints, dtype=float).reshape(-1, 2)
+        self.scale = scale
+
+    @classmethod
+    def fromCreature(cls, creature, geometry, scale=10.0):
+        """ Return a fitness that selects for looking like the creature.
+
+            Args:
+                creature (Creature): The creature to match.  It must fit the geometry.
+                geometry (PanelGeometry): The interior size of the panel.
+                scale (float): The mean distance in pixels at which similarity has fallen to one half.
+
+            Returns:
+                TargetShapeFitness: The fitness.
+        """
+        layout = creature.layout(geometry)
+        if (not layout.viable):
+            raise ValueError("target creature does not fit the panel: %s" % layout.rejection)
+        return cls(segmentPoints(layout), scale)
+
+    def __call__(self, layout, geometry):
+        points = segmentPoints(layout)
+        if ((len(points) == 0) or (len(self.targetPoints) == 0)):
+            return 0.0
+        distances = numpy.sqrt(((points[:, numpy.newaxis, :] - self.targetPoints[numpy.newaxis, :, :]) ** 2).sum(axis=2))
+        meanDistance = (distances.min(axis=1).mean() + distances.min(axis=0).mean()) / 2
+        return self.scale / (self.scale + meanDistance)
+
+
+class WeightedFitness:
+    """ Fitness that adds up other fitness functions, each multiplied by a weight.
+
+        Attributes:
+            weightedFunctions (tuple[]): (weight, fitnessFunction) pairs.
+    """
+
+    def __init__(self, weightedFunctions):
+        """ Constructor for a WeightedFitness.
+
+            Args:
+                weightedFunctions (tuple[]): (weight, fitnessFunction) pairs.
+        """
+        self.weightedFunctions = list(weightedFunctions)
+
+    def __call__(self, layout, geometry):
+        return sum(weight * fitnessFunction(layout, geometry) for (weight, fitnessFunction) in self.weightedFunctions)
+
+
+# Fitness functions by the name used on the command line
+FITNESS_FUNCTIONS = {"segments": segmentCountFitness,
+                     "box": boundingBoxFitness,
+                     "symmetry": symmetryFitness,
+                     "colors": colorDiversityFitness}
+
+
+#**************************************************************************
+# Selection schemes
+#
+# Each picks the parents of the next generation from the fitnesses of the
+# current one.  Creatures that do not fit have a fitness of minus infinity
+# and are never picked, unless none fit and parents are picked at random.
+#**************************************************************************
+
+class TruncationSelection:
+    """ Selection that breeds only from the fittest fraction of the population, each parent equally often.
+
+        Attributes:
+            fraction (float): The fraction of the population that breeds.
+    """
+
+    def __init__(self, fraction=0.1):
+        self.fraction = fraction
+
+    def select(self, fitnesses, parentCount, randomGenerator):
+        """ Return the indexes of the parent of each child.
+
+            Only creatures that fit survive, so fewer than the fraction breed if fewer fit.
+            If none fit, parents are picked at random from the whole population.
+
+            Args:
+                fitnesses (numpy.ndarray): The fitness of every creature.
+                parentCount (int): How many parents to pick.
+                randomGenerator (numpy.random.Generator): The generator to draw from.
+
+            Returns:
+                numpy.ndarray: Indexes into the fitnesses.
+        """
+        viableCount = int(numpy.isfinite(fitnesses).sum())
+        if (viableCount == 0):
+            return randomGenerator.integers(0, len(fitnesses), size=parentCount)
+        survivorCount = min(max(int(len(fitnesses) * self.fraction), 1), viableCount)
+        survivors = numpy.argsort(-fitnesses, kind="stable")[:survivorCount]
+        # Shuffle so children of each survivor are spread over the population
+        return randomGenerator.permutation(numpy.resize(survivors, parentCount))
+
+
+class TournamentSelection:
+    """ Selection that picks each parent as the fittest of a few creatures drawn at random.
+
+        Attributes:
+            size (int): The number of creatures in each tournament.  Bigger selects more strongly.
+    """
+
+    def __init__(self, size=4):
+        self.size = size
+
+    def select(self, fitnesses, parentCount, randomGenerator):
+        """ Return the indexes of the parent of each child.
+
+            Contestants are drawn only from the creatures that fit.  If none fit, parents are
+            picked at random from the whole population.
+
+            Args:
+                fitnesses (numpy.ndarray): The fitness of every creature.
+                parentCount (int): How many parents to pick.
+                randomGenerator (numpy.random.Generator): The generator to draw from.
+
+            Returns:
+                numpy.ndarray: Indexes into the fitnesses.
+        """
+        viableIndexes = numpy.flatnonzero(numpy.isfinite(fitnesses))
+        if (len(viableIndexes) == 0):
+            return randomGenerator.integers(0, len(fitnesses), size=parentCount)
+        contestants = viableIndexes[randomGenerator.integers(0, len(viableIndexes), size=(parentCount, self.size))]
+        winners = numpy.argmax(fitnesses[contestants], axis=1)
+        return contestants[numpy.arange(parentCount), winners]
+
+
+#**************************************************************************
+# The evolution engine
+#**************************************************************************
+
+class GenerationStatistics:
+    """ Class holding what happened in one generation.
+
+        Attributes:
+            generation (int): The generation number.  The first population is generation zero.
+            evaluations (int): The total number of creatures evaluated so far.
+            viableCount (int): How many creatures of the generation fit the panel.
+            bestFitness (float): The highest fitness of the generation, or None if no creature fits.
+            meanFitness (float): The mean fitness of the creatures that fit, or None if none fit.
+            bestCreature (Creature): The fittest creature of the generation, or None if no creature fits.
+            seconds (float): How long the generation took to breed and evaluate.
+    """
+
+    def __init__(self, generation, evaluations, viableCount, bestFitness, meanFitness, bestCreature, seconds):
+        self.generation = generation
+        self.evaluations = evaluations
+        self.viableCount = viableCount
+        self.bestFitness = bestFitness
+        self.meanFitness = meanFitness
+        self.bestCreature = bestCreature
+        self.seconds = seconds
+
+    def asDict(self):
+        """ Return the statistics as plain values, with the best creature as its chromosome values, or None if none fit. """
+        bestGenotype = None
+        if (self.bestCreature != None):
+            bestGenotype = [chromosome.chromosomeValue for chromosome in self.bestCreature.genotype.chromosomes]
+        return {"generation": self.generation,
+                "evaluations": self.evaluations,
+                "viableCount": self.viableCount,
+                "bestFitness": self.bestFitness,
+                "meanFitness": self.meanFitness,
+                "bestGenotype": bestGenotype,
+                "seconds": self.seconds}
+
+
+class Evolver:
+    """ Class that evolves a population of creatures by selecting for a fitness function.
+
+        Every generation each creature is laid out for the panel and scored.  Parents are
+        picked by the selection scheme and the whole generation of children is mutated at once
+        with Population.mutatedChildren.  Each child descends from its parent, so its layout
+        reuses the parent's up to the first mutated chromosome.  The fittest
+        creatures may be kept unchanged.  A creature that does not fit the panel can never be
+        picked as a parent.  A run with the same seed is reproduced exactly.
+
+        Attributes:
+            fitnessFunction (function): Scores the viable layout of a creature.  Called with (layout, geometry).
+            geometry (PanelGeometry): The interior size of the panel every creature must fit.
+            selection: The selection scheme, such as TruncationSelection or TournamentSelection.
+            eliteCount (int): How many of the fittest creatures pass to the next generation unchanged.
+            creatures (Creature[]): The current population.
+            fitnesses (numpy.ndarray): The fitness of each creature.  Minus infinity where it does not fit.
+            generation (int): The number of the current generation.
+            evaluations (int): The total number of creatures evaluated.
+    """
+
+    def __init__(self, fitnessFunction, geometry, populationSize=1000, selection=None, eliteCount=1,
+                 seed=None, initialCreatures=None, lineageStore=None, chromosomeCount=None):
+        """ Constructor for an Evolver.  Creates and evaluates the first generation.
+
+            Args:
+                fitnessFunction (function): Scores the viable layout of a creature.  Called with (layout, geometry).
+                geometry (PanelGeometry): The interior size of the panel every creature must fit.
+                populationSize (int): The number of creatures in every generation.
+                selection: The selection scheme.  Default = None uses TruncationSelection().
+                eliteCount (int): How many of the fittest creatures pass to the next generation unchanged.
+                seed (int): Seed of every random choice.  Default = None picks one at random.
+                initialCreatures (Creature[]): Creatures to start from, such as a parent chosen on the display.
+                    The first generation is bred from them.  Default = None starts from random creatures.
+                lineageStore (LineageStore): Store to log every creature evaluated to, with its parent and fitness.
+                    Default = None logs nothing.
+                chromosomeCount (int): The number of chromosomes of random creatures.  Default = None uses Genotype.CHROMOSOME_COUNT.
+                    Creatures bred from initial creatures have as many as those.
+        """
+        self.fitnessFunction = fitnessFunction
+        self.geometry = geometry
+        if (selection == None):
+            selection = TruncationSelection()
+        self.selection = selection
+        self.eliteCount = eliteCount
+        self.lineageStore = lineageStore
+        self.generation = 0
+        self.evaluations = 0
+        if (chromosomeCount == None):
+            chromosomeCount = Genotype.CHROMOSOME_COUNT
+        Genotype.checkChromosomeCount(chromosomeCount)
+
+        if (seed == None):
+            seed = random.getrandbits(64)
+        # Random genotypes and mutations are drawn for a whole generation at once, from a stream of their own
+        self._selectionRandom = numpy.random.default_rng(seed)
+        self._mutationRandom = numpy.random.default_rng(numpy.random.SeedSequence(seed).spawn(1)[0])
+
+        startTime = time.perf_counter()
+        if (initialCreatures == None):
+            self.creatures = list(Population.random(populationSize, self._mutationRandom, chromosomeCount).creatures())
+        else:
+            self.creatures = self._mutatedChildren([initialCreatures[creatureIndex % len(initialCreatures)]
+                                                    for creatureIndex in range(populationSize)])
+        self.fitnesses = self._evaluate(self.creatures)
+        self._logCreatures(self.creatures, self.fitnesses)
+        self._statistics = self._generationStatistics(time.perf_counter() - startTime)
+
+    def _mutatedChildren(self, parents):
+        """ Return a mutated child of each parent, bred in one call to the bulk mutation kernel. """
+        return list(Population.fromCreatures(parents).mutatedChildren(self._mutationRandom).childCreatures(parents))
+
+    def _evaluate(self, creatures):
+        """ Return the fitness of every creature, minus infinity for those that do not fit the panel. """
+        fitnesses = numpy.full(len(creatures), -numpy.inf)
+        for creatureIndex, creature in enumerate(creatures):
+            layout = creature.layout(self.geometry)
+            if layout.viable:
+                fitnesses[creatureIndex] = self.fitnessFunction(layout, self.geometry)
+        self.evaluations += len(creatures)
+        return fitnesses
+
+    def _logCreatures(self, creatures, fitnesses):
+        """ Log creatures of the current generation to the lineage store in one write, and remember their ids on them. """
+        if (self.lineageStore == None):
+            return
+        chromosomeValues = [[chromosome.chromosomeValue for chromosome in creature.genotype.chromosomes] for creature in creatures]
+        parentIds = [LineageStore.NO_PARENT if (creature.parentLineageId == None) else creature.parentLineageId
+                     for creature in creatures]
+        creatureIds = self.lineageStore.appendMany(chromosomeValues, parentIds, self.generation, fitnesses)
+        for (creature, creatureId) in zip(creatures, creatureIds.tolist()):
+            creature.lineageId = creatureId
+
+    def _generationStatistics(self, seconds):
+        """ Return the statistics of the current generation. """
+        viable = numpy.isfinite(self.fitnesses)
+        viableCount = int(viable.sum())
+        # A generation where nothing fits has no best or mean fitness, nor a best creature
+        if (viableCount == 0):
+            return GenerationStatistics(self.generation, self.evaluations, 0, None, None, None, seconds)
+        bestIndex = int(numpy.argmax(self.fitnesses))
+        return GenerationStatistics(self.generation, self.evaluations, viableCount, float(self.fitnesses[bestIndex]),
+                                    float(self.fitnesses[viable].mean()), self.creatures[bestIndex], seconds)
+
+    def statistics(self):
+        """ Return the statistics of the current generation. """
+        return self._statistics
+
+    def step(self):
+        """ Breed and evaluate the next generation.
+
+            Returns:
+                GenerationStatistics: The statistics of the new generation.
+        """
+        startTime = time.perf_counter()
+        populationSize = len(self.creatures)
+
+        # The fittest pass on unchanged, and the rest of the generation are children
+        eliteCount = min(self.eliteCount, populationSize)
+        eliteIndexes = numpy.argsort(-self.fitnesses, kind="stable")[:eliteCount]
+        parentIndexes = self.selection.select(self.fitnesses, populationSize - eliteCount, self._selectionRandom)
+
+        children = self._mutatedChildren([self.creatures[parentIndex] for parentIndex in parentIndexes.tolist()])
+        childFitnesses = self._evaluate(children)
+
+        self.creatures = [self.creatures[eliteIndex] for eliteIndex in eliteIndexes.tolist()] + children
+        self.fitnesses = numpy.concatenate((self.fitnesses[eliteIndexes], childFitnesses))
+        self.generation += 1
+        self._logCreatures(children, childFitnesses)
+        self._statistics = self._generationStatistics(time.perf_counter() - startTime)
+        return self._statistics
+
+    def run(self, generationCount=None):
+        """ Generate the statistics of the current generation, then of each new generation as it is bred.
+
+            Args:
+                generationCount (int): How many generations to breed.  Default = None keeps breeding for as long as statistics are taken.
+        """
+        yield self._statistics
+        generationNumber = 0
+        while ((generationCount == None) or (generationNumber < generationCount)):
+            yield self.step()
+            generationNumber += 1
+
+
+def main(argv=None):
+    """ Evolve creatures from the command line, printing one line of JSON per generation.  Returns the exit status. """
+    parser = argparse.ArgumentParser(description="Evolve creatures without a display.")
+    parser.add_argument("--fitness", action="append", choices=sorted(FITNESS_FUNCTIONS), default=None,
+                        help="Fitness to select for.  Repeat to add several together.  Default = segments.")
+    parser.add_argument("--population", type=int, default=1000, help="Creatures per generation.")
+    parser.add_argument("--generations", type=int, default=100, help="Generations to breed.")
+    parser.add_argument("--selection", choices=["truncation", "tournament"], default="truncation", help="Selection scheme.")
+    parser.add_argument("--truncation-fraction", dest="truncationFraction", type=float, default=0.1,
+                        help="Fraction of the population that breeds with truncation selection.")
+    parser.add_argument("--tournament-size", dest="tournamentSize", type=int, default=4, help="Creatures per tournament.")
+    parser.add_argument("--elite", type=int, default=1, help="Fittest creatures kept unchanged each generation.")
+    parser.add_argument("--width", type=float, default=200, help="Interior width of the panel creatures must fit.")
+    parser.add_argument("--height", type=float, default=200, help="Interior height of the panel creatures must fit.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of every random choice.")
+    parser.add_argument("--chromosomes", type=int, default=Genotype.CHROMOSOME_COUNT,
+                        help="Chromosomes of each creature, up to %d.  More grow deeper creatures." % Genotype.MAX_CHROMOSOME_COUNT)
+    parser.add_argument("--lineage", default=None, help="Lineage store file to log every creature evaluated to.")
+    arguments = parser.parse_args(argv)
+
+    fitnessNames = arguments.fitness or ["segments"]
+    if (len(fitnessNames) == 1):
+        fitnessFunction = FITNESS_FUNCTIONS[fitnessNames[0]]
+    else:
+        fitnessFunction = WeightedFitness([(1.0, FITNESS_FUNCTIONS[fitnessName]) for fitnessName in fitnessNames])
+    if (arguments.selection == "tournament"):
+        selection = TournamentSelection(arguments.tournamentSize)
+    else:
+        selection = TruncationSelection(arguments.truncationFraction)
+
+    lineageStore = None
+    if (arguments.lineage != None):
+        lineageStore = LineageStore(arguments.lineage, arguments.chromosomes)
+
+    evolver = Evolver(fitnessFunction, PanelGeometry(arguments.width, arguments.height), arguments.population,
+                      selection, arguments.elite, arguments.seed, lineageStore=lineageStore,
+                      chromosomeCount=arguments.chromosomes)
+    for statistics in evolver.run(arguments.generations):
+        sys.stdout.write(json.dumps(statistics.asDict(), allow_nan=False) + "\n")
+        sys.stdout.flush()
+    if (lineageStore != None):
+        lineageStore.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
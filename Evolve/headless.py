@@ -0,0 +1,456 @@
+# Copyright 2015 Brian Macker
+""" Render creatures to SVG or PPM files without turtle graphics or a display.
+
+    Run as a script to render many genotypes into one contact sheet or a directory of
+    files, for example:
+
+        python headless.py --random 5000 --seed 1 --sheet catalog.ppm --columns 50
+        python headless.py lineage.txt --output-dir thumbnails --format svg
+
+    A genotype file holds one genotype per line as chromosome values, decimal or 0x hex,
+    separated by spaces or commas.  Every line has the same number of values, CHROMOSOME_COUNT
+    unless the genotypes are deeper.  Lines starting with # are skipped.
+"""
+import os
+import sys
+import abc
+import argparse
+import numpy
+from creature import *
+from creature import _COSINE_TABLE, _SINE_TABLE
+from population import *
+
+
+# Red, green and blue values of every color name used to draw creatures and panels, as Tk defines them
+COLOR_RGB = {"brown": (165, 42, 42),
+             "red": (255, 0, 0),
+             "orange": (255, 165, 0),
+             "yellow": (255, 255, 0),
+             "green": (0, 255, 0),
+             "blue": (0, 0, 255),
+             "purple": (160, 32, 240),
+             "white": (255, 255, 255),
+             "black": (0, 0, 0)}
+
+BACKGROUND_COLOR = "black"      # Same as the display's panel background
+BORDER_COLOR = "green"          # Same as the display's panel border
+
+
+class HeadlessRenderer(abc.ABC):
+    """ Base class for renderers that draw creatures without turtle graphics.
+
+        A creature is laid out for a panel geometry and drawn with the same shapes the turtle
+        draws: lines with round ends, dots, circles and filled circles.  Positions are in pixels
+        with y pointing down, and can be scaled so large panels make small thumbnails.
+        Subclasses must provide the drawing primitives, so the base class cannot be instantiated.
+    """
+
+    def drawCreature(self, creature, geometry, xOffset=0, yOffset=0, scale=1.0):
+        """ Draw a creature inside a panel whose interior has its top left corner at the offset.
+
+            Args:
+                creature (Creature): The creature to draw.
+                geometry (PanelGeometry): The interior size of the panel the creature is laid out for.
+                xOffset (float): The x pixel of the left edge of the panel interior.
+                yOffset (float): The y pixel of the top edge of the panel interior.
+                scale (float): The number of pixels per panel unit.
+
+            Returns:
+                boolean: True if the creature was drawn.  False if it does not fit the panel, and nothing was drawn.
+        """
+        layout = creature.layout(geometry)
+        if (not layout.viable):
+            return False
+
+        # Creatures start growing at the center of the panel
+        xCenter = xOffset + (geometry.interiorWidth * scale / 2)
+        yCenter = yOffset + (geometry.interiorHeight * scale / 2)
+
+        for segment in layout.segments():
+            chromosome = segment.chromosome
+            # The turtle draws a pen width of zero one pixel wide
+            lineWidth = max(chromosome.lineWidth * scale, 1)
+
+            if (segment.shape == Chromosome._SHAPE__LINE_VALUE):
+                self.drawLine(xCenter + (segment.xStart * scale), yCenter - (segment.yStart * scale),
+                              xCenter + (segment.xEnd * scale), yCenter - (segment.yEnd * scale),
+                              lineWidth, chromosome.lineColor)
+                continue
+
+            # A dot or circle is centered one radius ahead of where the segment starts
+            radius = segment.radius
+            xMiddle = xCenter + ((segment.xStart + (radius * _COSINE_TABLE[segment.heading])) * scale)
+            yMiddle = yCenter - ((segment.yStart + (radius * _SINE_TABLE[segment.heading])) * scale)
+
+            if (segment.shape == Chromosome._SHAPE_DOT_VALUE):
+                # A turtle dot is as wide as the segment is long
+                self.drawDot(xMiddle, yMiddle, chromosome.length * scale / 2, chromosome.lineColor)
+            elif (segment.shape == Chromosome._SHAPE_CIRCLE_VALUE):
+                self.drawCircle(xMiddle, yMiddle, radius * scale, lineWidth, chromosome.lineColor, None)
+            else:
+                self.drawCircle(xMiddle, yMiddle, radius * scale, lineWidth, chromosome.lineColor, chromosome.fillColor)
+        return True
+
+    def drawPanel(self, creature, geometry, xOffset=0, yOffset=0, scale=1.0, borderWidth=0):
+        """ Draw a panel's background and border, then its creature.  An empty panel is drawn if the creature is None.
+
+            Args:
+                creature (Creature): The creature to draw, or None.
+                geometry (PanelGeometry): The interior size of the panel the creature is laid out for.
+                xOffset (float): The x pixel of the left edge of the panel, border included.
+                yOffset (float): The y pixel of the top edge of the panel, border included.
+                scale (float): The number of pixels per panel unit.
+                borderWidth (int): The width in pixels of the border around the interior.
+
+            Returns:
+                boolean: True if a creature was drawn.
+        """
+        interiorWidth = geometry.interiorWidth * scale
+        interiorHeight = geometry.interiorHeight * scale
+        if (borderWidth > 0):
+            self.fillRectangle(xOffset, yOffset, interiorWidth + (2 * borderWidth), interiorHeight + (2 * borderWidth), BORDER_COLOR)
+        self.fillRectangle(xOffset + borderWidth, yOffset + borderWidth, interiorWidth, interiorHeight, BACKGROUND_COLOR)
+        if (creature == None):
+            return False
+        return self.drawCreature(creature, geometry, xOffset + borderWidth, yOffset + borderWidth, scale)
+
+    @abc.abstractmethod
+    def fillRectangle(self, left, top, width, height, color):
+        """ Fill a rectangle with a color. """
+
+    @abc.abstractmethod
+    def drawLine(self, xStart, yStart, xEnd, yEnd, lineWidth, color):
+        """ Draw a line of the width with round ends. """
+
+    @abc.abstractmethod
+    def drawDot(self, xCenter, yCenter, radius, color):
+        """ Draw a solid dot. """
+
+    @abc.abstractmethod
+    def drawCircle(self, xCenter, yCenter, radius, lineWidth, lineColor, fillColor):
+        """ Draw a circle outline, filled first if a fill color is given. """
+
+
+class SvgRenderer(HeadlessRenderer):
+    """ Class that streams shapes into an SVG document as they are drawn.
+
+        Nothing is kept in memory, so a document may hold any number of creatures.
+        Call close to finish the document.
+
+        Attributes:
+            stream (file): The text stream the document is written to.
+            width (int): The width of the document in pixels.
+            height (int): The height of the document in pixels.
+    """
+
+    def __init__(self, stream, width, height):
+        """ Constructor for an SvgRenderer.  Writes the start of the document.
+
+            Args:
+                stream (file): The text stream to write to.
+                width (int): The width of the document in pixels.
+                height (int): The height of the document in pixels.
+        """
+        self.stream = stream
+        self.width = width
+        self.height = height
+        stream.write('<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" viewBox="0 0 %d %d">\n'
+                     % (width, height, width, height))
+        self.fillRectangle(0, 0, width, height, BACKGROUND_COLOR)
+
+    def close(self):
+        """ Write the end of the document.  The stream is left open. """
+        self.stream.write('</svg>\n')
+
+    def fillRectangle(self, left, top, width, height, color):
+        self.stream.write('<rect x="%.2f" y="%.2f" width="%.2f" height="%.2f" fill="%s"/>\n'
+                          % (left, top, width, height, color))
+
+    def drawLine(self, xStart, yStart, xEnd, yEnd, lineWidth, color):
+        self.stream.write('<line x1="%.2f" y1="%.2f" x2="%.2f" y2="%.2f" stroke="%s" stroke-width="%.2f" stroke-linecap="round"/>\n'
+                          % (xStart, yStart, xEnd, yEnd, color, lineWidth))
+
+    def drawDot(self, xCenter, yCenter, radius, color):
+        self.stream.write('<circle cx="%.2f" cy="%.2f" r="%.2f" fill="%s"/>\n' % (xCenter, yCenter, radius, color))
+
+    def drawCircle(self, xCenter, yCenter, radius, lineWidth, lineColor, fillColor):
+        if (fillColor == None):
+            fillColor = "none"
+        self.stream.write('<circle cx="%.2f" cy="%.2f" r="%.2f" fill="%s" stroke="%s" stroke-width="%.2f"/>\n'
+                          % (xCenter, yCenter, radius, fillColor, lineColor, lineWidth))
+
+
+class RasterRenderer(HeadlessRenderer):
+    """ Class that draws shapes into an RGB pixel array, which can be written as a binary PPM image.
+
+        Each shape only touches the pixels of its bounding box, and a pixel is painted if its
+        center lies inside the shape.  A contact sheet is drawn one row of panels at a time
+        into the same array, so memory is bounded by the width of the sheet.
+
+        Attributes:
+            pixels (numpy.ndarray): A (height, width, 3) uint8 array of colors.
+    """
+
+    def __init__(self, width, height):
+        """ Constructor for a RasterRenderer.  The image starts out as background.
+
+            Args:
+                width (int): The width of the image in pixels.
+                height (int): The height of the image in pixels.
+        """
+        self.pixels = numpy.zeros((height, width, 3), dtype=numpy.uint8)
+        self.clear()
+
+    def clear(self):
+        """ Fill the whole image with the background color. """
+        self.pixels[:, :] = COLOR_RGB[BACKGROUND_COLOR]
+
+    @staticmethod
+    def writePpmHeader(stream, width, height):
+        """ Write the header of a binary PPM image to a binary stream.  The pixels follow row by row. """
+        stream.write(b"P6\n%d %d\n255\n" % (width, height))
+
+    def writePixels(self, stream):
+        """ Write the pixels, without a header, to a binary stream. """
+        stream.write(self.pixels.tobytes())
+
+    def writePpm(self, stream):
+        """ Write the image as a binary PPM file to a binary stream. """
+        self.writePpmHeader(stream, self.pixels.shape[1], self.pixels.shape[0])
+        self.writePixels(stream)
+
+    def _region(self, left, top, right, bottom):
+        """ Return the pixel centers and pixels of a bounding box clipped to the image, or None if none are inside.
+
+            Returns:
+                tuple: (xCenters, yCenters, pixels).  The centers broadcast against each other to the shape of the box.
+        """
+        (height, width) = self.pixels.shape[:2]
+        firstColumn = max(int(numpy.floor(left)), 0)
+        firstRow = max(int(numpy.floor(top)), 0)
+        lastColumn = min(int(numpy.ceil(right)), width)
+        lastRow = min(int(numpy.ceil(bottom)), height)
+        if ((firstColumn >= lastColumn) or (firstRow >= lastRow)):
+            return None
+        xCenters = numpy.arange(firstColumn, lastColumn)[numpy.newaxis, :] + 0.5
+        yCenters = numpy.arange(firstRow, lastRow)[:, numpy.newaxis] + 0.5
+        return (xCenters, yCenters, self.pixels[firstRow:lastRow, firstColumn:lastColumn])
+
+    def fillRectangle(self, left, top, width, height, color):
+        region = self._region(left, top, left + width, top + height)
+        if (region != None):
+            region[2][:, :] = COLOR_RGB[color]
+
+    def drawLine(self, xStart, yStart, xEnd, yEnd, lineWidth, color):
+        halfWidth = lineWidth / 2
+        region = self._region(min(xStart, xEnd) - halfWidth, min(yStart, yEnd) - halfWidth,
+                              max(xStart, xEnd) + halfWidth, max(yStart, yEnd) + halfWidth)
+        if (region == None):
+            return
+        (xCenters, yCenters, pixels) = region
+
+        # Distance from each pixel center to the nearest point of the line, which gives round ends
+        xLength = xEnd - xStart
+        yLength = yEnd - yStart
+        lengthSquared = (xLength * xLength) + (yLength * yLength)
+        if (lengthSquared == 0):
+            fraction = 0
+        else:
+            fraction = numpy.clip((((xCenters - xStart) * xLength) + ((yCenters - yStart) * yLength)) / lengthSquared, 0, 1)
+        xDistance = xCenters - (xStart + (fraction * xLength))
+        yDistance = yCenters - (yStart + (fraction * yLength))
+        pixels[((xDistance * xDistance) + (yDistance * yDistance)) <= (halfWidth * halfWidth)] = COLOR_RGB[color]
+
+    def drawDot(self, xCenter, yCenter, radius, color):
+        region = self._region(xCenter - radius, yCenter - radius, xCenter + radius, yCenter + radius)
+        if (region == None):
+            return
+        (xCenters, yCenters, pixels) = region
+        pixels[(((xCenters - xCenter) ** 2) + ((yCenters - yCenter) ** 2)) <= (radius * radius)] = COLOR_RGB[color]
+
+    def drawCircle(self, xCenter, yCenter, radius, lineWidth, lineColor, fillColor):
+        if (fillColor != None):
+            self.drawDot(xCenter, yCenter, radius, fillColor)
+        halfWidth = lineWidth / 2
+        outerRadius = radius + halfWidth
+        region = self._region(xCenter - outerRadius, yCenter - outerRadius, xCenter + outerRadius, yCenter + outerRadius)
+        if (region == None):
+            return
+        (xCenters, yCenters, pixels) = region
+        distance = numpy.sqrt(((xCenters - xCenter) ** 2) + ((yCenters - yCenter) ** 2))
+        pixels[numpy.abs(distance - radius) <= halfWidth] = COLOR_RGB[lineColor]
+
+
+def parseGenotypes(lines):
+    """ Return the genotypes in lines of text as a Population.
+
+        Args:
+            lines (str[]): Lines of the same number of chromosome values each.  Blank lines and lines starting with # are skipped.
+
+        Returns:
+            Population: The genotypes in the order they appear.
+    """
+    chromosomeValues = []
+    chromosomeCount = None
+    for lineNumber, line in enumerate(lines, 1):
+        line = line.strip()
+        if ((line == "") or line.startswith("#")):
+            continue
+        values = [int(token, 0) for token in line.replace(",", " ").split()]
+        # The first genotype sets how many chromosomes every genotype has
+        if (chromosomeCount == None):
+            chromosomeCount = len(values)
+        if (len(values) != chromosomeCount):
+            raise ValueError("line %d has %d chromosome values instead of %d" % (lineNumber, len(values), chromosomeCount))
+        chromosomeValues.append(values)
+    if (chromosomeCount == None):
+        chromosomeCount = Genotype.CHROMOSOME_COUNT
+    return Population(numpy.array(chromosomeValues, dtype=numpy.uint32).reshape(-1, chromosomeCount))
+
+
+def writeContactSheet(population, stream, imageFormat, geometry, columns=10, scale=1.0, borderWidth=2):
+    """ Render every genotype of a population into one grid of panels, streaming it to a binary stream.
+
+        Only one row of panels is held in memory at a time, whatever the size of the population.
+
+        Args:
+            population (Population): The genotypes to render, in row order.
+            stream (file): The binary stream to write to.
+            imageFormat (str): "svg" or "ppm".
+            geometry (PanelGeometry): The interior size of the panel every creature is laid out for.
+            columns (int): The number of panels per row.
+            scale (float): The number of pixels per panel unit.
+            borderWidth (int): The width in pixels of the border around each panel.
+
+        Returns:
+            int: How many of the creatures fit their panel and were drawn.
+    """
+    panelWidth = int(round(geometry.interiorWidth * scale)) + (2 * borderWidth)
+    panelHeight = int(round(geometry.interiorHeight * scale)) + (2 * borderWidth)
+    columns = max(min(columns, len(population)), 1)
+    rows = (len(population) + columns - 1) // columns
+    drawnCount = 0
+
+    if (imageFormat == "svg"):
+        textStream = _TextWriter(stream)
+        renderer = SvgRenderer(textStream, panelWidth * columns, panelHeight * rows)
+        for index in range(len(population)):
+            if renderer.drawPanel(population.creature(index), geometry, (index % columns) * panelWidth,
+                                  (index // columns) * panelHeight, scale, borderWidth):
+                drawnCount += 1
+        renderer.close()
+        return drawnCount
+
+    renderer = RasterRenderer(panelWidth * columns, panelHeight)
+    RasterRenderer.writePpmHeader(stream, panelWidth * columns, panelHeight * rows)
+    for row in range(rows):
+        renderer.clear()
+        for column in range(columns):
+            index = (row * columns) + column
+            if (index >= len(population)):
+                break
+            if renderer.drawPanel(population.creature(index), geometry, column * panelWidth, 0, scale, borderWidth):
+                drawnCount += 1
+        renderer.writePixels(stream)
+    return drawnCount
+
+
+def writeImageFiles(population, directory, imageFormat, geometry, scale=1.0):
+    """ Render every genotype of a population into its own file in a directory.
+
+        Files are numbered in population order, for example 000042.svg.
+
+        Args:
+            population (Population): The genotypes to render.
+            directory (str): The directory to write to.  It is created if missing.
+            imageFormat (str): "svg" or "ppm".
+            geometry (PanelGeometry): The interior size of the panel every creature is laid out for.
+            scale (float): The number of pixels per panel unit.
+
+        Returns:
+            int: How many of the creatures fit their panel and were drawn.
+    """
+    os.makedirs(directory, exist_ok=True)
+    width = int(round(geometry.interiorWidth * scale))
+    height = int(round(geometry.interiorHeight * scale))
+    drawnCount = 0
+    renderer = None
+    if (imageFormat == "ppm"):
+        renderer = RasterRenderer(width, height)
+
+    for index in range(len(population)):
+        creature = population.creature(index)
+        path = os.path.join(directory, "%06d.%s" % (index, imageFormat))
+        if (imageFormat == "svg"):
+            with open(path, "w") as textStream:
+                svgRenderer = SvgRenderer(textStream, width, height)
+                drawn = svgRenderer.drawCreature(creature, geometry, 0, 0, scale)
+                svgRenderer.close()
+        else:
+            renderer.clear()
+            drawn = renderer.drawCreature(creature, geometry, 0, 0, scale)
+            with open(path, "wb") as binaryStream:
+                renderer.writePpm(binaryStream)
+        if drawn:
+            drawnCount += 1
+    return drawnCount
+
+
+class _TextWriter:
+    """ Adapter that writes text to a binary stream as UTF-8. """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        self.stream.write(text.encode("utf-8"))
+
+
+def main(argv=None):
+    """ Render genotypes from the command line.  Returns the exit status. """
+    parser = argparse.ArgumentParser(description="Render creatures to SVG or PPM without a display.")
+    parser.add_argument("genotypeFile", nargs="?", help="File of genotypes, one per line.  Use - for standard input.")
+    parser.add_argument("--random", type=int, default=0, metavar="COUNT", help="Render this many random genotypes instead of reading a file.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the random genotypes.")
+    parser.add_argument("--chromosomes", type=int, default=Genotype.CHROMOSOME_COUNT,
+                        help="Chromosomes of each random genotype, up to %d." % Genotype.MAX_CHROMOSOME_COUNT)
+    parser.add_argument("--width", type=float, default=200, help="Interior width of the panel creatures are laid out for.")
+    parser.add_argument("--height", type=float, default=200, help="Interior height of the panel creatures are laid out for.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Pixels per panel unit.  Below one makes thumbnails.")
+    parser.add_argument("--format", dest="imageFormat", choices=["svg", "ppm"], default=None,
+                        help="Image format.  Default = taken from the sheet's extension, otherwise svg.")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--sheet", help="Write one contact sheet to this file.  Use - for standard output.")
+    output.add_argument("--output-dir", dest="outputDirectory", help="Write one file per genotype into this directory.")
+    parser.add_argument("--columns", type=int, default=10, help="Panels per row of the contact sheet.")
+    arguments = parser.parse_args(argv)
+
+    if (arguments.random > 0):
+        population = Population.random(arguments.random, numpy.random.default_rng(arguments.seed), arguments.chromosomes)
+    elif ((arguments.genotypeFile == None) or (arguments.genotypeFile == "-")):
+        population = parseGenotypes(sys.stdin)
+    else:
+        with open(arguments.genotypeFile) as genotypeStream:
+            population = parseGenotypes(genotypeStream)
+
+    imageFormat = arguments.imageFormat
+    if (imageFormat == None):
+        imageFormat = "svg"
+        if ((arguments.sheet != None) and arguments.sheet.lower().endswith(".ppm")):
+            imageFormat = "ppm"
+
+    geometry = PanelGeometry(arguments.width, arguments.height)
+    if (arguments.outputDirectory != None):
+        drawnCount = writeImageFiles(population, arguments.outputDirectory, imageFormat, geometry, arguments.scale)
+    elif (arguments.sheet == "-"):
+        drawnCount = writeContactSheet(population, sys.stdout.buffer, imageFormat, geometry, arguments.columns, arguments.scale)
+    else:
+        with open(arguments.sheet, "wb") as sheetStream:
+            drawnCount = writeContactSheet(population, sheetStream, imageFormat, geometry, arguments.columns, arguments.scale)
+
+    sys.stderr.write("%d of %d creatures fit their panels\n" % (drawnCount, len(population)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+# Copyright 2015 Brian Macker
+""" An append-only log of every creature bred, with the parent each descends from.
+
+    Records are fixed width, so the log is read through mmap as a NumPy structured array
+    without copying, and a creature's record is found straight from its id.  Reading the
+    log with numpy looks like this:
+
+        store = LineageStore("evolve-lineage.bin", readOnly=True)
+        fitnesses = store.records()["fitness"]
+        ancestorIds = store.ancestors(12345)
+"""
+import os
+import mmap
+import struct
+import numpy
+from creature import *
+
+
+class LineageStore:
+    """ Class holding an append-only file of lineage records read through a memory map.
+
+        Each record holds a creature's id, the id of its parent, its generation, its fitness
+        and its chromosome values.  Ids are given out in order from zero, so a creature's
+        record is the one at its id.  A record left half written by a crash is dropped when
+        the file is opened again.
+
+        Attributes:
+            path (str): The path of the file.
+            chromosomeCount (int): The number of chromosome values in every record.
+            readOnly (bool): True if records cannot be appended.
+            recordDtype (numpy.dtype): The structured dtype of a record.
+    """
+
+    NO_PARENT = -1      # Parent id of a creature that was not bred from a logged parent
+
+    _MAGIC = b"EVOLINEA"
+    _VERSION = 1
+    _HEADER_FORMAT = "<8sIII"       # Magic, version, chromosome count, record size
+    _HEADER_SIZE = 64               # Bytes before the first record.  The header is padded out to this.
+
+    def __init__(self, path, chromosomeCount=None, readOnly=False):
+        """ Constructor for a LineageStore.  Opens the file, creating it if it does not exist.
+
+            Args:
+                path (str): The path of the file.
+                chromosomeCount (int): The number of chromosome values in every record.  Default = None
+                    takes it from an existing file, or Genotype.CHROMOSOME_COUNT for a new one.
+                readOnly (bool): True opens an existing file for reading only.
+
+            Raises:
+                ValueError: If the file is not a lineage store, or holds a different number of chromosomes.
+        """
+        self.path = path
+        self.readOnly = readOnly
+
+        if (readOnly or (os.path.exists(path) and (os.path.getsize(path) > 0))):
+            self._file = open(path, "rb" if readOnly else "r+b")
+            header = self._file.read(self._HEADER_SIZE)
+            if ((len(header) < self._HEADER_SIZE) or (header[:len(self._MAGIC)] != self._MAGIC)):
+                self._file.close()
+                raise ValueError("%s is not a lineage store" % path)
+            (magic, version, fileChromosomeCount, recordSize) = struct.unpack_from(self._HEADER_FORMAT, header)
+            if ((chromosomeCount != None) and (chromosomeCount != fileChromosomeCount)):
+                self._file.close()
+                raise ValueError("%s holds %d chromosomes per record, not %d" % (path, fileChromosomeCount, chromosomeCount))
+            chromosomeCount = fileChromosomeCount
+        else:
+            if (chromosomeCount == None):
+                chromosomeCount = Genotype.CHROMOSOME_COUNT
+            self._file = open(path, "w+b")
+            recordSize = None
+
+        self.chromosomeCount = chromosomeCount
+        self.recordDtype = numpy.dtype([("id", "<u8"), ("parentId", "<i8"), ("generation", "<u4"),
+                                        ("fitness", "<f4"), ("chromosomes", "<u4", (chromosomeCount,))])
+
+        if (recordSize == None):
+            header = struct.pack(self._HEADER_FORMAT, self._MAGIC, self._VERSION, chromosomeCount, self.recordDtype.itemsize)
+            self._file.write(header.ljust(self._HEADER_SIZE, b"\0"))
+            self._file.flush()
+        elif (recordSize != self.recordDtype.itemsize):
+            self._file.close()
+            raise ValueError("%s has records of %d bytes, not %d" % (path, recordSize, self.recordDtype.itemsize))
+
+        # Only whole records count.  A torn record at the end is overwritten by the next append.
+        self._count = (os.path.getsize(path) - self._HEADER_SIZE) // self.recordDtype.itemsize
+        if (not readOnly):
+            self._file.seek(self._HEADER_SIZE + (self._count * self.recordDtype.itemsize))
+            self._file.truncate()
+
+        # The memory map and the record view over it, remade once records are appended past its end
+        self._map = None
+        self._records = None
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        """ Close the file.  Views returned by records stay readable for as long as they are referenced. """
+        self._records = None
+        self._map = None
+        if (not self._file.closed):
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exceptionType, exceptionValue, traceback):
+        self.close()
+        return False
+
+    def append(self, chromosomeValues, parentId=NO_PARENT, generation=0, fitness=None):
+        """ Append a single record.
+
+            Args:
+                chromosomeValues (int[]): The creature's chromosome values.
+                parentId (int): The id of the creature's parent.  Default = NO_PARENT.
+                generation (int): The creature's generation.
+                fitness (float): The creature's fitness.  Default = None records NaN.
+
+            Returns:
+                int: The id of the new record.
+        """
+        return int(self.appendMany([chromosomeValues], [parentId], generation,
+                                   None if (fitness == None) else [fitness])[0])
+
+    def appendMany(self, chromosomeValues, parentIds, generation, fitnesses=None):
+        """ Append a record for each row of chromosome values with a single write.
+
+            Args:
+                chromosomeValues (numpy.ndarray): An (N, chromosomeCount) array of chromosome values.
+                parentIds (numpy.ndarray): The parent id of each creature.  NO_PARENT where there is none.
+                generation (int): The generation of every creature, or an array of one per creature.
+                fitnesses (numpy.ndarray): The fitness of each creature.  Default = None records NaN.
+
+            Returns:
+                numpy.ndarray: The ids of the new records.
+        """
+        if self.readOnly:
+            raise ValueError("%s was opened read only" % self.path)
+        chromosomeValues = numpy.asarray(chromosomeValues, dtype=numpy.uint32).reshape(-1, self.chromosomeCount)
+        recordCount = len(chromosomeValues)
+        ids = numpy.arange(self._count, self._count + recordCount, dtype=numpy.uint64)
+
+        records = numpy.empty(recordCount, dtype=self.recordDtype)
+        records["id"] = ids
+        records["parentId"] = parentIds
+        records["generation"] = generation
+        if (fitnesses is None):
+            records["fitness"] = numpy.nan
+        else:
+            records["fitness"] = fitnesses
+        records["chromosomes"] = chromosomeValues
+
+        self._file.write(records.tobytes())
+        self._count += recordCount
+        return ids
+
+    def logCreature(self, creature, fitness=None):
+        """ Append a record for the creature, unless it has one, and remember its id on the creature.
+
+            The creature's parent is the one it descends from, and its generation is one more than the parent's.
+
+            Args:
+                creature (Creature): The creature to log.
+                fitness (float): The creature's fitness.  Default = None records NaN.
+
+            Returns:
+                int: The id of the creature's record.
+        """
+        if (creature.lineageId == None):
+            parentId = creature.parentLineageId
+            if (parentId == None):
+                parentId = self.NO_PARENT
+                generation = 0
+            else:
+                generation = self.generation(parentId) + 1
+            chromosomeValues = [chromosome.chromosomeValue for chromosome in creature.genotype.chromosomes]
+            creature.lineageId = self.append(chromosomeValues, parentId, generation, fitness)
+        return creature.lineageId
+
+    def flush(self):
+        """ Write appended records through to the file. """
+        if (not self.readOnly):
+            self._file.flush()
+
+    def records(self):
+        """ Return every record as a structured array viewing the memory map, without copying.
+
+            Fields are id, parentId, generation, fitness and chromosomes, the last an
+            (N, chromosomeCount) array.  The view is read only, and does not grow as records are appended.
+
+            Returns:
+                numpy.ndarray: The records.
+        """
+        if ((self._records is None) or (len(self._records) < self._count)):
+            self.flush()
+            if (self._count == 0):
+                self._records = numpy.empty(0, dtype=self.recordDtype)
+            else:
+                # A view on the old map keeps it alive, so it is dropped rather than closed
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._records = numpy.frombuffer(self._map, dtype=self.recordDtype, count=self._count, offset=self._HEADER_SIZE)
+        return self._records
+
+    def record(self, creatureId):
+        """ Return the record of a creature. """
+        # Records already mapped are read without remapping for those appended since
+        if ((self._records is not None) and (creatureId < len(self._records))):
+            return self._records[creatureId]
+        return self.records()[creatureId]
+
+    def generation(self, creatureId):
+        """ Return the generation of a creature. """
+        return int(self.record(creatureId)["generation"])
+
+    def genotype(self, creatureId):
+        """ Return the genotype of a creature. """
+        return Genotype([Chromosome(chromosomeIndex, int(chromosomeValue))
+                         for chromosomeIndex, chromosomeValue in enumerate(self.record(creatureId)["chromosomes"])])
+
+    def creature(self, creatureId):
+        """ Return a creature rebuilt from its record, knowing its own id and its parent's. """
+        record = self.record(creatureId)
+        creature = Creature(self.genotype(creatureId))
+        creature.lineageId = creatureId
+        if (record["parentId"] != self.NO_PARENT):
+            creature.parentLineageId = int(record["parentId"])
+        return creature
+
+    def ancestors(self, creatureId, maxDepth=None):
+        """ Return the ids of a creature's parent, grandparent and so on back to the first logged ancestor.
+
+            Args:
+                creatureId (int): The id of the creature.
+                maxDepth (int): The most ancestors to return.  Default = None returns them all.
+
+            Returns:
+                numpy.ndarray: The ancestor ids, nearest first.
+        """
+        parentIds = self.records()["parentId"]
+        ancestorIds = []
+        parentId = int(parentIds[creatureId])
+        while ((parentId != self.NO_PARENT) and ((maxDepth == None) or (len(ancestorIds) < maxDepth))):
+            ancestorIds.append(parentId)
+            parentId = int(parentIds[parentId])
+        return numpy.array(ancestorIds, dtype=numpy.int64)
+
+    def lineage(self, creatureId, maxDepth=None):
+        """ Return the records of a creature and its ancestors, the creature first.
+
+            Args:
+                creatureId (int): The id of the creature.
+                maxDepth (int): The most ancestors to include.  Default = None includes them all.
+
+            Returns:
+                numpy.ndarray: A copy of the records.
+        """
+        return self.records()[numpy.concatenate(([creatureId], self.ancestors(creatureId, maxDepth)))]
+
+    def children(self, creatureId):
+        """ Return the ids of every creature bred from a creature. """
+        return numpy.flatnonzero(self.records()["parentId"] == creatureId)
@@ -0,0 +1,163 @@
+# Copyright 2015 Brian Macker
+""" Opt-in counters and phase timers for the hot paths of finding, laying out and drawing creatures.
+
+    The hooks in the creature, screener and display code report to the shared hotPathMetrics
+    object.  It starts out disabled, and every hook then returns at once, so leaving the hooks
+    in costs next to nothing.
+"""
+import json
+import time
+import threading
+
+
+class _NullPhase:
+    """ Context manager that times nothing, handed out while metrics are disabled. """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exceptionType, exceptionValue, traceback):
+        return False
+
+
+class _Phase:
+    """ Context manager that adds the time spent inside it to a phase. """
+
+    __slots__ = ("_metrics", "_name", "_startTime")
+
+    def __init__(self, metrics, name):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._startTime = time.perf_counter()
+        return self
+
+    def __exit__(self, exceptionType, exceptionValue, traceback):
+        self._metrics.addPhaseTime(self._name, time.perf_counter() - self._startTime)
+        return False
+
+
+class HotPathMetrics:
+    """ Class collecting counters, rejections by reason and wall time per phase.
+
+        Counters used by the hooks:
+            candidatesScreened: Candidates tried by the viability screener.
+            layoutsMade: Creatures laid out one at a time.
+            layoutsShared: Layouts taken from a creature that looks the same instead of being made.
+            segmentsLaidOut: Segments placed by either of them.
+            creaturesDrawn: Creatures drawn in a panel.
+            segmentsDrawn: Segments drawn in a panel.
+            panelsFilled, panelsLeftEmpty: Outcomes of filling an empty panel.
+
+        Phases timed by the hooks are layout, draw, search, indexNeighbors and makeParent.
+
+        Attributes:
+            enabled (bool): True if the hooks record anything.
+            stream (file): A text stream each call to emit writes a line of JSON to, or None.
+    """
+
+    _NULL_PHASE = _NullPhase()
+
+    def __init__(self):
+        self.enabled = False
+        self.stream = None
+        self._lock = threading.Lock()
+        self.reset()
+
+    def enable(self, stream=None):
+        """ Start recording.
+
+            Args:
+                stream (file): A text stream to write a line of JSON to on each emit.  Default = None writes nothing.
+        """
+        self.stream = stream
+        self.enabled = True
+
+    def disable(self):
+        """ Stop recording.  What was recorded is kept until reset. """
+        self.enabled = False
+
+    def reset(self):
+        """ Forget everything recorded. """
+        with self._lock:
+            self._counters = {}
+            self._rejections = {}
+            self._phaseSeconds = {}
+            self._phaseCalls = {}
+            self._startTime = time.time()
+
+    def count(self, name, amount=1):
+        """ Add to a counter. """
+        if self.enabled:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + amount
+
+    def countRejection(self, reason, amount=1):
+        """ Add to the count of creatures rejected for a reason, such as PhenotypeLayout.REJECTED_OUT_OF_BOUNDS. """
+        if self.enabled:
+            with self._lock:
+                self._rejections[reason] = self._rejections.get(reason, 0) + amount
+
+    def recordLayout(self, layout):
+        """ Count a creature just laid out, its segments and why it was rejected if it was. """
+        if self.enabled:
+            self.count("layoutsMade")
+            self.count("segmentsLaidOut", layout.segmentCount())
+            if (layout.rejection != None):
+                self.countRejection(layout.rejection)
+
+    def phase(self, name):
+        """ Return a context manager that adds the time spent inside it to the phase. """
+        if self.enabled:
+            return _Phase(self, name)
+        return self._NULL_PHASE
+
+    def addPhaseTime(self, name, seconds):
+        """ Add time spent in a phase. """
+        with self._lock:
+            self._phaseSeconds[name] = self._phaseSeconds.get(name, 0.0) + seconds
+            self._phaseCalls[name] = self._phaseCalls.get(name, 0) + 1
+
+    def metrics(self):
+        """ Return everything recorded as a dict of plain values.
+
+            Returns:
+                dict: counters, rejections, phaseSeconds and phaseCalls, each a dict by name, and the seconds since reset.
+        """
+        with self._lock:
+            return {"seconds": time.time() - self._startTime,
+                    "counters": dict(self._counters),
+                    "rejections": dict(self._rejections),
+                    "phaseSeconds": dict(self._phaseSeconds),
+                    "phaseCalls": dict(self._phaseCalls)}
+
+    def emit(self, event):
+        """ Write the metrics as a line of JSON to the stream, if recording to one.
+
+            Args:
+                event (str): What just happened, written as the line's event.
+        """
+        if (self.enabled and (self.stream != None)):
+            record = {"event": event, "time": time.time()}
+            record.update(self.metrics())
+            self.stream.write(json.dumps(record) + "\n")
+            self.stream.flush()
+
+    def summaryLine(self):
+        """ Return a one line summary short enough for the display header. """
+        metrics = self.metrics()
+        counters = metrics["counters"]
+        phaseSeconds = metrics["phaseSeconds"]
+        tried = counters.get("candidatesScreened", 0) + counters.get("layoutsMade", 0)
+        rejected = sum(metrics["rejections"].values())
+        rejectedPercent = 0
+        if (tried > 0):
+            rejectedPercent = round(100 * rejected / tried)
+        return "Tried %d  Rejected %d%%  Segs %d/%d  Search %.1fs Draw %.1fs" % (
+            tried, rejectedPercent, counters.get("segmentsLaidOut", 0), counters.get("segmentsDrawn", 0),
+            phaseSeconds.get("search", 0.0) + phaseSeconds.get("indexNeighbors", 0.0), phaseSeconds.get("draw", 0.0))
+
+
+# The metrics every hook reports to
+hotPathMetrics = HotPathMetrics()
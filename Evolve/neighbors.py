@@ -0,0 +1,151 @@
+# Copyright 2015 Brian Macker
+import itertools
+import numpy
+from creature import *
+from population import *
+from viability import *
+
+
+class NeighborIndex:
+    """ Class holding every mutated child a parent can have, and which of them fit a panel.
+
+        A child differs from its parent by one up to MUTATION_RATE_MAXIMUM flipped bits, so for
+        a fixed parent the whole neighborhood is small enough to enumerate and screen once.
+        Children are then sampled straight from the viable ones instead of retrying random
+        mutations until one fits.  Children whose mutations change nothing that shows are
+        passed over while there are others to choose from.  Deep genotypes have more children
+        at a distance than are worth screening, so only a uniform random sample of those is kept.
+
+        Attributes:
+            parentCreature (Creature): The parent whose neighborhood is indexed.
+            neighborsByDistance (dict): Maps a number of flipped bits to a Population of every child that far from the parent,
+                or of a random sample of them if there are more than _MAX_CHILDREN_PER_DISTANCE.
+    """
+
+    # Children drawn while looking for one unlike those already shown, before settling for a look-alike
+    _DISTINCT_CHILD_ATTEMPTS = 32
+    # Most children kept at each distance.  Every child of a genotype of four chromosomes is kept.
+    _MAX_CHILDREN_PER_DISTANCE = 8192
+
+    def __init__(self, parentCreature, screener=None, randomGenerator=None):
+        """ Constructor for a NeighborIndex.  Enumerates every child of the parent, or a sample of those of a deep one.
+
+            Args:
+                parentCreature (Creature): The parent whose neighborhood is indexed.
+                screener (ViabilityScreener): The screener used to test the children.  Default = None creates one.
+                randomGenerator (numpy.random.Generator): The generator children are sampled with.  Default = None uses an unseeded generator.
+        """
+        self.parentCreature = parentCreature
+        if (screener == None):
+            screener = ViabilityScreener()
+        self._screener = screener
+        if (randomGenerator == None):
+            randomGenerator = numpy.random.default_rng()
+        self._randomGenerator = randomGenerator
+
+        parentValues = numpy.array([chromosome.chromosomeValue for chromosome in parentCreature.genotype.chromosomes], dtype=numpy.uint32)
+        bitCount = len(parentValues) * 32
+        self.neighborsByDistance = {}
+        for distance in range(1, Genotype.MUTATION_RATE_MAXIMUM + 1):
+            flippedBits = self._flippedBits(bitCount, distance)
+            # Deep genotypes have too many children to screen on every click, so a random sample of them stands in
+            if (len(flippedBits) > self._MAX_CHILDREN_PER_DISTANCE):
+                sampledIndexes = randomGenerator.choice(len(flippedBits), size=self._MAX_CHILDREN_PER_DISTANCE, replace=False)
+                flippedBits = flippedBits[numpy.sort(sampledIndexes)]
+            chromosomeValues = numpy.tile(parentValues, (len(flippedBits), 1))
+            rows = numpy.arange(len(flippedBits))
+            for column in range(distance):
+                chromosomeValues[rows, flippedBits[:, column] // 32] ^= numpy.left_shift(numpy.uint32(1), (flippedBits[:, column] % 32).astype(numpy.uint32))
+            self.neighborsByDistance[distance] = Population(chromosomeValues)
+
+        # Which neighbors look different from the parent
+        parentExpressedValues = numpy.array(parentCreature.expressedKey(), dtype=numpy.uint32)
+        self._phenotypeChanged = {distance: (neighbors.expressedValues() != parentExpressedValues).any(axis=1)
+                                  for (distance, neighbors) in self.neighborsByDistance.items()}
+
+        # Indexes of the viable neighbors, and of those that look different from the parent, at each distance per panel geometry
+        self._viableIndexes = {}
+        self._visibleIndexes = {}
+
+    @staticmethod
+    def _flippedBits(bitCount, distance):
+        """ Return every combination of distance bit numbers out of bitCount, one row per combination, in ascending order. """
+        if (distance == 1):
+            return numpy.arange(bitCount, dtype=numpy.int64).reshape(-1, 1)
+        if (distance == 2):
+            return numpy.column_stack(numpy.triu_indices(bitCount, 1)).astype(numpy.int64)
+        return numpy.array(list(itertools.combinations(range(bitCount), distance)), dtype=numpy.int64).reshape(-1, distance)
+
+    def viableIndexes(self, geometry):
+        """ Return the indexes of the children that fit the geometry, screening them the first time it is seen.
+
+            Args:
+                geometry (PanelGeometry): The interior size of the panel the children must fit inside of.
+
+            Returns:
+                dict: Maps a number of flipped bits to an array of indexes into neighborsByDistance.
+        """
+        viableIndexes = self._viableIndexes.get(geometry)
+        if (viableIndexes == None):
+            viableIndexes = {distance: self._screener.screen(neighbors, geometry).viableIndexes()
+                             for (distance, neighbors) in self.neighborsByDistance.items()}
+            self._viableIndexes[geometry] = viableIndexes
+        return viableIndexes
+
+    def visibleIndexes(self, geometry):
+        """ Return the indexes of the children that fit the geometry and look different from the parent.
+
+            Args:
+                geometry (PanelGeometry): The interior size of the panel the children must fit inside of.
+
+            Returns:
+                dict: Maps a number of flipped bits to an array of indexes into neighborsByDistance.
+        """
+        visibleIndexes = self._visibleIndexes.get(geometry)
+        if (visibleIndexes == None):
+            visibleIndexes = {distance: indexes[self._phenotypeChanged[distance][indexes]]
+                              for (distance, indexes) in self.viableIndexes(geometry).items()}
+            self._visibleIndexes[geometry] = visibleIndexes
+        return visibleIndexes
+
+    def viableCount(self, geometry):
+        """ Return how many children of the parent fit the geometry. """
+        return sum(len(indexes) for indexes in self.viableIndexes(geometry).values())
+
+    def sterile(self, geometry):
+        """ Return True if the parent has no children at all that fit the geometry. """
+        return self.viableCount(geometry) == 0
+
+    def sampleChild(self, geometry, excludedKeys=None):
+        """ Return a random child of the parent that fits the geometry, or None if the parent is sterile.
+
+            Children are drawn with the same odds as mutating the parent with Genotype.mutatedCopy
+            until one fits.  Every number of mutations is equally likely, so a viable child is
+            weighted by the fraction of the children at its distance that are viable.  Children
+            that look just like the parent are only drawn when no other child fits, and a few
+            tries are made for a child whose expressed key is not excluded.
+
+            Args:
+                geometry (PanelGeometry): The interior size of the panel the child must fit inside of.
+                excludedKeys (set): Expressed keys of creatures already shown, such as the child's siblings.  Default = None excludes none.
+
+            Returns:
+                Creature: The child, or None.
+        """
+        candidateIndexes = self.visibleIndexes(geometry)
+        if (not any(len(indexes) > 0 for indexes in candidateIndexes.values())):
+            candidateIndexes = self.viableIndexes(geometry)
+        distances = [distance for distance in candidateIndexes if (len(candidateIndexes[distance]) > 0)]
+        if (len(distances) == 0):
+            return None
+        weights = numpy.array([len(candidateIndexes[distance]) / len(self.neighborsByDistance[distance]) for distance in distances])
+        weights /= weights.sum()
+
+        for attempt in range(self._DISTINCT_CHILD_ATTEMPTS):
+            distance = distances[self._randomGenerator.choice(len(distances), p=weights)]
+            index = self._randomGenerator.choice(candidateIndexes[distance])
+            child = self.neighborsByDistance[distance].creature(index)
+            if ((excludedKeys == None) or (child.expressedKey() not in excludedKeys)):
+                break
+        child.descendFrom(self.parentCreature)
+        return child
@@ -0,0 +1,180 @@
+# Copyright 2015 Brian Macker
+""" A population far larger than the grid of panels, browsed one page at a time.
+"""
+import numpy
+from creature import *
+from population import *
+from viability import *
+from lineage import *
+
+
+class PagedPopulation:
+    """ Class holding a logical population of creatures that fit a panel, shown a page of panels at a time.
+
+        Genotypes are held as one compact Population.  Creature objects and their layouts are
+        only made a page at a time, and only the pages in a bounded least recently used cache
+        are kept, so memory grows with the size of the cache rather than of the population.
+        Pages already seen are shown again straight from the cache.  The lineage ids of creatures
+        that have been logged are kept for the whole population, so a page laid out again after
+        being evicted brings back creatures that are already logged.
+
+        Attributes:
+            population (Population): Every genotype of the logical population.
+            pageSize (int): How many creatures are on a page.
+            geometry (PanelGeometry): The interior size of the panels the creatures fit.
+            parentCreature (Creature): The parent every creature is a child of, or None if they are unrelated.
+            pageCache (LeastRecentlyUsedCache): The laid out creatures of recently used pages, by page number.
+            lineageIds (numpy.ndarray): Lineage store id of each creature.  LineageStore.NO_PARENT where there is none.
+    """
+
+    CACHED_PAGES = 16               # Pages of laid out creatures kept by default
+    _ATTEMPTS_PER_CREATURE = 64     # Random candidates a random population may screen for each creature wanted
+
+    def __init__(self, population, pageSize, geometry, parentCreature=None, cachedPages=CACHED_PAGES):
+        """ Constructor for a PagedPopulation.
+
+            Args:
+                population (Population): Every genotype of the logical population.  Each must fit the geometry.
+                pageSize (int): How many creatures are on a page.
+                geometry (PanelGeometry): The interior size of the panels the creatures fit.
+                parentCreature (Creature): The parent every creature is a child of.  Default = None.
+                cachedPages (int): The most pages of laid out creatures to keep.
+        """
+        self.population = population
+        self.pageSize = pageSize
+        self.geometry = geometry
+        self.parentCreature = parentCreature
+        self.pageCache = LeastRecentlyUsedCache(cachedPages)
+        self.lineageIds = numpy.full(len(population), LineageStore.NO_PARENT, dtype=numpy.int64)
+
+    @classmethod
+    def children(cls, neighborIndex, pageSize, geometry, maxSize=None, cachedPages=CACHED_PAGES):
+        """ Return the children of an indexed parent that fit the geometry, each looking different.
+
+            Children that look like the parent are left out unless no other child fits.  Those
+            one mutation away come first.
+
+            Args:
+                neighborIndex (NeighborIndex): The index of the parent's children.
+                pageSize (int): How many creatures are on a page.
+                geometry (PanelGeometry): The interior size of the panels the creatures must fit.
+                maxSize (int): The most children to keep.  Default = None keeps them all.
+                cachedPages (int): The most pages of laid out creatures to keep.
+
+            Returns:
+                PagedPopulation: The children.
+        """
+        candidateIndexes = neighborIndex.visibleIndexes(geometry)
+        if (not any(len(indexes) > 0 for indexes in candidateIndexes.values())):
+            candidateIndexes = neighborIndex.viableIndexes(geometry)
+        chromosomeValues = numpy.concatenate([neighborIndex.neighborsByDistance[distance].chromosomeValues[indexes]
+                                              for (distance, indexes) in sorted(candidateIndexes.items())])
+        children = Population(chromosomeValues)
+
+        # Keep the first child with each expressed key, in the order they came
+        (expressedValues, firstIndexes) = numpy.unique(children.expressedValues(), axis=0, return_index=True)
+        keptIndexes = numpy.sort(firstIndexes)[:maxSize]
+        return cls(Population(chromosomeValues[keptIndexes]), pageSize, geometry, neighborIndex.parentCreature, cachedPages)
+
+    @classmethod
+    def random(cls, screener, size, pageSize, geometry, cachedPages=CACHED_PAGES):
+        """ Return up to size random creatures that fit the geometry, found by the screener.
+
+            Searching stops once size creatures are found, or once the screener's attempt budget
+            or a budget for each creature wanted has been used up, so fewer may be returned.
+
+            Args:
+                screener (ViabilityScreener): The screener to find the creatures with.
+                size (int): The number of creatures wanted.
+                pageSize (int): How many creatures are on a page.
+                geometry (PanelGeometry): The interior size of the panels the creatures must fit.
+                cachedPages (int): The most pages of laid out creatures to keep.
+
+            Returns:
+                PagedPopulation: The random creatures.
+        """
+        viableValues = [numpy.empty((0, screener.chromosomeCount), dtype=numpy.uint32)]
+        viableCount = 0
+        attempts = 0
+        maxAttempts = max(screener.maxAttempts, size * cls._ATTEMPTS_PER_CREATURE)
+        while ((viableCount < size) and (attempts < maxAttempts)):
+            candidates = Population.random(screener.batchSize, screener.randomGenerator, screener.chromosomeCount)
+            chromosomeValues = candidates.chromosomeValues[screener.screen(candidates, geometry).viableIndexes()]
+            viableValues.append(chromosomeValues)
+            viableCount += len(chromosomeValues)
+            attempts += screener.batchSize
+        chromosomeValues = numpy.concatenate(viableValues)[:size]
+        return cls(Population(chromosomeValues), pageSize, geometry, None, cachedPages)
+
+    def __len__(self):
+        return len(self.population)
+
+    def pageCount(self):
+        """ Return the number of pages, counting a last page that is only partly full. """
+        return max(1, -(-len(self.population) // self.pageSize))
+
+    def creatures(self, firstIndex, count):
+        """ Return the laid out creatures starting at an index of the population, laying out pages not cached.
+
+            Args:
+                firstIndex (int): The index of the first creature.  It need not start a page.
+                count (int): The number of creatures.
+
+            Returns:
+                Creature[]: The creatures, padded with None past the end of the population.
+        """
+        creatures = []
+        for index in range(firstIndex, firstIndex + count):
+            if ((index < 0) or (index >= len(self.population))):
+                creatures.append(None)
+                continue
+            (pageNumber, pageIndex) = divmod(index, self.pageSize)
+            creatures.append(self.page(pageNumber)[pageIndex])
+        return creatures
+
+    def page(self, pageNumber):
+        """ Return the laid out creatures of a page, from the cache if it is there.
+
+            Args:
+                pageNumber (int): The zero based number of the page.
+
+            Returns:
+                Creature[]: The creatures on the page.  The last page may have fewer than pageSize.
+        """
+        pageCreatures = self.pageCache.lookup(pageNumber)
+        if (pageCreatures == None):
+            pageCreatures = []
+            for index in range(pageNumber * self.pageSize, min((pageNumber + 1) * self.pageSize, len(self.population))):
+                creature = self.population.creature(index)
+                if (self.lineageIds[index] != LineageStore.NO_PARENT):
+                    creature.lineageId = int(self.lineageIds[index])
+                if (self.parentCreature != None):
+                    creature.descendFrom(self.parentCreature)
+                creature.layout(self.geometry)
+                pageCreatures.append(creature)
+            self.pageCache.storeValue(pageNumber, pageCreatures)
+        return pageCreatures
+
+    def prefetch(self, firstIndex, count):
+        """ Lay out every page the creatures starting at the index are on, so showing them later is instant.
+
+            Safe to call from a background thread.
+
+            Args:
+                firstIndex (int): The index of the first creature.
+                count (int): The number of creatures.
+        """
+        lastIndex = min(firstIndex + count, len(self.population)) - 1
+        for pageNumber in range(max(firstIndex, 0) // self.pageSize, (lastIndex // self.pageSize) + 1):
+            self.page(pageNumber)
+
+    def rememberLineageIds(self, firstIndex, creatures):
+        """ Keep the lineage ids of creatures starting at an index, so they survive their page being evicted.
+
+            Args:
+                firstIndex (int): The index of the first creature.
+                creatures (Creature[]): The creatures, as returned by creatures.  None and unlogged ones are skipped.
+        """
+        for (index, creature) in enumerate(creatures, firstIndex):
+            if ((creature != None) and (creature.lineageId != None) and (0 <= index < len(self.population))):
+                self.lineageIds[index] = creature.lineageId
@@ -0,0 +1,150 @@
+# Copyright 2015 Brian Macker
+import os
+import random
+import concurrent.futures
+import numpy
+from creature import *
+from viability import *
+
+
+def _generateCandidate(parentValues, interiorWidth, interiorHeight, seedWords, maxAttempts, timeLimit, chromosomeCount):
+    """ Find one creature that fits a panel.  Runs inside a worker process.
+
+        Only plain values cross between processes, so the result is the accepted genotype
+        as ints and its layout as segment records.
+
+        Args:
+            parentValues (int[]): Chromosome values of the parent, or None for a random creature.
+            interiorWidth (float): The interior width of the panel.
+            interiorHeight (float): The interior height of the panel.
+            seedWords (int[]): Seed of the random stream used for this panel.
+            maxAttempts (int): The most candidates the search may try.
+            timeLimit (float): The most seconds the search may take.
+            chromosomeCount (int): The number of chromosomes of a random creature.
+
+        Returns:
+            tuple: (chromosomeValues, segmentRecords), or None if nothing fit within the budget.
+    """
+    geometry = PanelGeometry(interiorWidth, interiorHeight)
+    screener = ViabilityScreener(maxAttempts=maxAttempts, timeLimit=timeLimit,
+                                 randomGenerator=numpy.random.default_rng(numpy.random.SeedSequence(seedWords)),
+                                 chromosomeCount=chromosomeCount)
+
+    parentCreature = None
+    if (parentValues != None):
+        parentCreature = Creature(Genotype([Chromosome(chromosomeIndex, chromosomeValue)
+                                            for chromosomeIndex, chromosomeValue in enumerate(parentValues)]))
+
+    creature = screener.findViable(geometry, parentCreature)
+    # If the parent has no children that fit in time then settle for a random creature
+    if ((creature == None) and (parentCreature != None)):
+        creature = screener.findViable(geometry)
+    if (creature == None):
+        return None
+
+    layout = creature.layout(geometry)
+    if (not layout.viable):
+        return None
+    return ([chromosome.chromosomeValue for chromosome in creature.genotype.chromosomes], layout.segmentRecords())
+
+
+class ParallelCandidateGenerator:
+    """ Class that finds creatures for many panels at once on a pool of worker processes.
+
+        Every panel of every request gets its own random stream, seeded from the generator's
+        seed, a request counter and the panel number.  Results therefore do not depend on
+        which worker handles which panel, and a run with the same seed is reproduced exactly.
+
+        Attributes:
+            seed (int): The seed all random streams are derived from.
+            maxAttempts (int): The most candidates the search for one panel may try.
+            timeLimit (float): The most seconds the search for one panel may take.
+            chromosomeCount (int): The number of chromosomes of random creatures.
+            requestCount (int): The number of requests made so far.  The next request's streams are seeded with it.
+    """
+
+    def __init__(self, workerCount=None, seed=None, maxAttempts=4096, timeLimit=0.5, chromosomeCount=None):
+        """ Constructor for a ParallelCandidateGenerator.  Starts the worker processes.
+
+            Args:
+                workerCount (int): The number of worker processes.  Default = None uses one per core.
+                seed (int): The seed all random streams are derived from.  Default = None picks one at random.
+                maxAttempts (int): The most candidates the search for one panel may try.
+                timeLimit (float): The most seconds the search for one panel may take.
+                chromosomeCount (int): The number of chromosomes of random creatures.  Default = None uses Genotype.CHROMOSOME_COUNT.
+        """
+        if (workerCount == None):
+            workerCount = os.cpu_count() or 1
+        if (seed == None):
+            seed = random.getrandbits(64)
+        self.seed = seed
+        self.maxAttempts = maxAttempts
+        self.timeLimit = timeLimit
+        if (chromosomeCount == None):
+            chromosomeCount = Genotype.CHROMOSOME_COUNT
+        self.chromosomeCount = chromosomeCount
+        self.requestCount = 0
+        self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=workerCount)
+
+    def submit(self, geometry, panelCount, parentCreature=None):
+        """ Start finding a creature for each of a number of panels.
+
+            Args:
+                geometry (PanelGeometry): The interior size of the panels.
+                panelCount (int): The number of panels to find creatures for.
+                parentCreature (Creature): The parent to breed children of.  Default = None finds random creatures.
+
+            Returns:
+                concurrent.futures.Future[]: One future per panel.  Pass each result to candidateFromResult.
+        """
+        parentValues = None
+        if (parentCreature != None):
+            parentValues = [chromosome.chromosomeValue for chromosome in parentCreature.genotype.chromosomes]
+
+        requestNumber = self.requestCount
+        self.requestCount += 1
+        return [self._executor.submit(_generateCandidate, parentValues, geometry.interiorWidth, geometry.interiorHeight,
+                                      [self.seed, requestNumber, panelNumber], self.maxAttempts, self.timeLimit,
+                                      self.chromosomeCount)
+                for panelNumber in range(panelCount)]
+
+    def generate(self, geometry, panelCount, parentCreature=None):
+        """ Find a creature for each of a number of panels, waiting until all are found.
+
+            Args:
+                geometry (PanelGeometry): The interior size of the panels.
+                panelCount (int): The number of panels to find creatures for.
+                parentCreature (Creature): The parent to breed children of.  Default = None finds random creatures.
+
+            Returns:
+                Creature[]: One creature per panel, already laid out for the geometry, or None where nothing fit.
+        """
+        futures = self.submit(geometry, panelCount, parentCreature)
+        return [self.candidateFromResult(future.result(), geometry, parentCreature) for future in futures]
+
+    @staticmethod
+    def candidateFromResult(result, geometry, parentCreature=None):
+        """ Return the creature a worker found, with its layout cached for the geometry.
+
+            Args:
+                result (tuple): The result of a future returned by submit.
+                geometry (PanelGeometry): The interior size of the panels.
+                parentCreature (Creature): The parent the creature was bred from.  Default = None.
+
+            Returns:
+                Creature: The creature, or None if the worker found nothing that fit.
+        """
+        if (result == None):
+            return None
+        (chromosomeValues, segmentRecords) = result
+        genotype = Genotype([Chromosome(chromosomeIndex, chromosomeValue)
+                             for chromosomeIndex, chromosomeValue in enumerate(chromosomeValues)])
+        creature = Creature(genotype)
+        if (parentCreature != None):
+            creature.descendFrom(parentCreature)
+        creature.layouts[geometry] = PhenotypeLayout.fromSegmentRecords(genotype, segmentRecords)
+        return creature
+
+    def shutdown(self, wait=True):
+        """ Stop the worker processes, cancelling work not yet started. """
+        self._executor.shutdown(wait=wait, cancel_futures=True)
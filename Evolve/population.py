@@ -0,0 +1,246 @@
+# Copyright 2015 Brian Macker
+import numpy
+from creature import *
+
+
+class DecodedChromosomes:
+    """ Class holding the decoded genes of many chromosomes as whole arrays.
+
+        Every attribute has the same shape as the chromosome values that were decoded and
+        means exactly what the attribute of the same name means on a Chromosome.
+
+        Attributes:
+            branchAngle (numpy.ndarray): Angle in degrees between branches.
+            length (numpy.ndarray): Length of a line, or diameter of a dot or circle.
+            symmetryBits (numpy.ndarray): The symmetry value.
+            branchCount (numpy.ndarray): Branch count per direction.
+            terminated (numpy.ndarray): True where the chromosome terminates growth.
+            lineWidth (numpy.ndarray): The pen width used to draw the segment.
+            lineColorIndex (numpy.ndarray): Index of the line color into Chromosome._SEGMENT_COLORS.
+            fillColorIndex (numpy.ndarray): Index of the fill color into Chromosome._SEGMENT_COLORS.
+            shape (numpy.ndarray): The shape value.
+    """
+
+    # Color names in the same order as the color genes index them
+    _SEGMENT_COLORS = numpy.array(Chromosome._SEGMENT_COLORS)
+
+    def __init__(self, chromosomeValues):
+        """ Constructor for DecodedChromosomes.  Decodes every gene in one pass over the values.
+
+            Args:
+                chromosomeValues (numpy.ndarray): Chromosome values of any shape.  They are treated as uint32.
+        """
+        values = numpy.asarray(chromosomeValues, dtype=numpy.uint32)
+
+        self.branchAngle = self._extract(values, Chromosome._BRANCH_ANGLE_GENE_BITS, Chromosome._BRANCH_ANGLE_SHIFT_NUMBER)
+        self.length = self._extract(values, Chromosome._LENGTH_GENE_BITS, Chromosome._LENGTH_SHIFT_NUMBER)
+        self.symmetryBits = self._extract(values, Chromosome._SYMMETRY_GENE_BITS, Chromosome._SYMMETRY_SHIFT_NUMBER)
+        self.branchCount = self._extract(values, Chromosome._BRANCH_COUNT_GENE_BITS, Chromosome._BRANCH_COUNT_SHIFT_NUMBER)
+        self.terminated = (values & numpy.uint32(Chromosome._SEGMENT_TERMINATION_GENE_BITS)) == Chromosome._SEGMENT_TERMINATED
+        # Mirrors Chromosome, where the one added below the line width bits never reaches them
+        self.lineWidth = (((values & numpy.uint32(Chromosome._LINE_WIDTH_GENE_BITS)) + numpy.uint32(1))
+                          >> numpy.uint32(Chromosome._LINE_WIDTH_SHIFT_NUMBER)).astype(numpy.uint8)
+        self.lineColorIndex = self._extract(values, Chromosome._LINE_COLOR_GENE_BITS, Chromosome._LINE_COLOR_SHIFT_NUMBER) % Chromosome._MAX_COLORS
+        self.fillColorIndex = self._extract(values, Chromosome._FILL_COLOR_GENE_BITS, Chromosome._FILL_COLOR_SHIFT_NUMBER) % Chromosome._MAX_COLORS
+        self.shape = self._extract(values, Chromosome._SHAPE_GENE_BITS, Chromosome._SHAPE_SHIFT_NUMBER)
+
+    @staticmethod
+    def _extract(values, geneBits, shiftNumber):
+        """ Return the gene selected by the bits, shifted down to start at bit zero.  Every gene fits in a byte. """
+        return ((values & numpy.uint32(geneBits)) >> numpy.uint32(shiftNumber)).astype(numpy.uint8)
+
+    def lineColors(self):
+        """ Return the line color names as an array. """
+        return self._SEGMENT_COLORS[self.lineColorIndex]
+
+    def fillColors(self):
+        """ Return the fill color names as an array. """
+        return self._SEGMENT_COLORS[self.fillColorIndex]
+
+
+class Population:
+    """ Class holding many genotypes as one columnar array of chromosome values.
+
+        This is the compact form used when large numbers of genotypes have to be generated
+        and screened.  Creature and Genotype objects are only built on demand.
+
+        Attributes:
+            chromosomeValues (numpy.ndarray): An (N, chromosomeCount) uint32 array.  One row per genotype.
+    """
+
+    def __init__(self, chromosomeValues):
+        """ Constructor for a Population.
+
+            Args:
+                chromosomeValues (numpy.ndarray): An (N, chromosomeCount) array of chromosome values.
+                    Every genotype has the same number of chromosomes, from 1 up to Genotype.MAX_CHROMOSOME_COUNT.
+        """
+        chromosomeValues = numpy.asarray(chromosomeValues, dtype=numpy.uint32)
+        if (chromosomeValues.ndim != 2):
+            raise ValueError("chromosome values must have shape (N, chromosomeCount)")
+        Genotype.checkChromosomeCount(chromosomeValues.shape[1])
+        self.chromosomeValues = chromosomeValues
+
+    @classmethod
+    def random(cls, size, randomGenerator=None, chromosomeCount=None):
+        """ Return a population of random genotypes, generated the same way Genotype() generates one.
+
+            Args:
+                size (int): The number of genotypes.
+                randomGenerator (numpy.random.Generator): The generator to draw from, or an int seed to draw from a new one
+                    so the genotypes can be generated again.  Default = None uses a fresh unseeded generator.
+                chromosomeCount (int): The number of chromosomes of every genotype.  Default = None uses Genotype.CHROMOSOME_COUNT.
+
+            Returns:
+                Population: The random population.
+        """
+        randomGenerator = numpy.random.default_rng(randomGenerator)
+        if (chromosomeCount == None):
+            chromosomeCount = Genotype.CHROMOSOME_COUNT
+        # Every bit of every genotype is drawn at once.  Random chromosomes never terminate growth,
+        # and those past the branching depth do not branch.
+        chromosomeValues = randomGenerator.integers(0, 0x100000000, size=(size, chromosomeCount), dtype=numpy.uint32)
+        chromosomeValues |= numpy.uint32(Chromosome._SEGMENT_TERMINATION_PREVENT)
+        chromosomeValues[:, Genotype.BRANCHING_DEPTH:] &= numpy.uint32(~Chromosome._SINGLE_BRANCH_CLEAR & 0xFFFFFFFF)
+        return cls(chromosomeValues)
+
+    @classmethod
+    def mutated(cls, parentGenotype, size, randomGenerator=None):
+        """ Return a population of mutated children of a genotype, mutated the same way Genotype.mutatedCopy mutates one.
+
+            Args:
+                parentGenotype (Genotype): The genotype every child descends from.
+                size (int): The number of children.
+                randomGenerator (numpy.random.Generator): The generator to draw from, or an int seed to draw from a new one
+                    so the children can be bred again.  Default = None uses a fresh unseeded generator.
+
+            Returns:
+                Population: The children.
+        """
+        parentValues = numpy.array([chromosome.chromosomeValue for chromosome in parentGenotype.chromosomes], dtype=numpy.uint32)
+        return cls(numpy.tile(parentValues, (size, 1))).mutatedChildren(randomGenerator)
+
+    def mutatedChildren(self, randomGenerator=None):
+        """ Return a population with a mutated child of each genotype, mutated the same way Genotype.mutatedCopy mutates one.
+
+            Every random number is drawn in two calls however many children there are, and the
+            bits are flipped with whole array XORs.  As with mutatedCopy, mutations may terminate growth.
+
+            Args:
+                randomGenerator (numpy.random.Generator): The generator to draw from, or an int seed to draw from a new one
+                    so the children can be bred again.  Default = None uses a fresh unseeded generator.
+
+            Returns:
+                Population: The children, in the order of their parents.
+        """
+        randomGenerator = numpy.random.default_rng(randomGenerator)
+        (size, chromosomeCount) = self.chromosomeValues.shape
+
+        # Each child gets from one up to the maximum number of point mutations, each a bit of any of its chromosomes
+        mutationNumbers = randomGenerator.integers(1, Genotype.MUTATION_RATE_MAXIMUM + 1, size=size)
+        mutatedBits = randomGenerator.integers(0, chromosomeCount * 32, size=(Genotype.MUTATION_RATE_MAXIMUM, size))
+        chromosomeIndexes = mutatedBits >> 5
+        bitMasks = numpy.left_shift(numpy.uint32(1), (mutatedBits & 31).astype(numpy.uint32))
+
+        # Mutations of the same child are applied in turn, so flipping one bit twice leaves it unchanged
+        flipMasks = numpy.zeros((size, chromosomeCount), dtype=numpy.uint32)
+        rows = numpy.arange(size)
+        for mutationCount in range(Genotype.MUTATION_RATE_MAXIMUM):
+            mutating = mutationCount < mutationNumbers
+            flipMasks[rows[mutating], chromosomeIndexes[mutationCount, mutating]] ^= bitMasks[mutationCount, mutating]
+        return Population(self.chromosomeValues ^ flipMasks)
+
+    @classmethod
+    def fromCreatures(cls, creatures):
+        """ Return a population holding the genotypes of the creatures.
+
+            Args:
+                creatures (Creature[]): The creatures to copy the genotypes of.
+
+            Returns:
+                Population: The population.
+        """
+        chromosomeValues = [[chromosome.chromosomeValue for chromosome in creature.genotype.chromosomes] for creature in creatures]
+        chromosomeCount = len(creatures[0].genotype.chromosomes) if (len(creatures) > 0) else Genotype.CHROMOSOME_COUNT
+        return cls(numpy.array(chromosomeValues, dtype=numpy.uint32).reshape(-1, chromosomeCount))
+
+    def __len__(self):
+        return len(self.chromosomeValues)
+
+    def decode(self):
+        """ Decode every chromosome of every genotype at once.
+
+            Returns:
+                DecodedChromosomes: Decoded genes, each an (N, chromosomeCount) array.
+        """
+        return DecodedChromosomes(self.chromosomeValues)
+
+    def expressedValues(self):
+        """ Return the chromosome values with every bit that does not change how a creature looks cleared.
+
+            The array form of Chromosome.expressedGeneBits and Genotype.expressedKey.  Two rows
+            are equal exactly when the expressed keys of their genotypes are.
+
+            Returns:
+                numpy.ndarray: An (N, chromosomeCount) uint32 array of expressed chromosome values.
+        """
+        decoded = self.decode()
+        straight = decoded.symmetryBits == Chromosome._SYMMETRY_STRAIGHT_VALUE
+        circle = (decoded.shape == Chromosome._SHAPE_CIRCLE_VALUE) | (decoded.shape == Chromosome._SHAPE_FILLED_CIRCLE_VALUE)
+
+        expressedGeneBits = numpy.full(self.chromosomeValues.shape, 0xFFFFFFFF & ~Chromosome._UNUSED_GENE_BITS, dtype=numpy.uint32)
+        expressedGeneBits[straight] &= numpy.uint32(~Chromosome._BRANCH_ANGLE_GENE_BITS & 0xFFFFFFFF)
+        expressedGeneBits[decoded.shape != Chromosome._SHAPE_FILLED_CIRCLE_VALUE] &= numpy.uint32(~Chromosome._FILL_COLOR_GENE_BITS & 0xFFFFFFFF)
+        expressedGeneBits[decoded.shape == Chromosome._SHAPE_DOT_VALUE] &= numpy.uint32(~Chromosome._LINE_WIDTH_GENE_BITS & 0xFFFFFFFF)
+        expressedGeneBits[circle & ~(straight & (decoded.branchCount > 1))] &= numpy.uint32(~Chromosome._LENGTH_LOWEST_BIT & 0xFFFFFFFF)
+
+        # Growth stops at the first terminated chromosome, so nothing from there on is expressed
+        expressedGeneBits[numpy.logical_or.accumulate(decoded.terminated, axis=1)] = 0
+        return self.chromosomeValues & expressedGeneBits
+
+    def genotype(self, index):
+        """ Return the genotype at the index as a Genotype object.
+
+            Args:
+                index (int): The index of the genotype.
+
+            Returns:
+                Genotype: A newly built genotype.
+        """
+        return Genotype([Chromosome(chromosomeIndex, int(chromosomeValue))
+                         for chromosomeIndex, chromosomeValue in enumerate(self.chromosomeValues[index])])
+
+    def creature(self, index):
+        """ Return the genotype at the index as a Creature object.
+
+            Args:
+                index (int): The index of the genotype.
+
+            Returns:
+                Creature: A newly built creature.
+        """
+        return Creature(self.genotype(index))
+
+    def creatures(self):
+        """ Generate a Creature for every genotype in the population, in order. """
+        # Converting the whole array to ints at once is far cheaper than a row at a time
+        for rowValues in self.chromosomeValues.tolist():
+            yield Creature(Genotype([Chromosome(chromosomeIndex, chromosomeValue)
+                                     for chromosomeIndex, chromosomeValue in enumerate(rowValues)]))
+
+    def childCreatures(self, parentCreatures):
+        """ Generate a Creature for every genotype, in order, descended from the parent creature at the same index.
+
+            Chromosomes left unchanged by mutation are the parent's own, so only mutated ones are decoded.
+
+            Args:
+                parentCreatures (Creature[]): The parent of each genotype, such as those mutatedChildren was called on.
+        """
+        for (rowValues, parentCreature) in zip(self.chromosomeValues.tolist(), parentCreatures):
+            chromosomes = list(parentCreature.genotype.chromosomes)
+            for (chromosomeIndex, chromosomeValue) in enumerate(rowValues):
+                if (chromosomes[chromosomeIndex].chromosomeValue != chromosomeValue):
+                    chromosomes[chromosomeIndex] = Chromosome(chromosomeIndex, chromosomeValue)
+            child = Creature(Genotype(chromosomes))
+            child.descendFrom(parentCreature)
+            yield child
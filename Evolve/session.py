@@ -0,0 +1,194 @@
+# Copyright 2015 Brian Macker
+""" Snapshots of a display session, saved to a compact binary file and restored without searching for creatures.
+"""
+import os
+import json
+import random
+import numpy
+from creature import *
+
+
+class SessionSnapshot:
+    """ Class holding everything needed to bring a display session back exactly as it was.
+
+        The creatures' layouts are kept as segment records, so restoring a session into panels
+        of the same size draws them straight away.  Panels of another size lay them out again.
+
+        Attributes:
+            rows (int): How many rows of creature panels were displayed.
+            columns (int): How many columns of creature panels were displayed.
+            parentIndex (int): Index of the parent creature in the grid, or None if there was none.
+            chromosomeValues (numpy.ndarray): A (rows * columns, chromosomeCount) uint32 array.  One row per panel.
+            present (numpy.ndarray): True for each panel that held a creature.
+            lineageIds (numpy.ndarray): Lineage store id of each creature.  NO_LINEAGE_ID where there is none.
+            parentLineageIds (numpy.ndarray): Lineage store id of each creature's parent.  NO_LINEAGE_ID where there is none.
+            interiorWidth (float): The interior width of the panels the layouts were made for.
+            interiorHeight (float): The interior height of the panels the layouts were made for.
+            segmentCreatures (numpy.ndarray): Panel index of every saved segment.
+            segmentRecords (numpy.ndarray): The segment records of every saved layout, as a structured array.
+            randomState (dict): The states of the random generators, as plain values.
+    """
+
+    NO_LINEAGE_ID = -1
+
+    _FORMAT_VERSION = 2             # Version 2 added the children's and worker processes' random streams
+    _SEGMENT_DTYPE = numpy.dtype([("chromosomeNumber", "<u2"), ("xStart", "<f8"), ("yStart", "<f8"),
+                                  ("xEnd", "<f8"), ("yEnd", "<f8"), ("heading", "<u2"), ("chiralityRight", "?")])
+
+    def __init__(self, rows, columns, parentIndex, chromosomeValues, present, lineageIds, parentLineageIds,
+                 interiorWidth, interiorHeight, segmentCreatures, segmentRecords, randomState):
+        """ Constructor for a SessionSnapshot.  Use fromDisplay or read to make one.
+        """
+        self.rows = rows
+        self.columns = columns
+        self.parentIndex = parentIndex
+        self.chromosomeValues = chromosomeValues
+        self.present = present
+        self.lineageIds = lineageIds
+        self.parentLineageIds = parentLineageIds
+        self.interiorWidth = interiorWidth
+        self.interiorHeight = interiorHeight
+        self.segmentCreatures = segmentCreatures
+        self.segmentRecords = segmentRecords
+        self.randomState = randomState
+
+    @classmethod
+    def fromDisplay(cls, creatureDisplay):
+        """ Return a snapshot of the creatures, parent, layouts and random generators of a display.
+
+            Args:
+                creatureDisplay (CreatureDisplay): The display.
+
+            Returns:
+                SessionSnapshot: The snapshot.
+        """
+        creatures = creatureDisplay.creatureArray
+        geometry = creatureDisplay.panelGeometry
+        chromosomeCount = creatureDisplay.chromosomeCount
+        chromosomeValues = numpy.zeros((len(creatures), chromosomeCount), dtype=numpy.uint32)
+        present = numpy.zeros(len(creatures), dtype=bool)
+        lineageIds = numpy.full(len(creatures), cls.NO_LINEAGE_ID, dtype=numpy.int64)
+        parentLineageIds = numpy.full(len(creatures), cls.NO_LINEAGE_ID, dtype=numpy.int64)
+        segmentCreatures = []
+        segmentRecords = []
+        parentIndex = None
+
+        for (creatureIndex, creature) in enumerate(creatures):
+            if (creature == None):
+                continue
+            present[creatureIndex] = True
+            chromosomeValues[creatureIndex] = [chromosome.chromosomeValue for chromosome in creature.genotype.chromosomes]
+            if (creature.lineageId != None):
+                lineageIds[creatureIndex] = creature.lineageId
+            if (creature.parentLineageId != None):
+                parentLineageIds[creatureIndex] = creature.parentLineageId
+            if (creature is creatureDisplay.parentCreature):
+                parentIndex = creatureIndex
+
+            # Only layouts already made for these panels are saved.  The rest are laid out again when drawn.
+            layout = creature.layouts.get(geometry)
+            if ((layout != None) and layout.viable):
+                records = layout.segmentRecords()
+                segmentCreatures.extend([creatureIndex] * len(records))
+                segmentRecords.extend(records)
+
+        randomState = {"random": random.getstate(),
+                       "screener": creatureDisplay.screener.randomGenerator.bit_generator.state,
+                       "breedingScreener": creatureDisplay.breedingScreener.randomGenerator.bit_generator.state,
+                       "neighbors": creatureDisplay.neighborRandomGenerator.bit_generator.state}
+        candidateGenerator = creatureDisplay.candidateGenerator
+        if (candidateGenerator != None):
+            randomState["candidateGenerator"] = {"seed": candidateGenerator.seed, "requestCount": candidateGenerator.requestCount}
+        return cls(creatureDisplay.rows, creatureDisplay.columns, parentIndex, chromosomeValues, present,
+                   lineageIds, parentLineageIds, geometry.interiorWidth, geometry.interiorHeight,
+                   numpy.array(segmentCreatures, dtype=numpy.uint32),
+                   numpy.array(segmentRecords, dtype=cls._SEGMENT_DTYPE), randomState)
+
+    def write(self, path):
+        """ Write the snapshot to a compressed binary file.  The file is replaced only once it is complete.
+
+            Args:
+                path (str): The path of the file.
+        """
+        parentIndex = -1 if (self.parentIndex == None) else self.parentIndex
+        header = numpy.array([self._FORMAT_VERSION, self.rows, self.columns, parentIndex], dtype=numpy.int64)
+        temporaryPath = path + ".tmp"
+        with open(temporaryPath, "wb") as stream:
+            numpy.savez_compressed(stream, header=header, chromosomeValues=self.chromosomeValues, present=self.present,
+                                   lineageIds=self.lineageIds, parentLineageIds=self.parentLineageIds,
+                                   interiorSize=numpy.array([self.interiorWidth, self.interiorHeight]),
+                                   segmentCreatures=self.segmentCreatures, segmentRecords=self.segmentRecords,
+                                   randomState=numpy.frombuffer(json.dumps(self.randomState).encode("utf-8"), dtype=numpy.uint8))
+        os.replace(temporaryPath, path)
+
+    @classmethod
+    def read(cls, path):
+        """ Read a snapshot written by write.
+
+            Args:
+                path (str): The path of the file.
+
+            Returns:
+                SessionSnapshot: The snapshot.
+
+            Raises:
+                ValueError: If the file was written by an unknown version, or holds genotypes of a size not supported.
+        """
+        with numpy.load(path) as arrays:
+            (version, rows, columns, parentIndex) = arrays["header"].tolist()
+            if (version != cls._FORMAT_VERSION):
+                raise ValueError("%s is a version %d session, not %d" % (path, version, cls._FORMAT_VERSION))
+            chromosomeValues = arrays["chromosomeValues"]
+            Genotype.checkChromosomeCount(chromosomeValues.shape[1])
+            (interiorWidth, interiorHeight) = arrays["interiorSize"].tolist()
+            randomState = json.loads(arrays["randomState"].tobytes().decode("utf-8"))
+            return cls(rows, columns, None if (parentIndex < 0) else parentIndex, chromosomeValues, arrays["present"],
+                       arrays["lineageIds"], arrays["parentLineageIds"], interiorWidth, interiorHeight,
+                       arrays["segmentCreatures"], arrays["segmentRecords"], randomState)
+
+    def creatures(self):
+        """ Return the creature of every panel, or None for an empty panel, each with its saved layout.
+
+            Returns:
+                Creature[]: One entry per panel.
+        """
+        geometry = PanelGeometry(self.interiorWidth, self.interiorHeight)
+        segmentOrder = numpy.argsort(self.segmentCreatures, kind="stable")
+        segmentBounds = numpy.searchsorted(self.segmentCreatures[segmentOrder], numpy.arange(len(self.present) + 1))
+
+        creatures = []
+        for creatureIndex in range(len(self.present)):
+            if (not self.present[creatureIndex]):
+                creatures.append(None)
+                continue
+            creature = Creature(Genotype([Chromosome(chromosomeIndex, int(chromosomeValue))
+                                          for chromosomeIndex, chromosomeValue in enumerate(self.chromosomeValues[creatureIndex])]))
+            if (self.lineageIds[creatureIndex] != self.NO_LINEAGE_ID):
+                creature.lineageId = int(self.lineageIds[creatureIndex])
+            if (self.parentLineageIds[creatureIndex] != self.NO_LINEAGE_ID):
+                creature.parentLineageId = int(self.parentLineageIds[creatureIndex])
+
+            records = self.segmentRecords[segmentOrder[segmentBounds[creatureIndex]:segmentBounds[creatureIndex + 1]]]
+            if (len(records) > 0):
+                creature.layouts[geometry] = PhenotypeLayout.fromSegmentRecords(creature.genotype, records.tolist())
+            creatures.append(creature)
+        return creatures
+
+    def restoreRandomState(self, creatureDisplay):
+        """ Put the random generators back in the state they were in when the snapshot was taken.
+
+            The worker processes' streams are only restored if the display has worker processes and
+            the session was taken with them.
+
+            Args:
+                creatureDisplay (CreatureDisplay): The display whose random generators are restored.
+        """
+        (version, internalState, gaussNext) = self.randomState["random"]
+        random.setstate((version, tuple(internalState), gaussNext))
+        creatureDisplay.screener.randomGenerator.bit_generator.state = self.randomState["screener"]
+        creatureDisplay.breedingScreener.randomGenerator.bit_generator.state = self.randomState["breedingScreener"]
+        creatureDisplay.neighborRandomGenerator.bit_generator.state = self.randomState["neighbors"]
+        candidateState = self.randomState.get("candidateGenerator")
+        if ((creatureDisplay.candidateGenerator != None) and (candidateState != None)):
+            creatureDisplay.candidateGenerator.seed = candidateState["seed"]
+            creatureDisplay.candidateGenerator.requestCount = candidateState["requestCount"]
@@ -0,0 +1,311 @@
+# Copyright 2015 Brian Macker
+""" An index of genomes by Hamming distance, for finding the creatures most like one, or whether one was bred before.
+
+    Genomes are held packed as rows of chromosome values, and the distance between two is the
+    number of bits that differ.  Indexing every creature of a lineage store looks like this:
+
+        index = HammingIndex.fromLineageStore(LineageStore("evolve-lineage.bin", readOnly=True))
+        (ids, distances) = index.nearest(chromosomeValues, 10)
+        bredBefore = index.contains(childValues)
+"""
+import itertools
+import numpy
+from creature import *
+
+
+def _bitCounts(values):
+    """ Return the number of set bits in each row of a two dimensional uint32 array. """
+    if hasattr(numpy, "bitwise_count"):
+        return numpy.bitwise_count(values).sum(axis=1, dtype=numpy.int64)
+    # Older versions of NumPy count the bits of each half of a value with a table
+    return _HALF_WORD_BIT_COUNTS[numpy.ascontiguousarray(values).view(numpy.uint16)].sum(axis=1, dtype=numpy.int64)
+
+_HALF_WORD_BIT_COUNTS = numpy.array([bin(value).count("1") for value in range(1 << 16)], dtype=numpy.uint8)
+
+
+class HammingIndex:
+    """ Class holding genomes that finds those within a number of flipped bits of any genome, or nearest to it.
+
+        Genomes are found by multi-index hashing.  Each genome is cut into 16 bit chunks, and
+        for every chunk position the genomes are bucketed by the chunk's value.  Two genomes
+        at most r bits apart must have some chunk at most r // chunkCount bits apart, so only
+        the buckets that near the query's chunks hold candidates, and only those have their
+        distance counted.  When the candidates would be too many, or the query too far, every
+        genome is compared at once instead.  Results are exact either way, and are the same
+        as those of bruteForceWithin and bruteForceNearest.
+
+        Genomes added since the buckets were last built are compared directly, and the buckets
+        are rebuilt once enough have been added, so adding genomes one at a time stays cheap.
+
+        Attributes:
+            chromosomeCount (int): The number of chromosome values in every genome.
+    """
+
+    _CHUNK_BITS = 16                  # Bits in each chunk genomes are bucketed by
+    _MAX_CHUNK_RADIUS = 3             # Furthest a query's chunks are searched from before every genome is compared
+    _BRUTE_FORCE_FRACTION = 8         # Every genome is compared once candidates exceed this fraction of them
+    _MIN_UNBUCKETED = 1 << 14         # Genomes added before the buckets are built or rebuilt
+    _UNBUCKETED_FRACTION = 16         # The buckets are rebuilt once this fraction of the genomes are not in them
+    _BRUTE_FORCE_BLOCK = 1 << 20      # Genomes compared at a time, to bound the memory of comparing them all
+
+    def __init__(self, chromosomeCount=None, chromosomeValues=None):
+        """ Constructor for a HammingIndex.
+
+            Args:
+                chromosomeCount (int): The number of chromosome values in every genome.  Default = None takes it from
+                    the chromosome values, or uses Genotype.CHROMOSOME_COUNT without them.
+                chromosomeValues (numpy.ndarray): An (N, chromosomeCount) array of genomes to start with.  Default = None.
+        """
+        if (chromosomeCount == None):
+            chromosomeCount = Genotype.CHROMOSOME_COUNT if (chromosomeValues is None) else numpy.shape(chromosomeValues)[1]
+        Genotype.checkChromosomeCount(chromosomeCount)
+        self.chromosomeCount = chromosomeCount
+        self._chunkCount = (chromosomeCount * 32) // self._CHUNK_BITS
+
+        self._values = numpy.empty((0, chromosomeCount), dtype=numpy.uint32)
+        self._count = 0
+        # Genomes from 0 up to the bucketed count are in the buckets, held per chunk position as
+        # the genome ids ordered by chunk value and where each value's ids start in that order
+        self._bucketedCount = 0
+        self._bucketOrders = []
+        self._bucketStarts = []
+
+        if (chromosomeValues is not None):
+            self.add(chromosomeValues)
+
+    @classmethod
+    def fromLineageStore(cls, lineageStore):
+        """ Return an index of every genome in a lineage store.  Ids in the index are the ids of the store.
+
+            Args:
+                lineageStore (LineageStore): The store.
+
+            Returns:
+                HammingIndex: The index.
+        """
+        return cls(lineageStore.chromosomeCount, lineageStore.records()["chromosomes"])
+
+    def __len__(self):
+        return self._count
+
+    def chromosomeValues(self):
+        """ Return every genome as an (N, chromosomeCount) array, in the order added.  The array must not be changed. """
+        return self._values[:self._count]
+
+    def add(self, chromosomeValues):
+        """ Add genomes to the index.  Each is given the next id, in order from zero.
+
+            Args:
+                chromosomeValues (numpy.ndarray): An (N, chromosomeCount) array of genomes, or the values of a single genome.
+
+            Returns:
+                numpy.ndarray: The ids of the genomes.
+        """
+        chromosomeValues = numpy.asarray(chromosomeValues, dtype=numpy.uint32).reshape(-1, self.chromosomeCount)
+        newCount = self._count + len(chromosomeValues)
+        # Room grows by doubling, so adding one genome at a time does not copy them all each time
+        if (newCount > len(self._values)):
+            values = numpy.empty((max(newCount, 2 * len(self._values)), self.chromosomeCount), dtype=numpy.uint32)
+            values[:self._count] = self._values[:self._count]
+            self._values = values
+        self._values[self._count:newCount] = chromosomeValues
+        ids = numpy.arange(self._count, newCount, dtype=numpy.int64)
+        self._count = newCount
+
+        unbucketedCount = self._count - self._bucketedCount
+        if (unbucketedCount >= max(self._MIN_UNBUCKETED, self._bucketedCount // self._UNBUCKETED_FRACTION)):
+            self._buildBuckets()
+        return ids
+
+    def _buildBuckets(self):
+        """ Bucket every genome by the value of each of its chunks. """
+        chunks = self._values[:self._count].view(numpy.uint16)
+        self._bucketOrders = []
+        self._bucketStarts = []
+        for chunkIndex in range(self._chunkCount):
+            chunkValues = chunks[:, chunkIndex]
+            self._bucketOrders.append(numpy.argsort(chunkValues, kind="stable").astype(numpy.uint32))
+            self._bucketStarts.append(numpy.concatenate(([0], numpy.cumsum(numpy.bincount(chunkValues, minlength=1 << self._CHUNK_BITS)))))
+        self._bucketedCount = self._count
+
+    def distances(self, chromosomeValues, ids=None):
+        """ Return the number of bits each genome differs from the query by.
+
+            Args:
+                chromosomeValues (int[]): The values of the query genome.
+                ids (numpy.ndarray): The ids of the genomes to compare.  Default = None compares every genome, in order.
+
+            Returns:
+                numpy.ndarray: The distance of each genome.
+        """
+        queryValues = self._queryValues(chromosomeValues)
+        if (ids is None):
+            return self._distancesInRange(queryValues, 0, self._count)
+        return _bitCounts(self._values[ids] ^ queryValues)
+
+    def _distancesInRange(self, queryValues, firstId, endId):
+        """ Return the distances of the genomes with ids from firstId up to endId, compared a block at a time. """
+        distances = numpy.empty(endId - firstId, dtype=numpy.int64)
+        for blockStart in range(firstId, endId, self._BRUTE_FORCE_BLOCK):
+            blockEnd = min(blockStart + self._BRUTE_FORCE_BLOCK, endId)
+            distances[blockStart - firstId:blockEnd - firstId] = _bitCounts(self._values[blockStart:blockEnd] ^ queryValues)
+        return distances
+
+    def _queryValues(self, chromosomeValues):
+        """ Return a query genome as a uint32 array, checking it has the right number of chromosomes. """
+        queryValues = numpy.asarray(chromosomeValues, dtype=numpy.uint32).reshape(-1)
+        if (len(queryValues) != self.chromosomeCount):
+            raise ValueError("the index holds genomes of %d chromosomes, not %d" % (self.chromosomeCount, len(queryValues)))
+        return queryValues
+
+    def contains(self, chromosomeValues):
+        """ Return True if the genome is in the index.
+
+            Args:
+                chromosomeValues (int[]): The values of the genome.
+        """
+        return len(self.within(chromosomeValues, 0)[0]) > 0
+
+    def within(self, chromosomeValues, radius):
+        """ Return every genome at most radius bits from the query, nearest first, ties in the order added.
+
+            Args:
+                chromosomeValues (int[]): The values of the query genome.
+                radius (int): The most bits a genome may differ by.
+
+            Returns:
+                (numpy.ndarray, numpy.ndarray): The ids of the genomes and their distances.
+        """
+        queryValues = self._queryValues(chromosomeValues)
+        chunkRadius = radius // self._chunkCount
+        if (chunkRadius > self._MAX_CHUNK_RADIUS):
+            return self.bruteForceWithin(queryValues, radius)
+
+        candidateIds = self._candidateIds(queryValues, range(chunkRadius + 1))
+        if (candidateIds is None):
+            return self.bruteForceWithin(queryValues, radius)
+        ids = numpy.concatenate((numpy.unique(candidateIds), numpy.arange(self._bucketedCount, self._count, dtype=numpy.int64)))
+        distances = _bitCounts(self._values[ids] ^ queryValues)
+        near = distances <= radius
+        return self._sortedByDistance(ids[near], distances[near])
+
+    def nearest(self, chromosomeValues, count):
+        """ Return the count genomes nearest the query, nearest first, ties in the order added.
+
+            Args:
+                chromosomeValues (int[]): The values of the query genome.
+                count (int): How many genomes to return.  Fewer are returned if the index holds fewer.
+
+            Returns:
+                (numpy.ndarray, numpy.ndarray): The ids of the genomes and their distances.
+        """
+        queryValues = self._queryValues(chromosomeValues)
+        count = min(count, self._count)
+        if (self._bucketedCount == 0):
+            return self.bruteForceNearest(queryValues, count)
+
+        # Genomes not yet bucketed are always compared
+        ids = numpy.arange(self._bucketedCount, self._count, dtype=numpy.int64)
+        distances = self._distancesInRange(queryValues, self._bucketedCount, self._count)
+
+        # Search ever further from the query's chunks until the nearest found are certainly the nearest of all
+        for chunkRadius in range(self._MAX_CHUNK_RADIUS + 1):
+            newIds = self._candidateIds(queryValues, [chunkRadius], len(ids))
+            if (newIds is None):
+                break
+            newIds = numpy.setdiff1d(newIds, ids)
+            ids = numpy.concatenate((ids, newIds))
+            distances = numpy.concatenate((distances, _bitCounts(self._values[newIds] ^ queryValues)))
+            # Every genome within this distance has a chunk within the radius searched, so has been found
+            foundDistance = (self._chunkCount * (chunkRadius + 1)) - 1
+            if (numpy.count_nonzero(distances <= foundDistance) >= count):
+                (ids, distances) = self._sortedByDistance(ids, distances)
+                return (ids[:count], distances[:count])
+            # Nearest genomes further than the furthest radius can certify are found faster by comparing them all
+            if ((len(distances) >= count) and
+                    (numpy.partition(distances, count - 1)[count - 1] >= self._chunkCount * (self._MAX_CHUNK_RADIUS + 1))):
+                break
+        return self.bruteForceNearest(queryValues, count)
+
+    def _candidateIds(self, queryValues, chunkRadii, knownCount=0):
+        """ Return the ids of the bucketed genomes with any chunk at one of the distances from the query's.
+
+            Args:
+                queryValues (numpy.ndarray): The query genome.
+                chunkRadii (int[]): The numbers of bits a chunk may differ from the query's by.
+                knownCount (int): The number of candidates already found, counted toward the limit.
+
+            Returns:
+                numpy.ndarray: The ids, possibly repeated, or None if there would be so many comparing every genome is faster.
+        """
+        if (self._bucketedCount == 0):
+            return numpy.empty(0, dtype=numpy.int64)
+        flipMasks = numpy.concatenate([self._CHUNK_FLIP_MASKS[chunkRadius] for chunkRadius in chunkRadii])
+        queryChunks = queryValues.view(numpy.uint16)
+
+        # Where every bucket to search starts in its chunk's order, and how many ids it holds
+        chunkStarts = []
+        chunkLengths = []
+        for chunkIndex in range(self._chunkCount):
+            bucketValues = flipMasks ^ int(queryChunks[chunkIndex])
+            starts = self._bucketStarts[chunkIndex][bucketValues]
+            chunkStarts.append(starts)
+            chunkLengths.append(self._bucketStarts[chunkIndex][bucketValues + 1] - starts)
+        candidateCount = int(sum(lengths.sum() for lengths in chunkLengths))
+        if ((knownCount + candidateCount) * self._BRUTE_FORCE_FRACTION > self._bucketedCount):
+            return None
+
+        # Gather the buckets of each chunk at once.  Each position is its bucket's start plus how far into the bucket it is.
+        candidateIds = []
+        for (chunkIndex, starts, lengths) in zip(range(self._chunkCount), chunkStarts, chunkLengths):
+            bucketOffsets = numpy.cumsum(lengths) - lengths
+            positions = numpy.arange(int(lengths.sum())) + numpy.repeat(starts - bucketOffsets, lengths)
+            candidateIds.append(self._bucketOrders[chunkIndex][positions])
+        return numpy.concatenate(candidateIds).astype(numpy.int64)
+
+    @staticmethod
+    def _sortedByDistance(ids, distances):
+        """ Return the ids and distances sorted by distance, then by id. """
+        order = numpy.lexsort((ids, distances))
+        return (ids[order], distances[order])
+
+    def bruteForceWithin(self, chromosomeValues, radius):
+        """ Return what within does by comparing every genome.  For checking within, and faster for large radii.
+
+            Args:
+                chromosomeValues (int[]): The values of the query genome.
+                radius (int): The most bits a genome may differ by.
+
+            Returns:
+                (numpy.ndarray, numpy.ndarray): The ids of the genomes and their distances.
+        """
+        distances = self.distances(chromosomeValues)
+        ids = numpy.flatnonzero(distances <= radius)
+        return self._sortedByDistance(ids, distances[ids])
+
+    def bruteForceNearest(self, chromosomeValues, count):
+        """ Return what nearest does by comparing every genome.  For checking nearest, and faster for distant queries.
+
+            Args:
+                chromosomeValues (int[]): The values of the query genome.
+                count (int): How many genomes to return.
+
+            Returns:
+                (numpy.ndarray, numpy.ndarray): The ids of the genomes and their distances.
+        """
+        distances = self.distances(chromosomeValues)
+        count = min(count, len(distances))
+        if (count == 0):
+            return (numpy.empty(0, dtype=numpy.int64), numpy.empty(0, dtype=numpy.int64))
+        # Every genome as near as the furthest of the nearest is kept, so ties are broken by id
+        furthestDistance = numpy.partition(distances, count - 1)[count - 1]
+        ids = numpy.flatnonzero(distances <= furthestDistance)
+        (ids, distances) = self._sortedByDistance(ids, distances[ids])
+        return (ids[:count], distances[:count])
+
+
+# Masks flipping every combination of exactly so many bits of a chunk, by number of bits
+HammingIndex._CHUNK_FLIP_MASKS = [numpy.array([sum(1 << bit for bit in bits)
+                                               for bits in itertools.combinations(range(HammingIndex._CHUNK_BITS), bitCount)],
+                                              dtype=numpy.int64)
+                                  for bitCount in range(HammingIndex._MAX_CHUNK_RADIUS + 1)]
@@ -0,0 +1,380 @@
+# Copyright 2015 Brian Macker
+import time
+import numpy
+from creature import *
+from creature import _COSINE_TABLE, _SINE_TABLE
+from population import *
+
+
+class ScreeningResult:
+    """ Class holding the outcome of screening a population of candidates.
+
+        Attributes:
+            population (Population): The candidates that were screened.
+            rejections (numpy.ndarray): A rejection code for every candidate.  VIABLE for those that fit.
+            segmentCounts (numpy.ndarray): The number of segments each viable candidate grows.
+    """
+
+    def __init__(self, population, rejections, segmentCounts):
+        """ Constructor for a ScreeningResult.
+
+            Args:
+                population (Population): The candidates that were screened.
+                rejections (numpy.ndarray): A rejection code for every candidate.
+                segmentCounts (numpy.ndarray): The number of segments each viable candidate grows.
+        """
+        self.population = population
+        self.rejections = rejections
+        self.segmentCounts = segmentCounts
+
+    def viableIndexes(self):
+        """ Return the indexes of the viable candidates in the order they were generated. """
+        return numpy.flatnonzero(self.rejections == ViabilityScreener.VIABLE)
+
+
+class ViabilityScreener:
+    """ Class that finds creatures which fit inside a panel by screening whole batches of candidates at once.
+
+        Each batch is laid out level by level with array math, following the same rules as
+        PhenotypeLayout, so a candidate passes exactly when Creature.display would draw it.
+        Every search is limited by an attempt and a time budget so it can never hang.
+        A screener's random generator and statistics are not locked, so each thread that
+        searches needs a screener of its own.
+
+        Attributes:
+            batchSize (int): How many candidates are generated and screened at a time.
+            maxAttempts (int): The most candidates a single search may try.
+            timeLimit (float): The most seconds a single search may take.
+            chromosomeCount (int): The number of chromosomes of random candidates.
+    """
+
+    # Rejection codes.  The reasons are those of PhenotypeLayout in the same order.
+    VIABLE = 0
+    REJECTED_OUT_OF_BOUNDS = 1
+    REJECTED_TOO_MANY_SEGMENTS = 2
+    REJECTED_FIRST_TERMINATED = 3
+    REJECTION_REASONS = (None,
+                         PhenotypeLayout.REJECTED_OUT_OF_BOUNDS,
+                         PhenotypeLayout.REJECTED_TOO_MANY_SEGMENTS,
+                         PhenotypeLayout.REJECTED_FIRST_TERMINATED)
+
+    _COSINES = numpy.array(_COSINE_TABLE)
+    _SINES = numpy.array(_SINE_TABLE)
+
+    def __init__(self, batchSize=64, maxAttempts=4096, timeLimit=0.25, randomGenerator=None, chromosomeCount=None):
+        """ Constructor for a ViabilityScreener.
+
+            Args:
+                batchSize (int): How many candidates are generated and screened at a time.
+                maxAttempts (int): The most candidates a single search may try.
+                timeLimit (float): The most seconds a single search may take.
+                randomGenerator (numpy.random.Generator): The generator candidates are drawn from.  Default = None uses an unseeded generator.
+                chromosomeCount (int): The number of chromosomes of random candidates.  Default = None uses Genotype.CHROMOSOME_COUNT.
+                    Children always have as many as their parent.
+        """
+        if (chromosomeCount == None):
+            chromosomeCount = Genotype.CHROMOSOME_COUNT
+        Genotype.checkChromosomeCount(chromosomeCount)
+        self.batchSize = batchSize
+        self.chromosomeCount = chromosomeCount
+        self.maxAttempts = maxAttempts
+        self.timeLimit = timeLimit
+        if (randomGenerator == None):
+            randomGenerator = numpy.random.default_rng()
+        self._randomGenerator = randomGenerator
+
+        # Candidates tried and rejected for each reason, per panel size
+        self._statistics = {}
+
+    @property
+    def randomGenerator(self):
+        """ numpy.random.Generator: The generator candidates are drawn from. """
+        return self._randomGenerator
+
+    def findViable(self, geometry, parentCreature=None):
+        """ Return the first viable candidate, or None if the budget ran out first.
+
+            A child that looks just like its parent is only returned if no other child
+            fitting the panel is found within the budget.
+
+            Args:
+                geometry (PanelGeometry): The interior size of the panel the creature must fit inside of.
+                parentCreature (Creature): The parent to mutate.  Default = None generates random creatures.
+
+            Returns:
+                Creature: The first candidate that fits, or None.
+        """
+        lookAlike = None
+        for result in self._searchBatches(geometry, parentCreature):
+            for index in result.viableIndexes():
+                creature = self._candidate(result.population, index, parentCreature)
+                if ((parentCreature == None) or (creature.expressedKey() != parentCreature.expressedKey())):
+                    return creature
+                if (lookAlike == None):
+                    lookAlike = creature
+        return lookAlike
+
+    def rankedViable(self, geometry, parentCreature=None, count=10):
+        """ Return up to count viable candidates, those growing the most segments first.
+
+            Searching stops once count candidates have been found or the budget runs out,
+            so fewer may be returned.
+
+            Args:
+                geometry (PanelGeometry): The interior size of the panel the creature must fit inside of.
+                parentCreature (Creature): The parent to mutate.  Default = None generates random creatures.
+                count (int): The number of candidates wanted.
+
+            Returns:
+                Creature[]: The viable candidates found, ranked.
+        """
+        found = []
+        for result in self._searchBatches(geometry, parentCreature):
+            for index in result.viableIndexes():
+                found.append((-int(result.segmentCounts[index]), len(found), result.population, index))
+            if (len(found) >= count):
+                break
+        found.sort(key=lambda candidate: candidate[:2])
+        return [self._candidate(population, index, parentCreature) for (negativeSegmentCount, order, population, index) in found[:count]]
+
+    def screen(self, population, geometry):
+        """ Screen every candidate in the population against the panel geometry at once.
+
+            Args:
+                population (Population): The candidates.
+                geometry (PanelGeometry): The interior size of the panel the creatures must fit inside of.
+
+            Returns:
+                ScreeningResult: The rejection code and segment count of every candidate.
+        """
+        decoded = population.decode()
+        candidateCount = len(population)
+        chromosomeCount = population.chromosomeValues.shape[1]
+        maxSegments = Creature._MAX_CHROMOSOME_SEGMENTS
+        maxCreatureSegments = Creature._MAX_CREATURE_SEGMENTS
+
+        rejections = numpy.zeros(candidateCount, dtype=numpy.uint8)
+        segmentCounts = numpy.zeros(candidateCount, dtype=numpy.int64)
+
+        # Branches each segment buds at every level.  Bilateral symmetry branches to both sides.
+        branchCount = decoded.branchCount.astype(numpy.int64)
+        bilateral = decoded.symmetryBits == Chromosome._SYMMETRY_BILATERAL_VALUE
+        fanOut = numpy.where(decoded.terminated, 0, numpy.where(bilateral, 2 * branchCount, branchCount))
+
+        # Settle every candidate the reach bound can decide without placing any segments
+        (certainlyFits, certainlyOutOfBounds, boundSegmentCounts) = self._reachBound(decoded, fanOut, geometry, maxSegments, maxCreatureSegments)
+        rejections[certainlyOutOfBounds] = self.REJECTED_OUT_OF_BOUNDS
+        segmentCounts[certainlyFits] = boundSegmentCounts[certainlyFits]
+        pending = ~(certainlyFits | certainlyOutOfBounds)
+
+        # The ends of the segments the next level buds from, starting at the center of the panel pointing up
+        parentCandidates = numpy.flatnonzero(pending)
+        parentX = numpy.zeros(len(parentCandidates))
+        parentY = numpy.zeros(len(parentCandidates))
+        parentHeadings = numpy.full(len(parentCandidates), 90, dtype=numpy.int64)
+        parentChiralityRight = numpy.ones(len(parentCandidates), dtype=bool)
+        levelCounts = pending.astype(numpy.int64)
+
+        for chromosomeNumber in range(chromosomeCount):
+            # Segment counts are known before any segment is placed, so count failures are caught first
+            levelCounts = levelCounts * fanOut[:, chromosomeNumber]
+            growing = (rejections == self.VIABLE) & (levelCounts > 0)
+            tooMany = growing & ((levelCounts > maxSegments) | (segmentCounts + levelCounts > maxCreatureSegments))
+            rejections[tooMany] = self.REJECTED_TOO_MANY_SEGMENTS
+            if (chromosomeNumber == 0):
+                rejections[pending & (levelCounts == 0)] = self.REJECTED_FIRST_TERMINATED
+            levelCounts[rejections != self.VIABLE] = 0
+
+            keep = levelCounts[parentCandidates] > 0
+            parentCandidates = parentCandidates[keep]
+            if (len(parentCandidates) == 0):
+                break
+            segmentCounts += levelCounts
+
+            (candidates, xStart, yStart, headings, chiralityRight) = self._childSegmentStarts(
+                decoded, chromosomeNumber, fanOut, parentCandidates,
+                parentX[keep], parentY[keep], parentHeadings[keep], parentChiralityRight[keep])
+
+            (outOfBounds, xEnd, yEnd) = self._placeSegments(decoded, chromosomeNumber, geometry,
+                                                            candidates, xStart, yStart, headings)
+            rejections[candidates[outOfBounds]] = self.REJECTED_OUT_OF_BOUNDS
+
+            # Only candidates still viable grow the next level
+            alive = rejections[candidates] == self.VIABLE
+            parentCandidates = candidates[alive]
+            parentX = xEnd[alive]
+            parentY = yEnd[alive]
+            parentHeadings = headings[alive]
+            parentChiralityRight = chiralityRight[alive]
+
+        segmentCounts[rejections != self.VIABLE] = 0
+        return ScreeningResult(population, rejections, segmentCounts)
+
+    def rejectionRate(self, geometry):
+        """ Return the fraction of candidates rejected for panels of the geometry's size, or None if none were tried. """
+        statistics = self._statistics.get((geometry.interiorWidth, geometry.interiorHeight))
+        if ((statistics == None) or (statistics[0] == 0)):
+            return None
+        return sum(statistics[1:]) / statistics[0]
+
+    def rejectionRates(self):
+        """ Return the rejection statistics for every panel size screened so far.
+
+            Returns:
+                dict: Maps (interiorWidth, interiorHeight) to a dict with the candidates tried,
+                    the overall rejection rate, and the number rejected for each reason.
+        """
+        rates = {}
+        for (panelSize, statistics) in self._statistics.items():
+            rates[panelSize] = {"tried": statistics[0],
+                                "rejectionRate": (sum(statistics[1:]) / statistics[0]) if statistics[0] else None,
+                                "rejected": {self.REJECTION_REASONS[code]: statistics[code]
+                                             for code in range(1, len(self.REJECTION_REASONS))}}
+        return rates
+
+    @staticmethod
+    def _candidate(population, index, parentCreature):
+        """ Return the candidate at the index as a Creature, linked to its parent if it has one. """
+        creature = population.creature(index)
+        if (parentCreature != None):
+            creature.descendFrom(parentCreature)
+        return creature
+
+    def _searchBatches(self, geometry, parentCreature):
+        """ Generate screened batches of candidates until the attempt or time budget runs out.
+
+            At least one batch is always screened.
+        """
+        startTime = time.perf_counter()
+        attempts = 0
+        while True:
+            if (parentCreature == None):
+                population = Population.random(self.batchSize, self._randomGenerator, self.chromosomeCount)
+            else:
+                population = Population.mutated(parentCreature.genotype, self.batchSize, self._randomGenerator)
+            result = self.screen(population, geometry)
+            self._recordStatistics(geometry, result.rejections)
+            if hotPathMetrics.enabled:
+                self._recordMetrics(result)
+            yield result
+
+            attempts += self.batchSize
+            if ((attempts >= self.maxAttempts) or ((time.perf_counter() - startTime) >= self.timeLimit)):
+                return
+
+    def _recordStatistics(self, geometry, rejections):
+        """ Add a screened batch to the statistics for its panel size. """
+        panelSize = (geometry.interiorWidth, geometry.interiorHeight)
+        statistics = self._statistics.setdefault(panelSize, [0] * len(self.REJECTION_REASONS))
+        statistics[0] += len(rejections)
+        reasonCounts = numpy.bincount(rejections, minlength=len(self.REJECTION_REASONS))
+        for code in range(1, len(self.REJECTION_REASONS)):
+            statistics[code] += int(reasonCounts[code])
+
+    def _recordMetrics(self, result):
+        """ Report a screened batch to the hot path metrics. """
+        hotPathMetrics.count("candidatesScreened", len(result.rejections))
+        hotPathMetrics.count("segmentsLaidOut", int(result.segmentCounts.sum()))
+        reasonCounts = numpy.bincount(result.rejections, minlength=len(self.REJECTION_REASONS))
+        for code in range(1, len(self.REJECTION_REASONS)):
+            if (reasonCounts[code] > 0):
+                hotPathMetrics.countRejection(self.REJECTION_REASONS[code], int(reasonCounts[code]))
+
+    @staticmethod
+    def _reachBound(decoded, fanOut, geometry, maxSegments, maxCreatureSegments):
+        """ Return which candidates certainly fit, which certainly run out of bounds, and their segment counts.
+
+            The array form of ReachBound.  Candidates failing a segment count are left undecided
+            so laying them out reports the same reason PhenotypeLayout would.
+        """
+        levelCounts = numpy.cumprod(fanOut, axis=1)
+        countFailed = ((levelCounts > maxSegments).any(axis=1) | (levelCounts.sum(axis=1) > maxCreatureSegments) |
+                       (levelCounts[:, 0] == 0))
+        growing = levelCounts > 0
+
+        length = decoded.length.astype(numpy.int64)
+        radius = length >> 1
+        branchCount = decoded.branchCount.astype(numpy.int64)
+        line = decoded.shape == Chromosome._SHAPE__LINE_VALUE
+        straight = decoded.symmetryBits == Chromosome._SYMMETRY_STRAIGHT_VALUE
+
+        # The furthest each level can carry on from the end of its parent segment
+        levelReach = numpy.where(straight, (branchCount - 1) * length, 0) + numpy.where(line, length, 2 * radius)
+        reach = (levelReach * growing).sum(axis=1)
+        halfWidth = geometry.rightX
+        halfHeight = geometry.topY
+        tolerance = ReachBound._TOLERANCE
+        certainlyFits = ~countFailed & (reach < min(halfWidth, halfHeight) - tolerance)
+
+        # A dot or circle at least as wide as the panel cannot fit anywhere in it
+        tooWide = (growing & ~line & ((radius >= halfWidth) | (radius >= halfHeight))).any(axis=1)
+
+        # The first level grows from the center, straight branches stacking straight up
+        testDistance = numpy.where(line[:, 0], length[:, 0], radius[:, 0])
+        margin = numpy.where(line[:, 0], 0, radius[:, 0])
+        stackedTooHigh = ((branchCount[:, 0] - 1) * length[:, 0]) + testDistance >= halfHeight - margin + tolerance
+        pastCorners = ((margin >= min(halfWidth, halfHeight)) |
+                       (testDistance >= numpy.hypot(halfWidth - margin, halfHeight - margin) + tolerance))
+        firstOutOfBounds = growing[:, 0] & numpy.where(straight[:, 0], stackedTooHigh, pastCorners)
+
+        certainlyOutOfBounds = ~countFailed & (tooWide | firstOutOfBounds)
+        return (certainlyFits, certainlyOutOfBounds, levelCounts.sum(axis=1))
+
+    @staticmethod
+    def _childSegmentStarts(decoded, chromosomeNumber, fanOut, parentCandidates, parentX, parentY, parentHeadings, parentChiralityRight):
+        """ Return the starts of every segment budded at a level.  The array form of Chromosome.childSegmentStarts. """
+        branchesPerParent = fanOut[parentCandidates, chromosomeNumber]
+        candidates = numpy.repeat(parentCandidates, branchesPerParent)
+        xParent = numpy.repeat(parentX, branchesPerParent)
+        yParent = numpy.repeat(parentY, branchesPerParent)
+        headings = numpy.repeat(parentHeadings, branchesPerParent)
+        chiralityRight = numpy.repeat(parentChiralityRight, branchesPerParent)
+
+        # The position of each branch among those budded from the same parent segment
+        groupStarts = numpy.cumsum(branchesPerParent) - branchesPerParent
+        branchIndexes = numpy.arange(len(candidates)) - numpy.repeat(groupStarts, branchesPerParent)
+
+        symmetryBits = decoded.symmetryBits[candidates, chromosomeNumber]
+        branchCount = decoded.branchCount[candidates, chromosomeNumber].astype(numpy.int64)
+        branchAngle = decoded.branchAngle[candidates, chromosomeNumber].astype(numpy.int64)
+        length = decoded.length[candidates, chromosomeNumber].astype(numpy.float64)
+        straight = symmetryBits == Chromosome._SYMMETRY_STRAIGHT_VALUE
+
+        # Straight branches are strung one after another along the parent heading
+        xStep = length * ViabilityScreener._COSINES[headings]
+        yStep = length * ViabilityScreener._SINES[headings]
+        xStart = numpy.where(straight, xParent + (xStep * branchIndexes), xParent)
+        yStart = numpy.where(straight, yParent + (yStep * branchIndexes), yParent)
+
+        # Angled branches fan out, the same handed side first and then the opposite side
+        sameSideCount = numpy.where(symmetryBits & Chromosome._SYMMETRY_SAME_HANDED_VALUE, branchCount, 0)
+        oppositeSide = branchIndexes >= sameSideCount
+        turns = numpy.where(oppositeSide, branchIndexes - sameSideCount, branchIndexes) + 1
+        sideChiralityRight = numpy.where(straight, chiralityRight, chiralityRight ^ oppositeSide)
+        angledHeadings = numpy.where(sideChiralityRight, headings - (branchAngle * turns), headings + (branchAngle * turns)) % 360
+        headings = numpy.where(straight, headings, angledHeadings)
+
+        return (candidates, xStart, yStart, headings, sideChiralityRight)
+
+    @staticmethod
+    def _placeSegments(decoded, chromosomeNumber, geometry, candidates, xStart, yStart, headings):
+        """ Return which segments run out of bounds and where they end.  The array form of PhenotypeLayout._placeLevel. """
+        xDirection = ViabilityScreener._COSINES[headings]
+        yDirection = ViabilityScreener._SINES[headings]
+        length = decoded.length[candidates, chromosomeNumber].astype(numpy.int64)
+        line = decoded.shape[candidates, chromosomeNumber] == Chromosome._SHAPE__LINE_VALUE
+
+        # Lines are tested at their end, dots and circles at their center against boundaries trimmed by the radius
+        radius = length >> 1
+        testDistance = numpy.where(line, length, radius)
+        endDistance = numpy.where(line, length, 2 * radius)
+        margin = numpy.where(line, 0, radius)
+
+        xTest = xStart + (testDistance * xDirection)
+        yTest = yStart + (testDistance * yDirection)
+        outOfBounds = ((xTest <= geometry.leftX + margin) | (xTest >= geometry.rightX - margin) |
+                       (yTest <= geometry.bottomY + margin) | (yTest >= geometry.topY - margin))
+
+        xEnd = xStart + (endDistance * xDirection)
+        yEnd = yStart + (endDistance * yDirection)
+        return (outOfBounds, xEnd, yEnd)